@@ -1,10 +1,12 @@
 import tkinter as tk
-from PIL import Image, ImageTk
-from io import BytesIO
-import requests
+
+import catalog
+from main import Products
+from thumbnails import ThumbnailCache
+from tk_dispatch import Dispatcher
 
 # Sample data: three product categories, each with two products, price, and short description
-products = {
+CATALOG = {
     "Consoles": {
         "PlayStation 5 Slim": {
             "price": "$499.99",
@@ -43,32 +45,44 @@ products = {
     }
 }
 
-def load_image_from_url(url, size=(100, 100)):
-    response = requests.get(url)
-    img_data = BytesIO(response.content)
-    img = Image.open(img_data)
-    img = img.resize(size, resample=Image.LANCZOS)
-    return ImageTk.PhotoImage(img)
+# Loaded through the same ingest path as main.py, so prices are numbers and the search index is shared code
+products = Products(search_fields=("name", "description"))
+catalog.load(products, catalog.records_from_nested(CATALOG))
 
-def update_listbox(category, search_query=None):
-    text_widget.delete("1.0", tk.END)  # Clear previous items
+listing_generation = 0
+listing_photos = []
 
-    if search_query:
-        # Filter products based on the search query
-        filtered_products = {
-            product: info for product, info in products[category].items()
-            if search_query.lower() in product.lower() or search_query.lower() in info["description"].lower()
-        }
-    else:
-        # If no search query, display all products in the category
-        filtered_products = products[category]
+def show_image(generation, mark, photo):
+    # Runs on the Tk thread once the thumbnail is ready; results for an outdated listing are dropped.
+    if generation != listing_generation or photo is None:
+        return
+    listing_photos.append(photo)  # Keep a reference so Tk does not discard the image
+    text_widget.image_create(mark, image=photo)
 
-    for item, info in filtered_products.items():
-        image_url = info.get("image_url", "")  # Get image URL if available
-        if image_url:
-            img = load_image_from_url(image_url)
-            text_widget.image_create(tk.END, image=img)
-        text_widget.insert(tk.END, f"{category}: {item} - {info['price']} - {info['description']}\n")
+def update_listbox(category, search_query=None):
+    global listing_generation
+    listing_generation += 1
+    text_widget.delete("1.0", tk.END)  # Clear previous items
+    listing_photos.clear()
+
+    # Filter products on name and description; without a query every product in the category matches
+    product_ids = products.search_ids(search_query or "", category, fields=("name", "description"))
+
+    for index, product_id in enumerate(product_ids):
+        info = products.get_product_info(product_id)
+        if info["image_path"]:
+            # Mark where the image goes; it is loaded in the background and inserted when ready
+            mark = f"image{index}"
+            text_widget.mark_set(mark, tk.END + "-1c")
+            text_widget.mark_gravity(mark, tk.LEFT)
+            thumbnails.request(info["image_path"], 100,
+                               lambda photo, generation=listing_generation, mark=mark: show_image(generation, mark, photo))
+        text_widget.insert(tk.END, f"{category}: {info['name']} - ${info['price']:.2f} - {info['description']}\n")
+
+def filter_category(category):
+    filter_frame.place_forget()
+    category_var.set(category)
+    on_search()
 
 def on_search():
     search_query = entry_search.get()
@@ -79,6 +93,8 @@ def on_search():
 # Create the main window
 window = tk.Tk()
 window.title("Great Purchases")  # Set the title of the window
+dispatcher = Dispatcher(window)
+thumbnails = ThumbnailCache(dispatcher, workers=4)
 
 # Create and place widgets in the window
 label_title = tk.Label(window, text="Great Purchases", font=("Arial", 24, "bold"), fg="#007BFF")  # Blue color
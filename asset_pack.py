@@ -0,0 +1,183 @@
+'''
+    Packed image assets.
+
+    Description: An offline build step renders every product image at a few fixed heights and stores the
+                 results in one packed file, so the application never has to decode an original image. The
+                 originals are decoded in parallel processes using JPEG draft mode, which lets the decoder skip
+                 detail that the smaller sizes throw away. Each rendered image is stored as a binary PPM, a
+                 format Tk reads directly with PhotoImage(data=...), and an index at the end of the file maps
+                 (image path, height) to its bytes. Readers memory-map the file, so looking up an asset costs no
+                 extra file opens.
+
+    Usage: python asset_pack.py images --output images/assets.pack --heights 48 150
+'''
+
+
+import argparse
+import glob
+import io
+import json
+import mmap
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+
+MAGIC = b"APK1"
+HEADER = struct.Struct("<4sQQ")
+DEFAULT_PACK = os.path.join("images", "assets.pack")
+DEFAULT_HEIGHTS = (48, 150)
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png")
+
+
+def asset_key(image_path):
+    return os.path.normpath(image_path).replace(os.sep, "/")
+
+
+def render_asset(image_path, heights):
+    """
+    Render one image at every height, keeping its aspect ratio. Runs in a worker process.
+
+    Returns:
+        tuple: (image_path, modification time in ns, {height: (width, height, PPM bytes)})
+    """
+    from PIL import Image
+
+    renders = {}
+    with Image.open(image_path) as original:
+        tallest = max(heights)
+        width, height = original.size
+        # Let the JPEG decoder scale down by a power of two while staying at least as large as the tallest size
+        original.draft("RGB", (max(1, round(width * tallest / height)), tallest))
+        source = original.convert("RGB")
+    for target_height in sorted(heights, reverse=True):
+        target_width = max(1, round(width * target_height / height))
+        if source.size != (target_width, target_height):
+            resized = source.resize((target_width, target_height), Image.LANCZOS)
+        else:
+            resized = source
+        data = io.BytesIO()
+        resized.save(data, format="PPM")
+        renders[target_height] = (target_width, target_height, data.getvalue())
+        # Each smaller size is resized from the previous one, which is cheaper than going back to the source
+        source = resized
+    return image_path, os.stat(image_path).st_mtime_ns, renders
+
+
+def build_pack(image_paths, output=DEFAULT_PACK, heights=DEFAULT_HEIGHTS, workers=None):
+    """
+    Render image_paths at every height and write them to a packed asset file.
+
+    Args:
+        image_paths (list): Source images.
+        output (str, optional): Path of the pack. Defaults to DEFAULT_PACK.
+        heights (tuple, optional): Heights to render. Defaults to DEFAULT_HEIGHTS.
+        workers (int, optional): Worker processes. Defaults to None (one per CPU).
+
+    Returns:
+        int: The number of images packed.
+    """
+    image_paths = list(image_paths)
+    index = {}
+    temporary_path = f"{output}.{os.getpid()}.tmp"
+    with ProcessPoolExecutor(max_workers=workers) as executor, open(temporary_path, "wb") as pack:
+        pack.write(HEADER.pack(MAGIC, 0, 0))
+        for image_path, modified, renders in executor.map(render_asset, image_paths, [heights] * len(image_paths)):
+            sizes = {}
+            for target_height, (width, height, data) in renders.items():
+                sizes[str(target_height)] = [pack.tell(), len(data), width, height]
+                pack.write(data)
+            index[asset_key(image_path)] = {'mtime_ns': modified, 'sizes': sizes}
+        index_offset = pack.tell()
+        index_data = json.dumps(index, separators=(",", ":")).encode()
+        pack.write(index_data)
+        pack.seek(0)
+        pack.write(HEADER.pack(MAGIC, index_offset, len(index_data)))
+    os.replace(temporary_path, output)
+    return len(index)
+
+
+class AssetPack:
+    def __init__(self, path=DEFAULT_PACK):
+        """
+        Initialize the AssetPack class by memory-mapping a pack written by build_pack.
+
+        Args:
+            path (str, optional): Path of the pack. Defaults to DEFAULT_PACK.
+
+        Raises:
+            ValueError: If the file is not an asset pack.
+        """
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_offset, index_length = HEADER.unpack_from(self.data)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not an asset pack")
+        self.index = json.loads(self.data[index_offset:index_offset + index_length])
+        self.fresh = {}
+
+    @classmethod
+    def open_if_exists(cls, path=DEFAULT_PACK):
+        """Return the pack at path, or None if there is no usable pack there."""
+        try:
+            return cls(path)
+        except (OSError, ValueError):
+            return None
+
+    def __len__(self):
+        return len(self.index)
+
+    def get(self, image_path, height):
+        """
+        Return the PPM bytes of image_path rendered at height.
+
+        Returns:
+            bytes: The image, or None if it is not in the pack or the original changed after the pack was built.
+        """
+        key = asset_key(image_path)
+        entry = self.index.get(key)
+        if entry is None or not self.is_fresh(key, image_path, entry):
+            return None
+        location = entry['sizes'].get(str(height))
+        if location is None:
+            return None
+        offset, length = location[0], location[1]
+        return self.data[offset:offset + length]
+
+    def is_fresh(self, key, image_path, entry):
+        # The original is checked once per run; a newer original means the pack is out of date for it.
+        fresh = self.fresh.get(key)
+        if fresh is None:
+            try:
+                fresh = os.stat(image_path).st_mtime_ns == entry['mtime_ns']
+            except OSError:
+                fresh = True
+            self.fresh[key] = fresh
+        return fresh
+
+    def invalidate(self, image_path):
+        """Stop serving image_path from the pack, e.g. because the original has been replaced."""
+        self.fresh[asset_key(image_path)] = False
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the packed image assets.")
+    parser.add_argument("directory", nargs="?", default="images", help="directory of product images")
+    parser.add_argument("--output", default=DEFAULT_PACK, help=f"pack to write (default: {DEFAULT_PACK})")
+    parser.add_argument("--heights", type=int, nargs="+", default=list(DEFAULT_HEIGHTS),
+                        help="heights to render (default: 48 150)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    image_paths = sorted(path for pattern in IMAGE_PATTERNS for path in glob.glob(os.path.join(args.directory, pattern)))
+    count = build_pack(image_paths, args.output, tuple(args.heights), args.workers)
+    print(f"Packed {count} images into {args.output} ({os.path.getsize(args.output) / 1024:.0f} KB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,560 @@
+'''
+    Headless benchmark suite.
+
+    Description: Times the hot paths of the shopping platform without opening any windows: building the product
+                 store, lookups, search and filtering, cart mutation and totals, thumbnail decoding, a load
+                 test of the order pipeline against the stub payment gateway, the co-occurrence index behind
+                 the "customers also bought" suggestions, and a multi-threaded stress test
+                 of the cart service that fails the run if any update is lost or stock is oversold. Each
+                 benchmark runs against a synthetic catalog of the requested sizes and reports throughput, p50
+                 and p99 latency and peak traced memory. Results can be written to JSON and compared against an
+                 earlier run to catch regressions.
+
+    Usage: python benchmarks.py --sizes 1000 100000 --output new.json --compare old.json
+'''
+
+
+import argparse
+import glob
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+from asset_pack import AssetPack, build_pack
+from cart import ShoppingCart
+from cart_service import CartService
+from catalog_watch import CatalogFile
+from inventory import Inventory, OutOfStock
+from main import Products
+from order_journal import OrderJournal
+from orders import Order, OrderProcessor, StubPaymentGateway
+from receipts import FORMATS, ReceiptWriter
+from recommendations import CoOccurrenceIndex
+
+
+CATEGORIES = ["Consoles", "Laptops", "Appliances", "Phones", "Audio", "Cameras", "Monitors", "Accessories"]
+WORDS = ["pro", "max", "ultra", "slim", "gaming", "smart", "wireless", "portable", "mini", "plus", "air", "elite",
+         "studio", "home", "turbo", "quiet", "compact", "deluxe", "digital", "classic"]
+BACKENDS = ("memory", "columnar", "sqlite")
+
+
+def synthetic_products(count, seed=0):
+    """
+    Generate product records in the format accepted by add_products.
+
+    Args:
+        count (int): Number of products.
+        seed (int, optional): Random seed, so runs are comparable. Defaults to 0.
+    """
+    rng = random.Random(seed)
+    for product_id in range(1, count + 1):
+        name = " ".join(rng.choice(WORDS) for _ in range(3)).title() + f" {product_id}"
+        description = " ".join(rng.choice(WORDS) for _ in range(12))
+        price = round(rng.uniform(5, 2500), 2)
+        yield (product_id, rng.choice(CATEGORIES), name, price, description, "images/ps5.jpg")
+
+
+def create_store(backend):
+    if backend == "columnar":
+        from columnar_products import ColumnarProducts
+        return ColumnarProducts()
+    if backend == "sqlite":
+        from sqlite_products import SqliteProducts
+        return SqliteProducts()
+    return Products()
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def measure(function, arguments):
+    """
+    Call function once per entry of arguments and summarize the latencies.
+
+    Args:
+        function (callable): The operation to time.
+        arguments (list): One tuple of positional arguments per call.
+
+    Returns:
+        dict: ops, throughput (ops/s), p50_ms and p99_ms.
+    """
+    latencies = []
+    clock = time.perf_counter
+    started = clock()
+    for args in arguments:
+        call_started = clock()
+        function(*args)
+        latencies.append(clock() - call_started)
+    elapsed = clock() - started
+    latencies.sort()
+    return {
+        'ops': len(arguments),
+        'throughput': len(arguments) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+    }
+
+
+def measure_peak(function, *args):
+    """Run function once and return (result, peak traced memory in MB)."""
+    tracemalloc.start()
+    try:
+        result = function(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, peak / (1024 * 1024)
+
+
+def bench_catalog(size, backend, operations, rng):
+    records = list(synthetic_products(size))
+    store = create_store(backend)
+    started = time.perf_counter()
+    _, peak = measure_peak(store.add_products, records)
+    elapsed = time.perf_counter() - started
+    results = {
+        'build': {'ops': size, 'throughput': size / elapsed, 'p50_ms': elapsed * 1000, 'p99_ms': elapsed * 1000,
+                  'peak_mb': peak},
+    }
+    sample = [rng.choice(records) for _ in range(operations)]
+    results['get_product_info'] = measure(store.get_product_info, [(record[0],) for record in sample])
+    results['get_product_by_name'] = measure(store.get_product_by_name, [(record[2],) for record in sample])
+    category_calls = max(1, operations // 100)
+    results['get_products_by_category'] = measure(
+        store.get_products_by_category, [(rng.choice(CATEGORIES),) for _ in range(category_calls)])
+    return store, results
+
+
+def bench_search(store, operations, rng):
+    queries = [(rng.choice(WORDS)[:rng.randint(2, 5)], None) for _ in range(operations)]
+    filtered = [(rng.choice(WORDS)[:4], rng.choice(CATEGORIES)) for _ in range(operations)]
+
+    def page(query, category):
+        # Materialize the first page like the Treeview does, so lazy backends are charged for it too
+        return list(store.search_ids(query, category)[:60])
+
+    low_prices = [rng.uniform(5, 2000) for _ in range(max(1, operations // 100))]
+    results = {
+        'search': measure(page, queries),
+        'search_in_category': measure(page, filtered),
+        'price_range': measure(store.get_products_by_price, [(low, low + 100) for low in low_prices]),
+    }
+    if hasattr(store, 'search_sorted'):
+        def sorted_page(query, category, sort_by, min_price, max_price, offset):
+            # A page deep into a sorted result, as when the user drags the scrollbar
+            view = store.search_sorted(query, category, sort_by, offset % 2 == 1, min_price, max_price)
+            return list(view[offset:offset + 60])
+
+        calls = max(1, operations // 10)
+        results['sorted_page'] = measure(sorted_page, [
+            ("", None, rng.choice(("name", "price")), None, None, rng.randrange(len(store))) for _ in range(calls)])
+        results['sorted_price_filter'] = measure(sorted_page, [
+            ("", rng.choice(CATEGORIES), rng.choice(("name", "price")), low, low + 500, 0) for low in low_prices])
+    return results
+
+
+def bench_reload(store, records, rng, changes=300):
+    """
+    Reload a catalog file in which changes lines were edited, removed or added, and time finding and applying them.
+
+    Returns:
+        dict: Results for a reload with changes and for a reload of an unchanged file.
+    """
+    if not hasattr(store, 'apply_changes'):
+        return {}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "catalog.jsonl")
+        fields = ('id', 'category', 'name', 'price', 'description', 'image_path')
+
+        def write(rows):
+            with open(path, "w") as file:
+                file.writelines(json.dumps(dict(zip(fields, row))) + "\n" for row in rows)
+
+        write(records)
+        catalog_file = CatalogFile(path, store)
+        catalog_file.reload()
+        rows = list(records)
+        for index in rng.sample(range(len(rows)), min(changes, len(rows))):
+            rows[index] = rows[index][:3] + (round(rows[index][3] * 0.9, 2),) + rows[index][4:]
+        del rows[:changes // 3]
+        rows.extend((len(records) + number, "Audio", f"New {number}", 10.0, "", "") for number in range(1, changes // 3))
+        write(rows)
+        changed = measure(catalog_file.reload, [()])
+        unchanged = measure(catalog_file.reload, [()])
+    return {'catalog_reload_delta': changed, 'catalog_reload_unchanged': unchanged}
+
+
+def bench_cart(store, size, operations, rng):
+    cart = ShoppingCart(store)
+    product_ids = [rng.randint(1, size) for _ in range(operations)]
+    results = {'cart_add': measure(cart.add, [(product_id,) for product_id in product_ids])}
+    results['cart_totals'] = measure(lambda: (cart.subtotal_cents, cart.tax_cents, cart.total_cents),
+                                     [()] * operations)
+    results['cart_bulk_add'] = measure(cart.add_many, [({product_id: 50 for product_id in product_ids[:20]},)
+                                                       for _ in range(max(1, operations // 100))])
+    results['cart_remove'] = measure(lambda product_id: product_id in cart and cart.remove(product_id),
+                                     [(product_id,) for product_id in product_ids])
+    return results
+
+
+def bench_thumbnails(image_dir, repeats):
+    try:
+        from thumbnails import ThumbnailCache
+        import PIL  # noqa: F401
+    except ImportError:
+        return {}
+    image_paths = sorted(glob.glob(os.path.join(image_dir, "*.jpg")))
+    if not image_paths:
+        return {}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = ThumbnailCache(None, cache_dir=cache_dir, workers=1)
+        cold = measure(cache.load, [(image_path, 150) for image_path in image_paths])
+        warm = measure(cache.load, [(image_path, 150) for image_path in image_paths] * repeats)
+        cache.shutdown()
+        pack_path = os.path.join(cache_dir, "assets.pack")
+        build = measure(build_pack, [(image_paths, pack_path)])
+        pack = AssetPack(pack_path)
+        packed = measure(pack.get, [(image_path, 150) for image_path in image_paths] * repeats)
+        pack.close()
+    return {'thumbnail_decode_resize': cold, 'thumbnail_disk_hit': warm, 'asset_pack_build': build,
+            'asset_pack_hit': packed}
+
+
+def bench_orders(count, workers=4):
+    """
+    Push count orders through an OrderProcessor backed by the stub gateway as fast as they are accepted.
+
+    Returns:
+        dict: Throughput of the whole run and p50/p99 of the submit-to-completion latency.
+    """
+    if not count:
+        return {}
+    processor = OrderProcessor(StubPaymentGateway(), workers=workers)
+    details = {'cardholder_name': "Load Test", 'card_number': "4242 4242 4242 4242", 'expiration_date': "12/99",
+               'cvv': "123", 'address': "1 Main St", 'city': "Springfield", 'state': "IL", 'zip_code': "62701"}
+    orders = [Order([(1, "Load Test", 1999, 1)], 1999, 140, details) for _ in range(count)]
+    started = time.perf_counter()
+    for order in orders:
+        processor.submit(order)
+    processor.shutdown(wait=True)
+    elapsed = time.perf_counter() - started
+    latencies = sorted(order.completed - order.submitted for order in orders)
+    return {
+        f"orders[{count}]": {
+            'ops': count,
+            'throughput': count / elapsed if elapsed else 0.0,
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+        },
+    }
+
+
+def bench_recommendations(count, seed=0, catalog_size=10000):
+    """
+    Count count synthetic orders into a co-occurrence index one by one, rebuild it from a journal of the same
+    orders, and time suggestion lookups.
+
+    Returns:
+        dict: Results for incremental updates, the journal rebuild and cached and uncached lookups.
+    """
+    if not count:
+        return {}
+    rng = random.Random(seed)
+    # A few popular products appear in most baskets, like a real catalog
+    baskets = [[min(catalog_size, int(rng.paretovariate(1.2))) for _ in range(rng.randint(1, 6))]
+               for _ in range(count)]
+    index = CoOccurrenceIndex()
+    results = {'recommend_add_order': measure(index.add_order, [(basket,) for basket in baskets])}
+    product_ids = [(rng.choice(basket),) for basket in rng.sample(baskets, min(count, 1000))]
+    results['recommend_uncached'] = measure(index.recommend, product_ids)
+    results['recommend_cached'] = measure(index.recommend, product_ids * 10)
+    with tempfile.TemporaryDirectory() as journal_dir:
+        journal = OrderJournal(journal_dir, segment_bytes=4 * 1024 * 1024, sync=False)
+        for number, basket in enumerate(baskets):
+            journal.append({'id': number, 'ts': 0, 'lines': [[product_id, 1, 100] for product_id in basket]})
+        journal.close()
+        started = time.perf_counter()
+        rebuilt = CoOccurrenceIndex()
+        rebuilt.load_journal(journal_dir)
+        elapsed = time.perf_counter() - started
+    results['recommend_rebuild'] = {'ops': count, 'throughput': count / elapsed, 'p50_ms': elapsed * 1000,
+                                    'p99_ms': elapsed * 1000}
+    results['recommend_rebuild']['errors'] = int(rebuilt.rows != index.rows)
+    return results
+
+
+def bench_receipts(count, seed=0, workers=2):
+    """
+    Render count synthetic journal lines as receipts in every format, one by one and in worker processes.
+
+    Returns:
+        dict: Per-format results; 'errors' counts batch outputs or reports that differ from the serial ones.
+    """
+    if not count:
+        return {}
+    rng = random.Random(seed)
+    lines = []
+    for number in range(count):
+        items = [[rng.randint(1, 1000), rng.randint(1, 3), rng.randint(100, 99999)] for _ in range(rng.randint(1, 6))]
+        subtotal = sum(quantity * price_cents for product_id, quantity, price_cents in items)
+        lines.append(json.dumps({'id': number, 'ts': 1.7e9 + number, 'day': "2024-01-01", 'subtotal': subtotal,
+                                 'tax': subtotal // 14, 'total': subtotal + subtotal // 14, 'lines': items}).encode())
+    results = {}
+    for format in FORMATS:
+        serial = ReceiptWriter(io.StringIO(), format)
+        results[f"receipt_{format}"] = measure(serial.write, [(line,) for line in lines])
+        batch = ReceiptWriter(io.StringIO(), format)
+        started = time.perf_counter()
+        batch.write_all(lines, workers)
+        elapsed = time.perf_counter() - started
+        results[f"receipt_{format}_batch[{workers}w]"] = {'ops': count, 'throughput': count / elapsed,
+                                                          'p50_ms': elapsed * 1000, 'p99_ms': elapsed * 1000}
+        results[f"receipt_{format}_batch[{workers}w]"]['errors'] = int(
+            batch.file.getvalue() != serial.file.getvalue() or batch.report.render(format) != serial.report.render(format))
+    return results
+
+
+def run_threads(count, target):
+    """Run target(thread_number) on count threads with a tiny switch interval, so races show up quickly."""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=target, args=(number,)) for number in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+
+def bench_sessions(threads, operations, seed=0):
+    """
+    Stress the cart service from many threads and check that nothing was lost.
+
+    Every thread adds and removes random units in carts shared with the other threads, keeping its own tally;
+    afterwards each cart must hold exactly the sum of the tallies. Then thousands of shoppers race to add one
+    unit of a product with half as many units in stock and check out, and exactly that many orders may be paid.
+    tests/test_cart_service.py asserts the same invariants; here they are measured at load.
+
+    Returns:
+        dict: Throughput and latency of both phases; 'errors' counts lost updates and oversold units.
+    """
+    if not threads:
+        return {}
+    products = Products()
+    products.add_products(synthetic_products(100, seed))
+    processor = OrderProcessor(StubPaymentGateway(), workers=4, max_pending=threads * operations)
+    inventory = Inventory()
+    service = CartService(products, processor, inventory)
+    session_ids = [service.create_session() for _ in range(threads)]
+    tallies = [Counter() for _ in range(threads)]
+    latencies = []
+
+    def shop(number):
+        rng = random.Random(seed + number)
+        tally = tallies[number]
+        clock = time.perf_counter
+        for _ in range(operations):
+            session_id = rng.choice(session_ids)
+            product_id = rng.randint(1, 100)
+            started = clock()
+            if tally[session_id, product_id] and rng.random() < 0.3:
+                quantity = rng.randint(1, tally[session_id, product_id])
+                service.remove_item(session_id, product_id, quantity)
+                tally[session_id, product_id] -= quantity
+            else:
+                quantity = rng.randint(1, 3)
+                service.add_item(session_id, product_id, quantity)
+                tally[session_id, product_id] += quantity
+            latencies.append(clock() - started)
+
+    started = time.perf_counter()
+    run_threads(threads, shop)
+    elapsed = time.perf_counter() - started
+    expected = sum(tallies, Counter())
+    lost_updates = 0
+    for session_id in session_ids:
+        cart = service.cart(session_id)
+        for product_id in range(1, 101):
+            quantity = cart[product_id]['quantity'] if product_id in cart else 0
+            lost_updates += abs(quantity - expected[session_id, product_id])
+        # The running totals must agree with the lines they summarize
+        lost_updates += abs(cart.item_count - sum(item['quantity'] for item in cart.values()))
+        lost_updates += cart.subtotal_cents != sum(map(cart.line_total_cents, cart.keys()))
+    latencies.sort()
+    results = {
+        f"session_cart_ops[{threads}t]": {
+            'ops': len(latencies),
+            'throughput': len(latencies) / elapsed if elapsed else 0.0,
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'errors': lost_updates,
+        },
+    }
+
+    details = {'cardholder_name': "Stress Test", 'card_number': "4242 4242 4242 4242", 'expiration_date': "12/99",
+               'cvv': "123", 'address': "1 Main St", 'city': "Springfield", 'state': "IL", 'zip_code': "62701"}
+    buyers = [service.create_session() for _ in range(threads * 250)]
+    units = len(buyers) // 2
+    inventory.restock({1: units})
+    orders = []
+    checkout_latencies = []
+
+    def check_out(number):
+        clock = time.perf_counter
+        for session_id in buyers[number::threads]:
+            started = clock()
+            try:
+                service.add_item(session_id, 1)
+                orders.append(service.checkout(session_id, details))
+            except OutOfStock:
+                pass
+            checkout_latencies.append(clock() - started)
+
+    started = time.perf_counter()
+    run_threads(threads, check_out)
+    processor.shutdown(wait=True)
+    elapsed = time.perf_counter() - started
+    paid = sum(1 for order in orders if order.status == Order.PAID)
+    oversold = abs(paid - units) + abs(inventory.available(1))
+    checkout_latencies.sort()
+    results[f"session_checkout[{threads}t]"] = {
+        'ops': len(buyers),
+        'throughput': len(buyers) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(checkout_latencies, 0.50) * 1000,
+        'p99_ms': percentile(checkout_latencies, 0.99) * 1000,
+        'errors': oversold,
+    }
+    return results
+
+
+def run(sizes, backend, operations, image_dir, seed=0, orders=0, threads=0):
+    """
+    Run every benchmark and return the results as a JSON-serializable dictionary.
+
+    Args:
+        sizes (list): Catalog sizes to benchmark.
+        backend (str): One of BACKENDS.
+        operations (int): Timed calls per benchmark.
+        image_dir (str): Directory holding the product images for the thumbnail benchmark.
+        seed (int, optional): Random seed. Defaults to 0.
+        orders (int, optional): Orders for the order pipeline load test. Defaults to 0 (skip it).
+        threads (int, optional): Threads for the cart service stress test. Defaults to 0 (skip it).
+    """
+    results = {}
+    for size in sizes:
+        rng = random.Random(seed)
+        store, catalog_results = bench_catalog(size, backend, operations, rng)
+        for name, result in catalog_results.items():
+            results[f"{name}[{size}]"] = result
+        for name, result in bench_search(store, operations, rng).items():
+            results[f"{name}[{size}]"] = result
+        for name, result in bench_cart(store, size, operations, rng).items():
+            results[f"{name}[{size}]"] = result
+        # Last, because it edits and removes products the other benchmarks pick at random
+        for name, result in bench_reload(store, list(synthetic_products(size)), rng).items():
+            results[f"{name}[{size}]"] = result
+        del store
+    results.update(bench_thumbnails(image_dir, repeats=3))
+    results.update(bench_orders(orders))
+    results.update(bench_recommendations(orders, seed))
+    results.update(bench_receipts(orders, seed))
+    results.update(bench_sessions(threads, operations, seed))
+    return {
+        'meta': {
+            'backend': backend,
+            'sizes': sizes,
+            'operations': operations,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'time': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold):
+    """
+    Compare two benchmark runs.
+
+    Args:
+        baseline (dict): Results loaded from an earlier run.
+        current (dict): Results of this run.
+        threshold (float): Allowed relative slowdown of p50 latency, e.g. 0.2 for 20%.
+
+    Returns:
+        tuple: (report lines, list of benchmark names that regressed)
+    """
+    lines = []
+    regressions = []
+    for name, result in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None or not before['p50_ms']:
+            continue
+        change = result['p50_ms'] / before['p50_ms'] - 1
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        lines.append(f"{name:<40}{before['p50_ms']:10.4f} ->{result['p50_ms']:10.4f} ms  {change:+7.1%}{flag}")
+    return lines, regressions
+
+
+def format_results(report):
+    lines = [f"{'benchmark':<40}{'ops/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'peak MB':>10}"]
+    for name, result in report['results'].items():
+        peak = f"{result['peak_mb']:10.1f}" if 'peak_mb' in result else f"{'':>10}"
+        lines.append(f"{name:<40}{result['throughput']:12.0f}{result['p50_ms']:10.4f}{result['p99_ms']:10.4f}{peak}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the headless benchmark suite.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="catalog sizes to benchmark (default: 1000 10000 100000)")
+    parser.add_argument("--backend", choices=BACKENDS, default="memory", help="product store to benchmark")
+    parser.add_argument("--operations", type=int, default=1000, help="timed calls per benchmark")
+    parser.add_argument("--images", default="images", help="directory of product images")
+    parser.add_argument("--orders", type=int, default=10000,
+                        help="orders for the order pipeline load test, 0 to skip (default: 10000)")
+    parser.add_argument("--threads", type=int, default=8,
+                        help="threads for the cart service stress test, 0 to skip (default: 8)")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="compare against the results in this JSON file")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative p50 slowdown that counts as a regression (default: 0.2)")
+    args = parser.parse_args(argv)
+
+    report = run(args.sizes, args.backend, args.operations, args.images, orders=args.orders, threads=args.threads)
+    print(format_results(report))
+    failures = [name for name, result in report['results'].items() if result.get('errors')]
+    if failures:
+        print(f"\nConsistency check failed: {', '.join(failures)}", file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            lines, regressions = compare(json.load(baseline_file), report, args.threshold)
+        print()
+        print("\n".join(lines))
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}", file=sys.stderr)
+            return 1
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+'''
+    Shopping cart.
+
+    Description: Keeps the items a shopper has selected together with running totals, so the subtotal, tax,
+                 total and item count are available in constant time instead of being re-summed on every click.
+                 Cart lines are keyed by product id; names and prices come from the catalog when a line
+                 is created. Money is tracked in integer cents and tax is rounded with Decimal, so totals never drift. Items
+                 keep their insertion order for positional access, and every change is announced to subscribed
+                 views so they can redraw just the affected row.
+'''
+
+
+from decimal import Decimal, ROUND_HALF_UP
+
+
+def to_cents(price):
+    """Convert a price in dollars (float, str or Decimal) to integer cents."""
+    return int((Decimal(str(price)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def format_cents(cents):
+    """Format integer cents as a dollar amount, e.g. 46999 -> "$469.99"."""
+    sign = "-" if cents < 0 else ""
+    return f"{sign}${abs(cents) // 100}.{abs(cents) % 100:02d}"
+
+
+class ShoppingCart:
+    TAX_RATE = Decimal("0.07")
+
+    ADDED = "added"
+    UPDATED = "updated"
+    REMOVED = "removed"
+    CLEARED = "cleared"
+
+    def __init__(self, products):
+        """
+        Initialize the ShoppingCart class with no items and zero totals.
+
+        Args:
+            products (Products): The catalog used to look up product names and prices by id.
+        """
+        self.products = products
+        self.items = {}
+        self.order = []
+        self.positions = {}
+        self.subtotal_cents = 0
+        self.item_count = 0
+        self.listeners = []
+
+    def __len__(self):
+        return len(self.order)
+
+    def __contains__(self, product_id):
+        return product_id in self.items
+
+    def __iter__(self):
+        return iter(list(self.order))
+
+    def __getitem__(self, product_id):
+        return self.items[product_id]
+
+    def keys(self):
+        return list(self.order)
+
+    def values(self):
+        return [self.items[product_id] for product_id in self.order]
+
+    def get(self, product_id, default=None):
+        return self.items.get(product_id, default)
+
+    def add(self, product_id, quantity=1):
+        """
+        Add units of a product, creating its cart line if needed.
+
+        Args:
+            product_id: The catalog id of the product.
+            quantity (int, optional): Number of units to add. Defaults to 1.
+        """
+        self.add_many([(product_id, quantity)])
+
+    def add_many(self, quantities):
+        """
+        Add units of several products in one operation.
+
+        Every entry is checked before any change is made, so either all of them are applied or none are.
+
+        Args:
+            quantities (dict or iterable): Product ids mapped to (or paired with) the number of units to add.
+
+        Raises:
+            ValueError: If a quantity is not positive.
+            KeyError: If a product is neither in the cart nor in the catalog.
+        """
+        quantities = self._validated(quantities, minimum=1)
+        for product_id, quantity in quantities:
+            item = self.items.get(product_id)
+            event = self.UPDATED
+            if item is None:
+                item = self._new_line(product_id)
+                event = self.ADDED
+            self._change_quantity(product_id, item, quantity)
+            self._notify(event, product_id)
+
+    def set_quantities(self, quantities):
+        """
+        Set the quantity of several cart lines in one operation; a quantity of zero deletes the line.
+
+        Args:
+            quantities (dict or iterable): Product ids mapped to (or paired with) their new quantity.
+
+        Raises:
+            ValueError: If a quantity is negative.
+            KeyError: If a product is neither in the cart nor in the catalog.
+        """
+        for product_id, quantity in self._validated(quantities, minimum=0):
+            if product_id in self.items or quantity:
+                self.set_quantity(product_id, quantity)
+
+    def remove(self, product_id, quantity=1):
+        """
+        Remove units of a product, deleting its cart line when none are left.
+
+        Args:
+            product_id: The catalog id of the product.
+            quantity (int, optional): Number of units to remove. Defaults to 1.
+        """
+        item = self.items[product_id]
+        if quantity >= item['quantity']:
+            self.delete(product_id)
+            return
+        self._change_quantity(product_id, item, -quantity)
+        self._notify(self.UPDATED, product_id)
+
+    def set_quantity(self, product_id, quantity):
+        """Set the quantity of a cart line, creating it if needed; zero deletes it."""
+        item = self.items.get(product_id)
+        if quantity <= 0:
+            if item is not None:
+                self.delete(product_id)
+            return
+        if item is None:
+            self._change_quantity(product_id, self._new_line(product_id), quantity)
+            self._notify(self.ADDED, product_id)
+        elif quantity != item['quantity']:
+            self._change_quantity(product_id, item, quantity - item['quantity'])
+            self._notify(self.UPDATED, product_id)
+
+    def delete(self, product_id):
+        """Remove a cart line entirely."""
+        item = self.items.pop(product_id)
+        self.subtotal_cents -= item['price_cents'] * item['quantity']
+        self.item_count -= item['quantity']
+        position = self.positions.pop(product_id)
+        del self.order[position]
+        for later_key in self.order[position:]:
+            self.positions[later_key] -= 1
+        self._notify(self.REMOVED, product_id, position)
+
+    def clear(self):
+        self.items.clear()
+        self.order.clear()
+        self.positions.clear()
+        self.subtotal_cents = 0
+        self.item_count = 0
+        self._notify(self.CLEARED, None, None)
+
+    def product_id_at(self, position):
+        return self.order[position]
+
+    def position_of(self, product_id):
+        return self.positions[product_id]
+
+    def line_total_cents(self, product_id):
+        item = self.items[product_id]
+        return item['price_cents'] * item['quantity']
+
+    @property
+    def tax_cents(self):
+        return int((Decimal(self.subtotal_cents) * self.TAX_RATE).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+    @property
+    def total_cents(self):
+        return self.subtotal_cents + self.tax_cents
+
+    def subscribe(self, listener):
+        """
+        Register a function called as listener(event, product_id, position) after every change.
+
+        event is one of ADDED, UPDATED, REMOVED or CLEARED; product_id and position are None for CLEARED.
+        """
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def _validated(self, quantities, minimum):
+        if hasattr(quantities, 'items'):
+            quantities = quantities.items()
+        quantities = list(quantities)
+        for product_id, quantity in quantities:
+            if quantity < minimum:
+                raise ValueError(f"Invalid quantity {quantity} for product {product_id}")
+            if product_id not in self.items and self.products.get_product_info(product_id) is None:
+                raise KeyError(product_id)
+        return quantities
+
+    def _new_line(self, product_id):
+        product_info = self.products.get_product_info(product_id)
+        item = {
+            'name': product_info['name'],
+            'price': product_info['price'],
+            'price_cents': to_cents(product_info['price']),
+            'quantity': 0
+        }
+        self.items[product_id] = item
+        self.positions[product_id] = len(self.order)
+        self.order.append(product_id)
+        return item
+
+    def _change_quantity(self, product_id, item, delta):
+        item['quantity'] += delta
+        self.item_count += delta
+        self.subtotal_cents += item['price_cents'] * delta
+
+    def _notify(self, event, product_id, position=None):
+        if position is None and product_id is not None:
+            position = self.positions[product_id]
+        for listener in list(self.listeners):
+            listener(event, product_id, position)
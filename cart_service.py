@@ -0,0 +1,262 @@
+'''
+    Cart service.
+
+    Description: The cart and checkout logic of the shopping windows, scoped to sessions so one process can serve
+                 many shoppers at once. All sessions share one read-mostly catalog; each session has its own
+                 ShoppingCart guarded by its own lock, so shoppers never wait on each other. Adding to a cart
+                 reserves the units in the inventory for the session and removing them releases them again.
+                 Sessions that sit idle longer than their time-to-live are evicted along with their
+                 reservations. Checkout renews the reservations for every line in one atomic step before the
+                 order is sent for payment, and turns them into a sale once it is paid.
+'''
+
+
+import threading
+import time
+import uuid
+
+from cart import ShoppingCart
+from inventory import Inventory
+from orders import Order
+
+
+class SessionNotFound(KeyError):
+    """The session does not exist or was evicted for being idle."""
+
+
+class Session:
+    def __init__(self, session_id, cart, ttl):
+        """
+        Initialize the Session class.
+
+        Args:
+            session_id (str): The session's key in the CartService.
+            cart (ShoppingCart): The shopper's cart.
+            ttl (float): Seconds of inactivity before the session may be evicted, or None to keep it forever.
+        """
+        self.session_id = session_id
+        self.cart = cart
+        self.ttl = ttl
+        self.lock = threading.RLock()
+        self.last_used = time.monotonic()
+        self.pending_orders = 0
+        self.checkout_key = uuid.uuid4()
+
+    def idempotency_key(self, order):
+        """
+        Return the idempotency key of a checkout of this session's cart.
+
+        Every attempt to check out the same lines gets the same key, so retrying after a timeout can never
+        charge twice; a changed cart, or a new checkout after a paid one, gets a new key.
+        """
+        return uuid.uuid5(self.checkout_key, repr(order.lines)).hex
+
+    def expired(self, now):
+        return self.ttl is not None and not self.pending_orders and now - self.last_used > self.ttl
+
+
+class CartService:
+    DEFAULT_TTL = 30 * 60
+
+    def __init__(self, products, processor, inventory=None, session_ttl=DEFAULT_TTL):
+        """
+        Initialize the CartService class.
+
+        Args:
+            products (Products): The shared catalog.
+            processor (OrderProcessor): Charges checked-out orders.
+            inventory (Inventory, optional): Stock reserved by the carts. Defaults to an empty inventory, which
+                tracks nothing.
+            session_ttl (float, optional): Default idle time in seconds before a session is evicted; None
+                keeps sessions forever. Defaults to 30 minutes.
+        """
+        self.products = products
+        self.processor = processor
+        self.inventory = inventory if inventory is not None else Inventory()
+        self.session_ttl = session_ttl
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.last_sweep = time.monotonic()
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def create_session(self, cart=None, ttl=None):
+        """
+        Start a session.
+
+        Args:
+            cart (ShoppingCart, optional): An existing cart to use. Defaults to a new empty one.
+            ttl (float, optional): Idle time before eviction. Defaults to the service's session_ttl.
+
+        Returns:
+            str: The new session id.
+        """
+        session_id = uuid.uuid4().hex
+        session = Session(session_id, cart if cart is not None else ShoppingCart(self.products),
+                          ttl if ttl is not None else self.session_ttl)
+        with self.lock:
+            self.sessions[session_id] = session
+        self.evict_idle_if_due()
+        return session_id
+
+    def end_session(self, session_id):
+        """Drop a session and release the stock its cart was holding."""
+        with self.lock:
+            self.sessions.pop(session_id, None)
+        self.inventory.release(session_id)
+
+    def session(self, session_id):
+        """
+        Return a live session and mark it as used.
+
+        Raises:
+            SessionNotFound: If the session does not exist or has been evicted.
+        """
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise SessionNotFound(session_id)
+        session.last_used = time.monotonic()
+        return session
+
+    def cart(self, session_id):
+        return self.session(session_id).cart
+
+    def add_item(self, session_id, product_id, quantity=1):
+        """
+        Reserve units of a product and add them to a session's cart.
+
+        Raises:
+            OutOfStock: If the units are not available; the cart is unchanged.
+        """
+        session = self.session(session_id)
+        with session.lock:
+            self.inventory.reserve(session_id, product_id, quantity)
+            try:
+                session.cart.add(product_id, quantity)
+            except Exception:
+                self.inventory.release(session_id, {product_id: quantity})
+                raise
+
+    def remove_item(self, session_id, product_id, quantity=1):
+        """Remove units of a product from a session's cart and release their reservation."""
+        session = self.session(session_id)
+        with session.lock:
+            quantity = min(quantity, session.cart[product_id]['quantity'])
+            session.cart.remove(product_id, quantity)
+            self.inventory.release(session_id, {product_id: quantity})
+
+    def set_quantity(self, session_id, product_id, quantity):
+        """
+        Set the quantity of a product in a session's cart, reserving or releasing the difference.
+
+        Raises:
+            OutOfStock: If more units are needed than are available; the cart is unchanged.
+        """
+        session = self.session(session_id)
+        with session.lock:
+            current = session.cart[product_id]['quantity'] if product_id in session.cart else 0
+            if quantity > current:
+                self.add_item(session_id, product_id, quantity - current)
+            elif quantity < current:
+                self.remove_item(session_id, product_id, current - quantity)
+
+    def summary(self, session_id):
+        """
+        Return a snapshot of a session's cart.
+
+        Returns:
+            dict: lines as (product_id, name, price_cents, quantity) tuples, item_count, subtotal_cents,
+                tax_cents and total_cents.
+        """
+        session = self.session(session_id)
+        with session.lock:
+            cart = session.cart
+            return {
+                'lines': [(product_id, item['name'], item['price_cents'], item['quantity'])
+                          for product_id, item in zip(cart.keys(), cart.values())],
+                'item_count': cart.item_count,
+                'subtotal_cents': cart.subtotal_cents,
+                'tax_cents': cart.tax_cents,
+                'total_cents': cart.total_cents,
+            }
+
+    def checkout(self, session_id, details, callback=None):
+        """
+        Validate a session's cart and details, reserve the stock and submit the order for payment.
+
+        Returns as soon as the order is queued. When the payment succeeds, the reserved units become a sale and
+        the ordered lines are taken out of the cart; if it fails, the cart and its reservations stay as they
+        were. Then callback(order) is called, on the processor's callback thread. Checking out the same lines
+        again while the first order is pending or paid returns that order, and only the first one settles the
+        cart.
+
+        Args:
+            session_id (str): The shopper's session.
+            details (dict): Payment and shipping fields, keyed by Order.FIELDS.
+            callback (callable, optional): Receives the completed order.
+
+        Returns:
+            Order: The pending order.
+
+        Raises:
+            OrderValidationError: If the details or cart are invalid.
+            OutOfStock: If a reservation expired and its stock has been sold since.
+            QueueFull: If the order processor is saturated.
+        """
+        session = self.session(session_id)
+        with session.lock:
+            order = Order.from_cart(session.cart, details)
+            order.idempotency_key = session.idempotency_key(order)
+            order.validate()
+            self.inventory.ensure(session_id, self.order_quantities(order))
+            session.pending_orders += 1
+            try:
+                return self.processor.submit(
+                    order, lambda completed: self.finish_checkout(session, completed, callback, completed is order),
+                    block=False)
+            except Exception:
+                session.pending_orders -= 1
+                raise
+
+    def finish_checkout(self, session, order, callback, settle=True):
+        with session.lock:
+            session.pending_orders -= 1
+            if settle and order.status == Order.PAID:
+                session.checkout_key = uuid.uuid4()
+                self.inventory.commit(session.session_id, self.order_quantities(order))
+                # Only take out what was ordered, in case more was added to the cart while the payment was running
+                for product_id, name, price_cents, quantity in order.lines:
+                    if product_id in session.cart:
+                        session.cart.remove(product_id, quantity)
+        if callback is not None:
+            callback(order)
+
+    @staticmethod
+    def order_quantities(order):
+        quantities = {}
+        for product_id, name, price_cents, quantity in order.lines:
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+        return quantities
+
+    def evict_idle(self):
+        """
+        Drop every session that has been idle longer than its time-to-live.
+
+        Returns:
+            int: The number of sessions evicted.
+        """
+        now = time.monotonic()
+        with self.lock:
+            self.last_sweep = now
+            expired = [session_id for session_id, session in self.sessions.items() if session.expired(now)]
+            for session_id in expired:
+                del self.sessions[session_id]
+        for session_id in expired:
+            self.inventory.release(session_id)
+        return len(expired)
+
+    def evict_idle_if_due(self):
+        # Sweep at most ten times per TTL, so creating sessions stays O(1) amortized.
+        if self.session_ttl is not None and time.monotonic() - self.last_sweep > self.session_ttl / 10:
+            self.evict_idle()
@@ -0,0 +1,94 @@
+'''
+    Catalog ingest.
+
+    Description: The single path product records take into a product store. Records from any source (the demo
+                 list, nested category dictionaries, CSV or JSON rows) are normalized here to the
+                 (product_id, category, name, price, description, image_path) tuples every store accepts. Prices
+                 are turned into numbers once, at load time, however they were written ("$1,399.99", "499.99"
+                 or 499.99). An image can be a local path or an http(s) URL; rows may give it as image_path or
+                 image_url, and the thumbnail cache loads either.
+'''
+
+
+from decimal import Decimal, InvalidOperation
+
+
+REMOTE_PREFIXES = ("http://", "https://")
+
+
+def parse_price(value):
+    """
+    Convert a price written as a number or a string such as "$1,399.99" to a float.
+
+    Raises:
+        ValueError: If value is not a price, including NaN and infinities.
+    """
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        price = Decimal(value)
+    else:
+        text = str(value).strip().replace(",", "").replace("$", "", 1).strip()
+        try:
+            price = Decimal(text)
+        except InvalidOperation:
+            raise ValueError(f"Invalid price: {value!r}") from None
+    if not price.is_finite():
+        raise ValueError(f"Invalid price: {value!r}")
+    return float(price)
+
+
+def is_remote(image_path):
+    """Return True if an image source is a URL rather than a local file."""
+    return image_path.startswith(REMOTE_PREFIXES)
+
+
+def record_from_dict(row, product_id=None):
+    """
+    Normalize a product dictionary to a record tuple.
+
+    Args:
+        row (dict): Needs category, name and price; id, description and image_path or image_url are optional.
+        product_id (int, optional): Id to use when the row has none. Defaults to None.
+
+    Returns:
+        tuple: (product_id, category, name, price, description, image_path)
+    """
+    product_id = int(row['id']) if row.get('id') not in (None, "") else product_id
+    if product_id is None:
+        raise ValueError(f"Product {row.get('name')!r} has no id")
+    image_path = row.get('image_path') or row.get('image_url') or ""
+    return (product_id, row['category'], row['name'], parse_price(row['price']),
+            row.get('description') or "", image_path)
+
+
+def records_from_nested(catalog, first_id=1):
+    """
+    Yield records from a {category: {name: {price, description, image_url}}} dictionary, numbering them in order.
+
+    Args:
+        catalog (dict): Products grouped by category and keyed by name.
+        first_id (int, optional): Id of the first product. Defaults to 1.
+    """
+    product_id = first_id
+    for category, items in catalog.items():
+        for name, info in items.items():
+            yield record_from_dict(dict(info, category=category, name=name), product_id)
+            product_id += 1
+
+
+def normalize(record):
+    """Normalize a record tuple or a product dictionary to a record tuple with a numeric price."""
+    if isinstance(record, dict):
+        return record_from_dict(record)
+    product_id, category, name, price, description, image_path = record
+    return (product_id, category, name, parse_price(price), description, image_path)
+
+
+def load(products, records):
+    """
+    Add records to a product store, normalizing each one first.
+
+    Args:
+        products: Any product store (Products, SqliteProducts or ColumnarProducts).
+        records (iterable): Record tuples or product dictionaries.
+    """
+    products.add_products(normalize(record) for record in records)
@@ -0,0 +1,245 @@
+'''
+    Catalog hot reload.
+
+    Description: Keeps a product store in step with a JSON Lines catalog file while the application runs, so
+                 products can be changed without a restart. The file is polled with after(), and one stat of
+                 its modification time and size tells whether it changed at all. When it has, a background
+                 thread reads it and hashes every line; only lines whose hash is new are parsed. The number of
+                 lines listing each product is kept, so a product is removed only when its last line
+                 disappears without a replacement; if another line still lists it, that line is applied. The
+                 difference is applied to the store as one batch of adds, updates and removals, and the
+                 listener is told which products changed, so the windows redraw only those rows and drop only
+                 the thumbnails no longer used.
+                 A line may give the product's starting stock; it is put in the inventory when the product
+                 first appears, before the product can be sold.
+'''
+
+
+import json
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import compress
+
+import catalog
+
+
+FIELDS = ('category', 'name', 'price', 'description', 'image_path')
+
+
+class CatalogChanges:
+    def __init__(self, added, updated, removed, stale_images):
+        """
+        Initialize the CatalogChanges class.
+
+        Args:
+            added (list): Ids of new products.
+            updated (list): Ids of products whose record changed.
+            removed (list): Ids of products no longer in the catalog.
+            stale_images (set): Image paths that the changed products no longer use.
+        """
+        self.added = added
+        self.updated = updated
+        self.removed = removed
+        self.stale_images = stale_images
+
+    def __bool__(self):
+        return bool(self.added or self.updated or self.removed)
+
+    def __repr__(self):
+        return f"CatalogChanges({len(self.added)} added, {len(self.updated)} updated, {len(self.removed)} removed)"
+
+
+class CatalogFile:
+    DEFAULT_STOCK = 10
+
+    def __init__(self, path, products, inventory=None, default_stock=DEFAULT_STOCK):
+        """
+        Initialize the CatalogFile class. Nothing is read until the first reload.
+
+        Args:
+            path (str): JSON Lines file with one product per line, as accepted by catalog.record_from_dict;
+                every line needs an id, and may give the units in stock as 'stock'.
+            products: The product store to keep up to date (Products or SqliteProducts).
+            inventory (Inventory, optional): Stocked with the products of the first reload, and with each product
+                added later. Defaults to None (stock is not tracked).
+            default_stock (int, optional): Units of a product whose line gives no stock. Defaults to 10.
+        """
+        self.path = path
+        self.products = products
+        self.inventory = inventory
+        self.default_stock = default_stock
+        self.hashes = {}
+        # Product id mapped to the number of distinct lines listing it
+        self.line_counts = {}
+        self.stamp = None
+        self.loaded = False
+
+    def stat(self):
+        try:
+            status = os.stat(self.path)
+        except OSError:
+            return None
+        return status.st_mtime_ns, status.st_size
+
+    def changed(self):
+        """Return True if the file may have changed since it was last read. Costs one stat."""
+        return self.stat() != self.stamp
+
+    def reload(self):
+        """
+        Read the file and apply what changed since the last reload to the product store.
+
+        The first reload also removes the products already in the store that the file no longer lists, such as
+        products deleted from the file while a database-backed store was not running. Stock is kept in memory
+        only, so the first reload stocks every product in the file and later reloads stock the added ones.
+
+        Returns:
+            CatalogChanges: What changed; false if nothing did.
+
+        Raises:
+            OSError: If the file cannot be read.
+            ValueError: If a changed line is not a valid product; nothing is applied.
+        """
+        # Stamped before reading, so a write that lands during the read is picked up by the next check
+        self.stamp = self.stat()
+        with open(self.path, "rb") as file:
+            lines = file.read().splitlines()
+        # Hashing, membership tests and set differences all run in C; Python only sees the changed lines
+        hashes = list(map(hash, lines))
+        current = set(hashes)
+        known = self.hashes
+        new_hashes = current - known.keys()
+        fresh = {}
+        records = {}
+        stock = {}
+        for line_hash, line in compress(zip(hashes, lines), map(new_hashes.__contains__, hashes)):
+            if line.strip():
+                record, units = self.parse(line)
+                records[record[0]] = record
+                fresh[line_hash] = record[0]
+                stock[record[0]] = self.default_stock if units is None else units
+        gone = known.keys() - current
+        lost = Counter(known[line_hash] for line_hash in gone)
+        removed = []
+        relisted = set()
+        for product_id, count in lost.items():
+            if product_id in records:
+                continue
+            if self.line_counts[product_id] == count:
+                removed.append(product_id)
+            else:
+                relisted.add(product_id)
+        if relisted:
+            # Rare: a deleted line shared its id with one that stays, which may not be the one the store holds
+            for line_hash, line in zip(hashes, lines):
+                if known.get(line_hash) in relisted:
+                    record, units = self.parse(line)
+                    records[record[0]] = record
+                    stock[record[0]] = self.default_stock if units is None else units
+        if not self.loaded:
+            removed.extend(product_id for product_id in self.products.search_ids("") if product_id not in records)
+        added = []
+        updated = []
+        stale_images = set()
+        unchanged = []
+        for product_id, record in records.items():
+            product_info = self.products.get_product_info(product_id)
+            if product_info is None:
+                added.append(product_id)
+                continue
+            if tuple(product_info[field] for field in FIELDS) == record[1:]:
+                # The line was only reformatted, or the store already had it from the database of an earlier run
+                unchanged.append(product_id)
+                continue
+            updated.append(product_id)
+            if product_info['image_path'] != record[5]:
+                stale_images.add(product_info['image_path'])
+        for product_id in removed:
+            product_info = self.products.get_product_info(product_id)
+            if product_info is not None:
+                stale_images.add(product_info['image_path'])
+        if self.inventory is not None:
+            stocked = stock if not self.loaded else {product_id: stock[product_id] for product_id in added}
+            self.inventory.restock(stocked)
+        for product_id in unchanged:
+            del records[product_id]
+        if records or removed:
+            self.products.apply_changes(records.values(), removed)
+        for line_hash in gone:
+            del known[line_hash]
+        known.update(fresh)
+        line_counts = self.line_counts
+        for product_id, count in lost.items():
+            line_counts[product_id] -= count
+            if not line_counts[product_id]:
+                del line_counts[product_id]
+        for product_id in fresh.values():
+            line_counts[product_id] = line_counts.get(product_id, 0) + 1
+        self.loaded = True
+        stale_images.discard("")
+        return CatalogChanges(added, updated, removed, stale_images)
+
+    @staticmethod
+    def parse(line):
+        """Return the record of a catalog line and the units in stock it gives, or None if it gives none."""
+        try:
+            row = json.loads(line)
+            units = row.get('stock')
+            if units is not None and (type(units) is not int or units < 0):
+                raise ValueError(f"Invalid stock: {units!r}")
+            return catalog.record_from_dict(row), units
+        except (AttributeError, KeyError, TypeError, ValueError) as error:
+            raise ValueError(f"Invalid catalog line {line[:80]!r}: {error}") from None
+
+
+class CatalogWatcher:
+    POLL_INTERVAL_MS = 1000
+
+    def __init__(self, widget, dispatcher, catalog_file, on_change, interval_ms=POLL_INTERVAL_MS):
+        """
+        Initialize the CatalogWatcher class and start polling.
+
+        Args:
+            widget: A long-lived Tkinter widget used to schedule after() calls.
+            dispatcher (Dispatcher): Brings reload results back to the Tk thread.
+            catalog_file (CatalogFile): The file to watch, already loaded once.
+            on_change (callable): Receives the CatalogChanges of each reload that changed something, on the
+                Tk thread.
+            interval_ms (int, optional): Time between checks. Defaults to POLL_INTERVAL_MS.
+        """
+        self.widget = widget
+        self.dispatcher = dispatcher
+        self.catalog_file = catalog_file
+        self.on_change = on_change
+        self.interval_ms = interval_ms
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="catalog-reload")
+        self.reloading = False
+        self.after_id = self.widget.after(self.interval_ms, self.poll)
+
+    def poll(self):
+        self.after_id = self.widget.after(self.interval_ms, self.poll)
+        if not self.reloading and self.catalog_file.changed():
+            self.reloading = True
+            self.executor.submit(self.reload)
+
+    def reload(self):
+        try:
+            changes = self.catalog_file.reload()
+        except (OSError, ValueError) as error:
+            # Keep the catalog as it is; the file is read again once it changes
+            print(f"Catalog not reloaded: {error}", file=sys.stderr)
+            changes = None
+        self.dispatcher.post(self.finish, changes)
+
+    def finish(self, changes):
+        self.reloading = False
+        if changes:
+            self.on_change(changes)
+
+    def stop(self):
+        if self.after_id is not None:
+            self.widget.after_cancel(self.after_id)
+            self.after_id = None
+        self.executor.shutdown(wait=False, cancel_futures=True)
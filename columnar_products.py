@@ -0,0 +1,429 @@
+'''
+    Columnar product catalog.
+
+    Description: An alternative storage backend with the same public methods as the Products class in main.py,
+                 for catalogs too large to keep as one dictionary per product (python main.py --backend
+                 columnar). Every field lives in its own
+                 column: ids and prices in typed arrays, categories interned as small integer codes, and names,
+                 descriptions and image paths packed into contiguous NUL-separated byte tables. Filtering and
+                 sorting work on whole columns at once, using NumPy when it is installed. The columns are
+                 append-only, so a batch of updates or removals rebuilds them in one pass.
+'''
+
+
+import sys
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+
+from search_index import SearchCancelled
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class StringTable:
+    SEPARATOR = b"\0"
+
+    def __init__(self):
+        """
+        Initialize an empty string table.
+
+        Entries are stored UTF-8 encoded in one bytearray, each followed by a NUL byte, so an exact or
+        substring match over every entry is a single bytes.find loop instead of one comparison per object.
+        """
+        self.data = bytearray(self.SEPARATOR)
+        self.offsets = array('Q')
+        self.lowered = None
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, row):
+        start = self.offsets[row]
+        return self.data[start:self.data.index(self.SEPARATOR, start)].decode()
+
+    def append(self, text):
+        self.append_encoded(text.encode())
+
+    def append_encoded(self, data):
+        self.offsets.append(len(self.data))
+        self.data += data
+        self.data += self.SEPARATOR
+        self.lowered = None
+
+    def encoded(self, row):
+        """Return the UTF-8 bytes of an entry without decoding them."""
+        start = self.offsets[row]
+        return self.data[start:self.data.index(self.SEPARATOR, start)]
+
+    def find_exact(self, text):
+        """Return the first row whose entry equals text, or None."""
+        position = self.data.find(self.SEPARATOR + text.encode() + self.SEPARATOR)
+        if position == -1:
+            return None
+        return bisect_left(self.offsets, position + 1)
+
+    def find_substring(self, text):
+        """
+        Return the rows whose entry contains text, ignoring ASCII case.
+
+        Args:
+            text (str): The substring to look for.
+        """
+        if self.lowered is None:
+            self.lowered = bytes(self.data).lower()
+        needle = text.lower().encode()
+        rows = []
+        position = self.lowered.find(needle, 1)
+        while position != -1:
+            row = bisect_right(self.offsets, position) - 1
+            rows.append(row)
+            # Continue after the end of this entry so each row is reported once.
+            position = self.lowered.find(needle, self.lowered.index(self.SEPARATOR, position) + 1)
+        return rows
+
+    def nbytes(self):
+        return len(self.data) + self.offsets.itemsize * len(self.offsets)
+
+
+class ColumnarProducts:
+    SORT_FIELDS = ('name', 'price')
+
+    def __init__(self):
+        """
+        Initialize the ColumnarProducts class with empty columns.
+
+        The lock lets searches run on a background thread while a catalog reload swaps in rebuilt columns.
+        Every reader holds it, since a rebuild replaces the columns one at a time and row numbers are only
+        valid for the columns they were found in.
+        """
+        self.lock = threading.RLock()
+        self.ids = array('q')
+        self.prices = array('d')
+        self.category_codes = array('I')
+        self.category_names = []
+        self.category_lookup = {}
+        self.names = StringTable()
+        self.descriptions = StringTable()
+        self.image_paths = StringTable()
+        self.row_index = None
+        # Every row's position in (lowercased name, id) order, computed when a name sort first needs it
+        self.name_ranks = None
+        self.version = 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add_product(self, product_id, category, name, price, description, image_path):
+        """Add a product, or replace the one with the same id like Products does."""
+        self.apply_changes([(product_id, category, name, price, description, image_path)])
+
+    def _append(self, product_id, category, name, price, description, image_path):
+        if self.row_index is None and self.ids and product_id < self.ids[-1]:
+            # Ids stopped arriving in ascending order, so bisecting the id column no longer works.
+            self.row_index = {existing_id: row for row, existing_id in enumerate(self.ids)}
+        if self.row_index is not None:
+            self.row_index[product_id] = len(self.ids)
+        self.name_ranks = None
+        self.ids.append(product_id)
+        self.prices.append(price)
+        self.category_codes.append(self._intern_category(category))
+        self.names.append(name)
+        self.descriptions.append(description)
+        self.image_paths.append(image_path)
+
+    def add_products(self, records):
+        """
+        Bulk-load products.
+
+        Args:
+            records (iterable): Tuples of (product_id, category, name, price, description, image_path). An id
+                that is already in the catalog, or repeated in records, takes the values of its last record.
+        """
+        self.apply_changes(records)
+
+    def apply_changes(self, records, removed=()):
+        """
+        Add or replace many products and remove others as one change, e.g. when the catalog file is reloaded.
+
+        New products are appended; replacing or removing any product rebuilds every column once, keeping the
+        catalog order of the products that stay.
+
+        Args:
+            records (iterable): Tuples of (product_id, category, name, price, description, image_path) to add
+                or replace.
+            removed (iterable, optional): Ids of products to remove. Defaults to ().
+        """
+        with self.lock:
+            records = {record[0]: record for record in records}
+            removed = {product_id for product_id in removed if self._row(product_id) is not None}
+            if not removed and all(self._row(product_id) is None for product_id in records):
+                for record in records.values():
+                    self._append(*record)
+            else:
+                self._rebuild(records, removed)
+            self.version += 1
+
+    def _rebuild(self, records, removed):
+        columns = ColumnarProducts()
+        columns.category_names = list(self.category_names)
+        columns.category_lookup = dict(self.category_lookup)
+        for row, product_id in enumerate(self.ids):
+            if product_id in removed:
+                continue
+            record = records.pop(product_id, None)
+            if record is not None:
+                columns._append(*record)
+                continue
+            # Copy the row as stored, without decoding its strings
+            if columns.row_index is None and columns.ids and product_id < columns.ids[-1]:
+                columns.row_index = {existing_id: position for position, existing_id in enumerate(columns.ids)}
+            if columns.row_index is not None:
+                columns.row_index[product_id] = len(columns.ids)
+            columns.ids.append(product_id)
+            columns.prices.append(self.prices[row])
+            columns.category_codes.append(self.category_codes[row])
+            columns.names.append_encoded(self.names.encoded(row))
+            columns.descriptions.append_encoded(self.descriptions.encoded(row))
+            columns.image_paths.append_encoded(self.image_paths.encoded(row))
+        for record in records.values():
+            columns._append(*record)
+        for field in ('ids', 'prices', 'category_codes', 'category_names', 'category_lookup', 'names',
+                      'descriptions', 'image_paths', 'row_index', 'name_ranks'):
+            setattr(self, field, getattr(columns, field))
+
+    def get_product_info(self, product_id):
+        with self.lock:
+            row = self._row(product_id)
+            return None if row is None else self._materialize(row)
+
+    def get_products_by_category(self, category):
+        with self.lock:
+            return [self._materialize(row) for row in self.category_rows(category)]
+
+    def get_product_by_name(self, name):
+        with self.lock:
+            row = self.names.find_exact(name)
+            return None if row is None else self._materialize(row)
+
+    def get_products_by_price(self, min_price=None, max_price=None, descending=False):
+        """
+        Return products within a price range, ordered by price.
+
+        Args:
+            min_price (float, optional): Lowest price to include. Defaults to None (no lower bound).
+            max_price (float, optional): Highest price to include. Defaults to None (no upper bound).
+            descending (bool, optional): Most expensive first. Defaults to False.
+        """
+        with self.lock:
+            rows = self.sort_rows_by_price(self.price_rows(min_price, max_price), descending)
+            return [self._materialize(row) for row in rows]
+
+    def search(self, query, category=None, fields=("name",)):
+        """
+        Search the catalog by scanning the packed string tables.
+
+        Args:
+            query (str): Case-insensitive substring to look for. An empty query matches every product.
+            category (str, optional): Restrict results to this category. Defaults to None (all categories).
+            fields (tuple, optional): Product fields to match against. Defaults to names only.
+
+        Returns:
+            list: The matching product dictionaries in catalog order.
+        """
+        with self.lock:
+            return [self._materialize(row) for row in self.search_rows(query, category, fields)]
+
+    def search_ids(self, query, category=None, fields=("name",), cancelled=None):
+        """
+        Like search, but return the matching product ids instead of their dictionaries.
+
+        Args:
+            cancelled (callable, optional): Stop with SearchCancelled once this returns True. Defaults to None.
+        """
+        with self.lock:
+            rows = self.search_rows(query, category, fields)
+            if cancelled is not None and cancelled():
+                raise SearchCancelled()
+            return [self.ids[row] for row in rows]
+
+    def search_sorted(self, query, category=None, sort_by=None, descending=False, min_price=None, max_price=None,
+                      fields=("name",), cancelled=None):
+        """
+        Search the catalog and return the matching ids in name or price order, limited to a price range.
+
+        Args:
+            query (str): Case-insensitive substring to look for. An empty query matches every product.
+            category (str, optional): Restrict results to this category. Defaults to None (all categories).
+            sort_by (str, optional): 'name' or 'price'. Defaults to None (catalog order).
+            descending (bool, optional): Reverse the order. Defaults to False.
+            min_price (float, optional): Lowest price to include. Defaults to None (no lower bound).
+            max_price (float, optional): Highest price to include. Defaults to None (no upper bound).
+            fields (tuple, optional): Product fields to match against. Defaults to names only.
+            cancelled (callable, optional): Stop with SearchCancelled once this returns True. Defaults to None.
+
+        Returns:
+            list: The matching product ids.
+
+        Raises:
+            ValueError: If sort_by is not a sortable field.
+        """
+        if sort_by is not None and sort_by not in self.SORT_FIELDS:
+            raise ValueError(f"Cannot sort products by {sort_by!r}")
+        with self.lock:
+            rows = self._matching_rows(query, category, fields, min_price, max_price)
+            if cancelled is not None and cancelled():
+                raise SearchCancelled()
+            if np is None:
+                ids = self.ids
+                if sort_by == 'price':
+                    prices = self.prices
+                    rows = sorted(rows, key=lambda row: (prices[row], ids[row]), reverse=descending)
+                elif sort_by == 'name':
+                    rows = sorted(rows, key=self._name_ranks().__getitem__, reverse=descending)
+                return [ids[row] for row in rows]
+            ids = np.frombuffer(self.ids, dtype=np.int64)
+            if sort_by == 'price':
+                rows = rows[np.lexsort((ids[rows], np.frombuffer(self.prices, dtype=np.float64)[rows]))]
+            elif sort_by == 'name':
+                rows = rows[np.argsort(np.frombuffer(self._name_ranks(), dtype=np.int64)[rows])]
+            if sort_by is not None and descending:
+                rows = rows[::-1]
+            return ids[rows].tolist()
+
+    def search_rows(self, query, category=None, fields=("name",), min_price=None, max_price=None):
+        """Return the rows matching a search, in catalog order."""
+        with self.lock:
+            rows = self._matching_rows(query, category, fields, min_price, max_price)
+            return rows if np is None else rows.tolist()
+
+    def _matching_rows(self, query, category, fields, min_price=None, max_price=None):
+        # With NumPy the rows come back as an int64 array, filtered with boolean masks over the columns
+        rows = None
+        if query:
+            matches = set()
+            for field in fields:
+                matches.update(self._table(field).find_substring(query))
+            rows = sorted(matches)
+        code = None
+        if category is not None:
+            code = self.category_lookup.get(category)
+            if code is None:
+                return [] if np is None else np.empty(0, dtype=np.int64)
+        low = float('-inf') if min_price is None else min_price
+        high = float('inf') if max_price is None else max_price
+        if np is None:
+            codes = self.category_codes
+            prices = self.prices
+            return [row for row in (range(len(self.ids)) if rows is None else rows)
+                    if (code is None or codes[row] == code) and low <= prices[row] <= high]
+        rows = np.arange(len(self.ids), dtype=np.int64) if rows is None else np.array(rows, dtype=np.int64)
+        mask = None
+        if code is not None:
+            mask = np.frombuffer(self.category_codes, dtype=np.uint32)[rows] == code
+        if min_price is not None or max_price is not None:
+            prices = np.frombuffer(self.prices, dtype=np.float64)[rows]
+            in_range = (prices >= low) & (prices <= high)
+            mask = in_range if mask is None else mask & in_range
+        return rows if mask is None else rows[mask]
+
+    def _name_ranks(self):
+        if self.name_ranks is None:
+            names = self.names
+            ids = self.ids
+            order = sorted(range(len(ids)), key=lambda row: (names[row].lower(), ids[row]))
+            ranks = array('q', bytes(8 * len(order)))
+            for rank, row in enumerate(order):
+                ranks[row] = rank
+            self.name_ranks = ranks
+        return self.name_ranks
+
+    def category_rows(self, category):
+        """Return the rows of every product in category, in catalog order."""
+        with self.lock:
+            code = self.category_lookup.get(category)
+            if code is None:
+                return []
+            if np is not None:
+                return np.flatnonzero(np.frombuffer(self.category_codes, dtype=np.uint32) == code).tolist()
+            return [row for row, row_code in enumerate(self.category_codes) if row_code == code]
+
+    def price_rows(self, min_price=None, max_price=None):
+        """Return the rows whose price lies within the given bounds, in catalog order."""
+        low = float('-inf') if min_price is None else min_price
+        high = float('inf') if max_price is None else max_price
+        with self.lock:
+            if np is not None:
+                prices = np.frombuffer(self.prices, dtype=np.float64)
+                return np.flatnonzero((prices >= low) & (prices <= high)).tolist()
+            return [row for row, price in enumerate(self.prices) if low <= price <= high]
+
+    def sort_rows_by_price(self, rows, descending=False):
+        """Return rows ordered by price; ties keep catalog order."""
+        with self.lock:
+            if np is not None:
+                rows = np.asarray(rows, dtype=np.int64)
+                order = np.argsort(np.frombuffer(self.prices, dtype=np.float64)[rows], kind="stable")
+                rows = rows[order].tolist()
+            else:
+                rows = sorted(rows, key=self.prices.__getitem__)
+        if descending:
+            rows.reverse()
+        return rows
+
+    def memory_usage(self):
+        """
+        Report the memory held by each column.
+
+        Returns:
+            dict: Column name mapped to its size in bytes, plus a 'total' entry.
+        """
+        with self.lock:
+            return self._memory_usage()
+
+    def _memory_usage(self):
+        usage = {
+            'ids': self.ids.itemsize * len(self.ids),
+            'prices': self.prices.itemsize * len(self.prices),
+            'categories': self.category_codes.itemsize * len(self.category_codes)
+                          + sum(sys.getsizeof(name) for name in self.category_names),
+            'names': self.names.nbytes(),
+            'descriptions': self.descriptions.nbytes(),
+            'image_paths': self.image_paths.nbytes(),
+            'row_index': 0 if self.row_index is None else sys.getsizeof(self.row_index),
+            'name_ranks': 0 if self.name_ranks is None else self.name_ranks.itemsize * len(self.name_ranks),
+        }
+        usage['total'] = sum(usage.values())
+        return usage
+
+    def _row(self, product_id):
+        if self.row_index is not None:
+            return self.row_index.get(product_id)
+        row = bisect_left(self.ids, product_id)
+        if row < len(self.ids) and self.ids[row] == product_id:
+            return row
+        return None
+
+    def _intern_category(self, category):
+        code = self.category_lookup.get(category)
+        if code is None:
+            code = len(self.category_names)
+            category = sys.intern(category)
+            self.category_names.append(category)
+            self.category_lookup[category] = code
+        return code
+
+    def _table(self, field):
+        return {'name': self.names, 'description': self.descriptions, 'image_path': self.image_paths}[field]
+
+    def _materialize(self, row):
+        return {
+            'category': self.category_names[self.category_codes[row]],
+            'name': self.names[row],
+            'price': self.prices[row],
+            'description': self.descriptions[row],
+            'image_path': self.image_paths[row]
+        }
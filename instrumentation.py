@@ -0,0 +1,238 @@
+'''
+    Event-loop latency instrumentation.
+
+    Description: Opt-in profiling for the Tk user interface. When installed, every callback Tkinter registers
+                 (button commands, event bindings and after() callbacks) is wrapped so its duration lands in a
+                 per-handler histogram. A heartbeat scheduled with after() measures how late the event loop runs
+                 it, which exposes stalls, and a sampler thread records the main thread's stack while a handler
+                 is running slow. Nothing is patched unless install() is called, so the normal run pays nothing.
+                 Statistics are written to a JSON file at exit and can be shown in a window with F12.
+'''
+
+
+import atexit
+import json
+import logging
+import sys
+import threading
+import time
+import tkinter as tk
+import traceback
+from collections import Counter
+
+
+logger = logging.getLogger(__name__)
+
+BUCKET_BOUNDS_MS = (1, 2, 4, 8, 16, 33, 66, 125, 250, 500, 1000)
+
+
+def uninstrumented(func):
+    """Mark a callback so the profiler does not time it (used for its own heartbeat and key binding)."""
+    func._uninstrumented = True
+    return func
+
+
+def callback_target(func):
+    """Return the function a Tk callback will run, looking through the wrapper after() puts around it."""
+    code = getattr(func, '__code__', None)
+    if code is not None and func.__qualname__.endswith("after.<locals>.callit") and 'func' in code.co_freevars:
+        func = func.__closure__[code.co_freevars.index('func')].cell_contents
+    return func
+
+
+class HandlerStats:
+    def __init__(self):
+        """Initialize the HandlerStats class with an empty duration histogram."""
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+
+    def record(self, duration_ms):
+        self.count += 1
+        self.total += duration_ms
+        self.max = max(self.max, duration_ms)
+        for index, bound in enumerate(BUCKET_BOUNDS_MS):
+            if duration_ms < bound:
+                self.buckets[index] += 1
+                return
+        self.buckets[-1] += 1
+
+    def to_dict(self):
+        labels = [f"<{bound}ms" for bound in BUCKET_BOUNDS_MS] + [f">={BUCKET_BOUNDS_MS[-1]}ms"]
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count if self.count else 0.0,
+            'max_ms': self.max,
+            'histogram': dict(zip(labels, self.buckets)),
+        }
+
+
+class Profiler:
+    HEARTBEAT_MS = 50
+    SAMPLE_INTERVAL = 0.01
+
+    def __init__(self, root, report_path=None, slow_ms=50, stall_ms=100):
+        """
+        Initialize the Profiler class. Call install() to start profiling.
+
+        Args:
+            root: The root Tkinter window, used for the heartbeat and the stats window.
+            report_path (str, optional): JSON file written at exit. Defaults to None (no file).
+            slow_ms (float, optional): Handlers running longer than this are logged with stack samples.
+                Defaults to 50.
+            stall_ms (float, optional): Heartbeat lateness that counts as an event-loop stall. Defaults to 100.
+        """
+        self.root = root
+        self.report_path = report_path
+        self.slow_ms = slow_ms
+        self.stall_ms = stall_ms
+        self.handlers = {}
+        self.slow_calls = []
+        self.stalls = []
+        self.current = None
+        self.samples = Counter()
+        self.main_thread_id = threading.get_ident()
+        self.original_register = None
+        self.heartbeat_expected = None
+        self.running = False
+
+    def install(self):
+        """Start wrapping Tk callbacks, the heartbeat and the stack sampler."""
+        if self.running:
+            return
+        self.running = True
+        self.original_register = tk.Misc._register
+        profiler = self
+
+        def register(widget, func, subst=None, needcleanup=1):
+            if not getattr(callback_target(func), '_uninstrumented', False):
+                func = profiler.wrap(func)
+            return profiler.original_register(widget, func, subst, needcleanup)
+
+        tk.Misc._register = register
+        threading.Thread(target=self.sample_loop, name="ui-profiler", daemon=True).start()
+        self.schedule_heartbeat()
+        self.root.bind_all("<F12>", uninstrumented(lambda event: self.show_stats()))
+        if self.report_path:
+            atexit.register(self.dump, self.report_path)
+
+    def uninstall(self):
+        if self.running:
+            tk.Misc._register = self.original_register
+            self.running = False
+
+    def wrap(self, func):
+        name = self.handler_name(func)
+        stats = self.handlers.get(name)
+        if stats is None:
+            stats = self.handlers[name] = HandlerStats()
+        profiler = self
+
+        def timed(*args):
+            outer = profiler.current
+            started = time.perf_counter()
+            profiler.current = (name, started)
+            try:
+                return func(*args)
+            finally:
+                duration_ms = (time.perf_counter() - started) * 1000
+                profiler.current = outer
+                stats.record(duration_ms)
+                if duration_ms >= profiler.slow_ms:
+                    profiler.report_slow(name, duration_ms)
+
+        timed.__name__ = getattr(func, '__name__', 'callback')
+        return timed
+
+    @staticmethod
+    def handler_name(func):
+        target = callback_target(func)
+        target = getattr(target, '__func__', target)
+        name = getattr(target, '__qualname__', None) or type(target).__name__
+        code = getattr(target, '__code__', None)
+        if name.endswith("<lambda>") and code is not None:
+            name += f":{code.co_firstlineno}"
+        return f"{getattr(target, '__module__', '?')}.{name}"
+
+    def report_slow(self, name, duration_ms):
+        stacks = self.samples.most_common(3)
+        self.samples.clear()
+        self.slow_calls.append({
+            'handler': name,
+            'duration_ms': duration_ms,
+            'time': time.time(),
+            'stack_samples': [{'count': count, 'stack': stack} for stack, count in stacks],
+        })
+        logger.warning("Slow Tk handler %s took %.1f ms", name, duration_ms)
+        for stack, count in stacks:
+            logger.warning("  %d sample(s) in:\n%s", count, stack)
+
+    def sample_loop(self):
+        # Sample the main thread's stack while a handler has been running longer than slow_ms
+        while self.running:
+            time.sleep(self.SAMPLE_INTERVAL)
+            current = self.current
+            if current is None or (time.perf_counter() - current[1]) * 1000 < self.slow_ms:
+                continue
+            frame = sys._current_frames().get(self.main_thread_id)
+            if frame is not None:
+                self.samples["".join(traceback.format_stack(frame, limit=8))] += 1
+
+    def schedule_heartbeat(self):
+        self.heartbeat_expected = time.perf_counter() + self.HEARTBEAT_MS / 1000
+        self.root.after(self.HEARTBEAT_MS, self.heartbeat)
+
+    @uninstrumented
+    def heartbeat(self):
+        late_ms = (time.perf_counter() - self.heartbeat_expected) * 1000
+        if late_ms >= self.stall_ms:
+            self.stalls.append({'time': time.time(), 'late_ms': late_ms})
+            logger.warning("Tk event loop stalled for %.1f ms", late_ms)
+        if self.running:
+            self.schedule_heartbeat()
+
+    def stats(self):
+        """Return every collected statistic as a JSON-serializable dictionary."""
+        handlers = sorted(self.handlers.items(), key=lambda item: item[1].total, reverse=True)
+        return {
+            'handlers': {name: stats.to_dict() for name, stats in handlers if stats.count},
+            'slow_calls': self.slow_calls,
+            'stalls': self.stalls,
+        }
+
+    def dump(self, path):
+        """Write the statistics to a JSON file."""
+        with open(path, "w") as report:
+            json.dump(self.stats(), report, indent=2)
+
+    def summary(self):
+        lines = [f"{'handler':<60}{'calls':>7}{'mean ms':>9}{'max ms':>9}"]
+        for name, stats in self.stats()['handlers'].items():
+            lines.append(f"{name[-60:]:<60}{stats['count']:>7}{stats['mean_ms']:9.2f}{stats['max_ms']:9.2f}")
+        lines.append("")
+        lines.append(f"Slow handlers: {len(self.slow_calls)}    Event loop stalls: {len(self.stalls)}")
+        for stall in self.stalls[-5:]:
+            lines.append(f"  stall of {stall['late_ms']:.0f} ms at {time.strftime('%H:%M:%S', time.localtime(stall['time']))}")
+        return "\n".join(lines)
+
+    def show_stats(self):
+        """Open a window with the current statistics."""
+        window = tk.Toplevel(self.root)
+        window.title("UI Stats")
+        text = tk.Text(window, width=90, height=30, font=("Courier", 9))
+        text.insert("1.0", self.summary())
+        text.config(state=tk.DISABLED)
+        text.pack(fill=tk.BOTH, expand=True)
+
+
+def install(root, report_path=None, slow_ms=50, stall_ms=100):
+    """
+    Create and install a Profiler for the application rooted at root.
+
+    Returns:
+        Profiler: The installed profiler.
+    """
+    profiler = Profiler(root, report_path, slow_ms, stall_ms)
+    profiler.install()
+    return profiler
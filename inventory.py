@@ -0,0 +1,286 @@
+'''
+    Inventory.
+
+    Description: Stock counts for the catalog and the reservations carts hold against them. Adding to a cart
+                 reserves units for its holder (normally a cart session) for a limited time; shrinking the cart
+                 or letting the hold expire puts them back, and checkout turns them into a sale. Each product's
+                 stock is a sharded counter: its units are spread over several independently locked shards and
+                 every thread starts taking from its own, so many simultaneous reservations of one popular
+                 product do not queue up behind a single lock. Products that were never stocked are not tracked
+                 and never run out.
+'''
+
+
+import itertools
+import threading
+import time
+
+
+class OutOfStock(Exception):
+    def __init__(self, shortages):
+        """
+        Initialize the OutOfStock class.
+
+        Args:
+            shortages (dict): Product ids mapped to the number of units still available.
+        """
+        super().__init__("Not enough stock for product(s) " + ", ".join(str(product_id) for product_id in shortages))
+        self.shortages = shortages
+
+
+class ShardedCounter:
+    def __init__(self, shards):
+        """
+        Initialize the ShardedCounter class with zero units.
+
+        Args:
+            shards (int): Number of independently locked parts the units are spread over.
+        """
+        self.units = [0] * shards
+        self.locks = [threading.Lock() for _ in range(shards)]
+
+    def total(self):
+        return sum(self.units)
+
+    def add(self, quantity):
+        """Spread quantity units evenly over the shards."""
+        share, extra = divmod(quantity, len(self.units))
+        for shard, lock in enumerate(self.locks):
+            with lock:
+                self.units[shard] += share + (shard < extra)
+
+    def give_back(self, quantity, home):
+        with self.locks[home]:
+            self.units[home] += quantity
+
+    def take(self, quantity, home):
+        """
+        Take quantity units from shard home, or, if it has too few, from all the shards with every lock held.
+
+        A take never holds units while it is still looking for more, so a concurrent take can only fail when
+        the units are really gone.
+
+        Returns:
+            bool: False (and nothing taken) if there were not enough units in total.
+        """
+        with self.locks[home]:
+            if self.units[home] >= quantity:
+                self.units[home] -= quantity
+                return True
+        # Always locked in shard order, like set_stock, so two slow takes cannot deadlock
+        for lock in self.locks:
+            lock.acquire()
+        try:
+            if sum(self.units) < quantity:
+                return False
+            shards = len(self.units)
+            needed = quantity
+            for offset in range(shards):
+                shard = (home + offset) % shards
+                amount = min(self.units[shard], needed)
+                self.units[shard] -= amount
+                needed -= amount
+                if not needed:
+                    return True
+        finally:
+            for lock in self.locks:
+                lock.release()
+
+
+class Inventory:
+    SHARDS = 8
+    HOLD_SECONDS = 15 * 60
+
+    def __init__(self, levels=None, shards=SHARDS, hold_seconds=HOLD_SECONDS):
+        """
+        Initialize the Inventory class.
+
+        Args:
+            levels (dict, optional): Product ids mapped to units in stock. Defaults to None (nothing tracked).
+            shards (int, optional): Counter shards per product. Defaults to 8.
+            hold_seconds (float, optional): How long a reservation lasts without activity from its holder.
+                Defaults to 15 minutes.
+        """
+        self.shard_count = shards
+        self.hold_seconds = hold_seconds
+        self.counters = {}
+        self.counters_lock = threading.Lock()
+        self.holds = {}
+        self.expiry = {}
+        self.hold_locks = [threading.Lock() for _ in range(shards)]
+        self.local = threading.local()
+        self.shard_numbers = itertools.count()
+        self.last_sweep = time.monotonic()
+        self.restock(levels or {})
+
+    def __len__(self):
+        """Return the number of products whose stock is tracked."""
+        return len(self.counters)
+
+    def available(self, product_id):
+        """Return the units in stock and not reserved, or None if the product is not tracked."""
+        counter = self.counters.get(product_id)
+        return None if counter is None else counter.total()
+
+    def restock(self, quantities):
+        """
+        Add stock for many products at once, starting to track any that were not tracked yet.
+
+        Args:
+            quantities (dict): Product ids mapped to the units received.
+        """
+        for product_id, quantity in quantities.items():
+            self.counter(product_id).add(quantity)
+
+    def set_stock(self, product_id, units):
+        """Set the units available for a product, for example after a stock take."""
+        counter = self.counter(product_id)
+        for lock in counter.locks:
+            lock.acquire()
+        try:
+            share, extra = divmod(units, self.shard_count)
+            counter.units[:] = [share + (shard < extra) for shard in range(self.shard_count)]
+        finally:
+            for lock in counter.locks:
+                lock.release()
+
+    def reserve(self, holder, product_id, quantity):
+        self.reserve_many(holder, {product_id: quantity})
+
+    def reserve_many(self, holder, quantities):
+        """
+        Reserve units of several products for holder, all or nothing, and extend the holder's hold.
+
+        Args:
+            holder: Who the units are held for, e.g. a cart session id.
+            quantities (dict): Product ids mapped to units.
+
+        Raises:
+            OutOfStock: If any tracked product has too few units; nothing is reserved.
+        """
+        home = self.home_shard()
+        taken = []
+        shortages = {}
+        for product_id, quantity in quantities.items():
+            counter = self.counters.get(product_id)
+            if counter is None or quantity <= 0:
+                continue
+            if counter.take(quantity, home):
+                taken.append((counter, quantity))
+            else:
+                shortages[product_id] = counter.total()
+        if shortages:
+            for counter, quantity in taken:
+                counter.give_back(quantity, home)
+            raise OutOfStock(shortages)
+        with self.hold_lock(holder):
+            hold = self.holds.setdefault(holder, {})
+            for product_id, quantity in quantities.items():
+                if product_id in self.counters and quantity > 0:
+                    hold[product_id] = hold.get(product_id, 0) + quantity
+            self.expiry[holder] = time.monotonic() + self.hold_seconds
+        self.expire_if_due()
+
+    def ensure(self, holder, quantities):
+        """
+        Make sure holder holds at least quantities, reserving whatever is missing (e.g. after the hold expired).
+
+        Raises:
+            OutOfStock: If the missing units are not available.
+        """
+        held = self.held(holder)
+        missing = {product_id: quantity - held.get(product_id, 0) for product_id, quantity in quantities.items()
+                   if quantity > held.get(product_id, 0)}
+        if missing:
+            self.reserve_many(holder, missing)
+        else:
+            with self.hold_lock(holder):
+                if holder in self.expiry:
+                    self.expiry[holder] = time.monotonic() + self.hold_seconds
+
+    def held(self, holder):
+        """Return a copy of the units holder has reserved, keyed by product id."""
+        with self.hold_lock(holder):
+            return dict(self.holds.get(holder, {}))
+
+    def release(self, holder, quantities=None):
+        """
+        Put units held by holder back into stock; never more than the holder actually holds.
+
+        Args:
+            holder: Who the units are held for.
+            quantities (dict, optional): Product ids mapped to units. Defaults to None (everything held).
+        """
+        self.restore(self.take_hold(holder, quantities))
+
+    def commit(self, holder, quantities):
+        """Turn units held by holder into a sale: they leave the hold without going back into stock."""
+        self.take_hold(holder, quantities)
+
+    def restore(self, quantities):
+        home = self.home_shard()
+        for product_id, quantity in quantities.items():
+            self.counters[product_id].give_back(quantity, home)
+
+    def take_hold(self, holder, quantities, expired_before=None):
+        with self.hold_lock(holder):
+            hold = self.holds.get(holder)
+            if not hold or (expired_before is not None and self.expiry[holder] >= expired_before):
+                return {}
+            if quantities is None:
+                taken = hold.copy()
+                hold.clear()
+            else:
+                taken = {}
+                for product_id, quantity in quantities.items():
+                    amount = min(quantity, hold.get(product_id, 0))
+                    if amount > 0:
+                        taken[product_id] = amount
+                        hold[product_id] -= amount
+                        if not hold[product_id]:
+                            del hold[product_id]
+            if not hold:
+                del self.holds[holder]
+                self.expiry.pop(holder, None)
+            return taken
+
+    def expire(self):
+        """
+        Release every hold whose holder has been inactive for longer than hold_seconds.
+
+        Returns:
+            int: The number of holds released.
+        """
+        now = time.monotonic()
+        self.last_sweep = now
+        expired = 0
+        for holder, deadline in list(self.expiry.items()):
+            # The deadline is checked again under the holder's lock, in case the holder was active meanwhile
+            if deadline < now:
+                returned = self.take_hold(holder, None, expired_before=now)
+                self.restore(returned)
+                expired += bool(returned)
+        return expired
+
+    def expire_if_due(self):
+        # Sweep at most ten times per hold period, so reserving stays O(1) amortized.
+        if time.monotonic() - self.last_sweep > self.hold_seconds / 10:
+            self.expire()
+
+    def counter(self, product_id):
+        counter = self.counters.get(product_id)
+        if counter is None:
+            with self.counters_lock:
+                counter = self.counters.setdefault(product_id, ShardedCounter(self.shard_count))
+        return counter
+
+    def home_shard(self):
+        # Each thread gets its own starting shard, so concurrent reservations start on different locks
+        try:
+            return self.local.shard
+        except AttributeError:
+            self.local.shard = next(self.shard_numbers) % self.shard_count
+            return self.local.shard
+
+    def hold_lock(self, holder):
+        return self.hold_locks[hash(holder) % len(self.hold_locks)]
@@ -0,0 +1,83 @@
+'''
+    Search-as-you-type.
+
+    Description: Debounces keystrokes with after(), runs the query on a background thread and hands the results
+                 back to the Tk thread through a Dispatcher. Each query gets a generation number and a cancel
+                 flag; starting a newer query cancels the older one, and results from any query that is no
+                 longer the newest are dropped. A query that fails is logged and shows no results.
+'''
+
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from search_index import SearchCancelled
+
+
+logger = logging.getLogger(__name__)
+
+
+class LiveSearch:
+    DEFAULT_DELAY_MS = 150
+
+    def __init__(self, widget, dispatcher, search, on_results, delay_ms=DEFAULT_DELAY_MS):
+        """
+        Initialize the LiveSearch class.
+
+        Args:
+            widget: The Tkinter widget used to schedule the debounce timer.
+            dispatcher (Dispatcher): Delivers results to the Tk thread.
+            search (callable): Runs a query; called as search(*args, cancelled=callable) on a worker thread.
+            on_results (callable): Receives the results of the newest query on the Tk thread.
+            delay_ms (int, optional): Quiet period after the last keystroke. Defaults to DEFAULT_DELAY_MS.
+        """
+        self.widget = widget
+        self.dispatcher = dispatcher
+        self.search = search
+        self.on_results = on_results
+        self.delay_ms = delay_ms
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="live-search")
+        self.generation = 0
+        self.after_id = None
+        self.cancel_event = threading.Event()
+
+    def schedule(self, *args):
+        """Run the query after the debounce delay, replacing any query that has not started yet."""
+        self.cancel_timer()
+        self.after_id = self.widget.after(self.delay_ms, self.run, *args)
+
+    def run(self, *args):
+        """Run the query now, cancelling any query that is still in progress."""
+        self.cancel_timer()
+        self.cancel_event.set()
+        self.cancel_event = threading.Event()
+        self.generation += 1
+        self.executor.submit(self.work, self.generation, self.cancel_event, args)
+
+    def cancel_timer(self):
+        if self.after_id is not None:
+            self.widget.after_cancel(self.after_id)
+            self.after_id = None
+
+    def work(self, generation, cancel_event, args):
+        if cancel_event.is_set():
+            return
+        try:
+            results = self.search(*args, cancelled=cancel_event.is_set)
+        except SearchCancelled:
+            return
+        except Exception:
+            # Still answer, so the list does not keep showing the results of an older query
+            logger.exception("Search %r failed", args)
+            results = []
+        self.dispatcher.post(self.deliver, generation, results)
+
+    def deliver(self, generation, results):
+        if generation == self.generation:
+            self.on_results(results)
+
+    def shutdown(self):
+        self.cancel_timer()
+        self.cancel_event.set()
+        self.executor.shutdown(wait=False, cancel_futures=True)
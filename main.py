@@ -12,17 +12,76 @@
 '''
 
 
+import time
+
+IMPORT_STARTED = time.perf_counter()
+
+import argparse
+import os
+import sys
+import threading
 import tkinter as tk
-from tkinter import ttk
-from PIL import Image, ImageTk
+from bisect import bisect_left, bisect_right
+from tkinter import messagebox, ttk
+
+import catalog
+import receipts
+from asset_pack import AssetPack
+from cart import ShoppingCart, format_cents
+from cart_service import CartService
+from catalog_watch import CatalogFile, CatalogWatcher
+from inventory import Inventory, OutOfStock
+from live_search import LiveSearch
+from order_journal import OrderJournal
+from orders import Order, OrderProcessor, OrderValidationError, QueueFull, StubPaymentGateway
+from recommendations import CoOccurrenceIndex
+from search_index import SearchIndex
+from sorted_view import SortedView
+from thumbnails import ThumbnailCache
+from tk_dispatch import Dispatcher
+from virtual_tree import VirtualTreeview
 
 
 class Products:
-    def __init__(self):
-        """Initialize the Products class with an empty dictionary to store product information."""
+    PRODUCT_FIELDS = ('category', 'name', 'price', 'description', 'image_path')
+    # Sort a filtered result directly when it is this many times smaller than the index range it comes from
+    DIRECT_SORT_RATIO = 8
+
+    def __init__(self, search_fields=SearchIndex.DEFAULT_FIELDS):
+        """
+        Initialize the Products class with an empty dictionary to store product information.
+
+        Secondary indexes are kept alongside the dictionary so lookups never scan the whole catalog:
+        a name -> product ids map, lists of (price, product id) and (lowercased name, product id) pairs
+        kept in sorted order, and the search index, whose category facets double as the category -> ordered product ids index.
+        The two sorted lists are replaced rather than edited when the catalog changes, so a SortedView taken
+        from them keeps its rows in place. The lock lets searches run on a background thread while the catalog
+        changes, and version is bumped on every change so views can tell whether what they display is stale.
+
+        Args:
+            search_fields (tuple, optional): Product fields the search index covers. Defaults to names only.
+        """
         self.products = {}
+        self.index = SearchIndex(search_fields)
+        self.names = {}
+        self.prices = []
+        self.sorted_names = []
+        self.lock = threading.RLock()
+        self.version = 0
+
+    def __len__(self):
+        return len(self.products)
 
     def add_product(self, product_id, category, name, price, description, image_path):
+        with self.lock:
+            self._add_product(product_id, category, name, price, description, image_path)
+            self.version += 1
+
+    def _add_product(self, product_id, category, name, price, description, image_path):
+        if product_id in self.products:
+            self._update_product(product_id, dict(category=category, name=name, price=price,
+                                                  description=description, image_path=image_path))
+            return
         self.products[product_id] = {
             'category': category,
             'name': name,
@@ -30,77 +89,497 @@ class Products:
             'description': description,
             'image_path': image_path
         }
+        self.index.add(product_id, self.products[product_id])
+        self.names.setdefault(name, {})[product_id] = None
+        self.prices = self._patch_sorted(self.prices, (), [(price, product_id)])
+        self.sorted_names = self._patch_sorted(self.sorted_names, (), [(name.lower(), product_id)])
+
+    def add_products(self, records):
+        """
+        Bulk-load products, sorting the price index once instead of inserting into it per product.
+
+        Args:
+            records (iterable): Tuples of (product_id, category, name, price, description, image_path). An id
+                that is already in the catalog, or repeated in records, takes the values of its last record.
+        """
+        with self.lock:
+            self._add_products(records)
+            self.version += 1
+
+    def _add_products(self, records):
+        # The last record of an id wins; existing products are updated once the new ones are sorted in
+        batch = {record[0]: record for record in records}
+        updates = []
+        prices = []
+        sorted_names = []
+        for product_id, category, name, price, description, image_path in batch.values():
+            if product_id in self.products:
+                updates.append((product_id, dict(category=category, name=name, price=price,
+                                                 description=description, image_path=image_path)))
+                continue
+            self.products[product_id] = {
+                'category': category,
+                'name': name,
+                'price': price,
+                'description': description,
+                'image_path': image_path
+            }
+            self.index.add(product_id, self.products[product_id])
+            self.names.setdefault(name, {})[product_id] = None
+            prices.append((price, product_id))
+            sorted_names.append((name.lower(), product_id))
+        if prices:
+            prices[:0] = self.prices
+            prices.sort()
+            self.prices = prices
+            sorted_names[:0] = self.sorted_names
+            sorted_names.sort()
+            self.sorted_names = sorted_names
+        for product_id, fields in updates:
+            self._update_product(product_id, fields)
+
+    def update_product(self, product_id, **fields):
+        """
+        Change some fields of an existing product and keep every index consistent.
+
+        Args:
+            product_id: The unique identifier of the product to update.
+            **fields: New values for any of PRODUCT_FIELDS.
+
+        Raises:
+            KeyError: If the product does not exist or an unknown field is given.
+        """
+        with self.lock:
+            self._update_product(product_id, fields)
+            self.version += 1
+
+    def _update_product(self, product_id, fields):
+        product_info = self.products[product_id]
+        unknown = set(fields) - set(self.PRODUCT_FIELDS)
+        if unknown:
+            raise KeyError(f"Unknown product fields: {', '.join(sorted(unknown))}")
+        if 'name' in fields and fields['name'] != product_info['name']:
+            self._unlink_name(product_id, product_info['name'])
+            self.names.setdefault(fields['name'], {})[product_id] = None
+            self.sorted_names = self._patch_sorted(self.sorted_names, [(product_info['name'].lower(), product_id)],
+                                                   [(fields['name'].lower(), product_id)])
+        if 'price' in fields and fields['price'] != product_info['price']:
+            self.prices = self._patch_sorted(self.prices, [(product_info['price'], product_id)],
+                                             [(fields['price'], product_id)])
+        product_info.update(fields)
+        self.index.update(product_id, product_info)
+
+    def remove_product(self, product_id):
+        """
+        Remove a product and its index entries.
+
+        Args:
+            product_id: The unique identifier of the product to remove.
+
+        Returns:
+            dict: The removed product information, or None if the product did not exist.
+        """
+        with self.lock:
+            product_info = self.products.pop(product_id, None)
+            if product_info is None:
+                return None
+            self.index.remove(product_id)
+            self._unlink_name(product_id, product_info['name'])
+            self.prices = self._patch_sorted(self.prices, [(product_info['price'], product_id)], ())
+            self.sorted_names = self._patch_sorted(self.sorted_names, [(product_info['name'].lower(), product_id)], ())
+            self.version += 1
+            return product_info
+
+    def apply_changes(self, records, removed=()):
+        """
+        Add or replace many products and remove others as one change, e.g. when the catalog file is reloaded.
+
+        The price and name orders are patched in a single pass instead of once per product, so a few hundred
+        changes to a large catalog cost about one copy of each list.
+
+        Args:
+            records (iterable): Tuples of (product_id, category, name, price, description, image_path) to add
+                or replace; each product id at most once.
+            removed (iterable, optional): Ids of products to remove. Defaults to ().
+        """
+        with self.lock:
+            old_prices, new_prices, old_names, new_names = [], [], [], []
+            for product_id, category, name, price, description, image_path in records:
+                product_info = self.products.get(product_id)
+                if product_info is None:
+                    product_info = self.products[product_id] = {
+                        'category': category,
+                        'name': name,
+                        'price': price,
+                        'description': description,
+                        'image_path': image_path
+                    }
+                    self.index.add(product_id, product_info)
+                    self.names.setdefault(name, {})[product_id] = None
+                    new_prices.append((price, product_id))
+                    new_names.append((name.lower(), product_id))
+                    continue
+                if price != product_info['price']:
+                    old_prices.append((product_info['price'], product_id))
+                    new_prices.append((price, product_id))
+                if name != product_info['name']:
+                    self._unlink_name(product_id, product_info['name'])
+                    self.names.setdefault(name, {})[product_id] = None
+                    old_names.append((product_info['name'].lower(), product_id))
+                    new_names.append((name.lower(), product_id))
+                product_info.update(category=category, name=name, price=price, description=description,
+                                    image_path=image_path)
+                self.index.update(product_id, product_info)
+            for product_id in removed:
+                product_info = self.products.pop(product_id, None)
+                if product_info is None:
+                    continue
+                self.index.remove(product_id)
+                self._unlink_name(product_id, product_info['name'])
+                old_prices.append((product_info['price'], product_id))
+                old_names.append((product_info['name'].lower(), product_id))
+            self.prices = self._patch_sorted(self.prices, old_prices, new_prices)
+            self.sorted_names = self._patch_sorted(self.sorted_names, old_names, new_names)
+            self.version += 1
+
+    @staticmethod
+    def _patch_sorted(entries, removed, added):
+        # Returns a new list instead of editing entries, so SortedViews taken earlier keep a consistent snapshot.
+        # Find where each change goes in the current list, then copy the untouched runs between them once
+        cuts = sorted([(bisect_left(entries, entry), 1, entry) for entry in removed] +
+                      [(bisect_left(entries, entry), 0, entry) for entry in added])
+        patched = []
+        start = 0
+        for position, remove, entry in cuts:
+            patched.extend(entries[start:position])
+            if remove:
+                start = position + 1
+            else:
+                patched.append(entry)
+                start = position
+        patched.extend(entries[start:])
+        return patched
 
     def get_product_info(self, product_id):
         return self.products.get(product_id)
     
     def get_products_by_category(self, category):
-        return [product_info for product_info in self.products.values() if product_info['category'] == category]
+        return [self.products[product_id] for product_id in self.index.category_ids(category)]
     
     def get_product_by_name(self, name):
-        for product_id, product_info in self.products.items():
-            if product_info['name'] == name:
-                return product_info
-        return None
+        product_id = self.get_product_id_by_name(name)
+        return None if product_id is None else self.products[product_id]
+
+    def get_product_id_by_name(self, name):
+        product_ids = self.names.get(name)
+        return next(iter(product_ids)) if product_ids else None
+
+    def get_products_by_price(self, min_price=None, max_price=None, descending=False):
+        """
+        Return products within a price range, ordered by price.
+
+        Args:
+            min_price (float, optional): Lowest price to include. Defaults to None (no lower bound).
+            max_price (float, optional): Highest price to include. Defaults to None (no upper bound).
+            descending (bool, optional): Most expensive first. Defaults to False.
+        """
+        start, end = self._price_range(min_price, max_price)
+        entries = self.prices[start:end]
+        if descending:
+            entries.reverse()
+        return [self.products[product_id] for price, product_id in entries]
+
+    def sorted_ids(self, sort_by, descending=False, min_price=None, max_price=None, among=None):
+        """
+        Return product ids in name or price order, limited to a price range and optionally to some ids.
+
+        The price range is found by bisecting the price index. The result is normally a lazy SortedView over
+        the name or price index, so nothing gets sorted and each page costs only its own rows; ids that are
+        few compared to the range are sorted directly instead, which is cheaper than walking the range.
+
+        Args:
+            sort_by (str): 'name' or 'price'.
+            descending (bool, optional): Reverse the order. Defaults to False.
+            min_price (float, optional): Lowest price to include. Defaults to None (no lower bound).
+            max_price (float, optional): Highest price to include. Defaults to None (no upper bound).
+            among (collection, optional): Only include these product ids. Defaults to None (every product).
+
+        Returns:
+            sequence: The product ids; supports len() and slicing.
+
+        Raises:
+            ValueError: If sort_by is not a sortable field.
+        """
+        with self.lock:
+            start, end = self._price_range(min_price, max_price)
+            if sort_by == 'price':
+                entries = self.prices
+                key = lambda product_id: (self.products[product_id]['price'], product_id)
+            elif sort_by == 'name':
+                entries = self.sorted_names
+                key = lambda product_id: (self.products[product_id]['name'].lower(), product_id)
+                if start or end < len(self.prices):
+                    in_range = {product_id for price, product_id in self.prices[start:end]}
+                    among = in_range if among is None else in_range.intersection(among)
+                start, end = 0, len(entries)
+            else:
+                raise ValueError(f"Cannot sort products by {sort_by!r}")
+            if among is not None and len(among) * self.DIRECT_SORT_RATIO < end - start:
+                low, high = entries[start], entries[end - 1]
+                keys = [entry for entry in map(key, among) if low <= entry <= high]
+                keys.sort(reverse=descending)
+                return [product_id for sort_key, product_id in keys]
+            return SortedView(entries, start, end, descending, among)
+
+    def search(self, query, category=None, fields=("name",)):
+        """
+        Search the catalog through the inverted index.
+
+        Args:
+            query (str): Case-insensitive substring to look for. An empty query matches every product.
+            category (str, optional): Restrict results to this category. Defaults to None (all categories).
+            fields (tuple, optional): Product fields to match against. Defaults to names only.
+
+        Returns:
+            list: The matching product dictionaries in catalog order.
+        """
+        return [self.products[product_id] for product_id in self.search_ids(query, category, fields)]
+
+    def search_ids(self, query, category=None, fields=("name",), cancelled=None):
+        """
+        Like search, but return the matching product ids instead of their dictionaries.
+
+        Args:
+            cancelled (callable, optional): Stop with SearchCancelled once this returns True. Defaults to None.
+        """
+        with self.lock:
+            return self.index.search(query, category, fields, cancelled)
+
+    def search_sorted(self, query, category=None, sort_by=None, descending=False, min_price=None, max_price=None,
+                      fields=("name",), cancelled=None):
+        """
+        Search the catalog and return the matching ids in name or price order, limited to a price range.
+
+        Args:
+            query (str): Case-insensitive substring to look for. An empty query matches every product.
+            category (str, optional): Restrict results to this category. Defaults to None (all categories).
+            sort_by (str, optional): 'name' or 'price'. Defaults to None (catalog order).
+            descending (bool, optional): Reverse the order. Defaults to False.
+            min_price (float, optional): Lowest price to include. Defaults to None (no lower bound).
+            max_price (float, optional): Highest price to include. Defaults to None (no upper bound).
+            fields (tuple, optional): Product fields to match against. Defaults to names only.
+            cancelled (callable, optional): Stop with SearchCancelled once this returns True. Defaults to None.
+
+        Returns:
+            sequence: The matching product ids; supports len() and slicing.
+        """
+        with self.lock:
+            if sort_by is None:
+                product_ids = self.index.search(query, category, fields, cancelled)
+                if min_price is None and max_price is None:
+                    return product_ids
+                low = float('-inf') if min_price is None else min_price
+                high = float('inf') if max_price is None else max_price
+                return [product_id for product_id in product_ids if low <= self.products[product_id]['price'] <= high]
+            matches = self.index.match(query, category, fields, cancelled)
+            # An empty query matches a live view of the index, which a reload would change under the SortedView
+            return self.sorted_ids(sort_by, descending, min_price, max_price,
+                                   None if len(matches) == len(self.products) else frozenset(matches))
+
+    def _price_range(self, min_price, max_price):
+        start = 0 if min_price is None else bisect_left(self.prices, (min_price,))
+        end = len(self.prices) if max_price is None else bisect_right(self.prices, (max_price, float('inf')))
+        return start, end
+
+    def _unlink_name(self, product_id, name):
+        product_ids = self.names[name]
+        del product_ids[product_id]
+        if not product_ids:
+            del self.names[name]
 
     
-# Product database
-products = Products()
-products.add_product(1, "Consoles", "PlayStation 5", 469.99, "Immerse yourself in cutting-edge graphics and innovative features.", "images/ps5.jpg")
-products.add_product(2, "Consoles", "Xbox Series X", 449.99, "Experience top-notch performance and a vast gaming library.", "images/xbox_series_x.jpg")
-products.add_product(3, "Consoles", "Nintendo Switch", 299.99, "Seamlessly switch between TV and handheld modes for an unparalleled gaming adventure.", "images/nintendo_switch.jpg")
-products.add_product(4, "Consoles", "PlayStation 4 Pro", 349.99, "Immerse yourself in stunning 4K graphics and enhanced gaming features.", "images/ps4_pro.jpg")
-products.add_product(5, "Consoles", "Xbox One S", 279.99, "Enjoy a vast world of entertainment with this stylish gaming console.", "images/xbox_one_s.jpg")
-products.add_product(6, "Laptops", "MacBook", 1299.99, "This sleek and powerful laptop is designed for optimal performance and efficiency.", "images/macbook.jpg")
-products.add_product(7, "Laptops", "Dell XPS", 999.99, "This high-performance laptop combines power and style for seamless productivity.", "images/dell.jpg")
-products.add_product(8, "Laptops", "HP Spectre x360", 1199.99, "This convertible laptop boasts a sleek design and versatile functionality.", "images/hp_spectre.jpg")
-products.add_product(9, "Laptops", "Lenovo ThinkPad", 899.99, "This business-grade laptop offers robust features and reliability.", "images/lenovo_thinkpad.jpg")
-products.add_product(10, "Laptops", "Asus ROG Zephyrus", 1499.99, "This high-end gaming laptop delivers unparalleled performance and cutting-edge specifications.", "images/asus_rog.jpg")
-products.add_product(11, "Appliances", "Refrigerator", 799.99, "Keep your food fresh and organized while minimizing environmental impact.", "images/fridge.jpg")
-products.add_product(12, "Appliances", "Washing Machine", 499.99, "Enjoy efficiency and advanced features for hassle-free cleaning.", "images/washing_machine.jpg")
-products.add_product(13, "Appliances", "Dishwasher", 349.99, "Experience hassle-free cleaning and enjoy more time for the things you love.", "images/dishwasher.jpg")
-products.add_product(14, "Appliances", "Microwave Oven", 129.99, "Perfect for quick and easy meals, it's a must-have in any modern kitchen.", "images/microwave.jpg")
-products.add_product(15, "Appliances", "Air Purifier", 199.99, "Enhance your home environment and prioritize your well-being with this essential appliance.", "images/air_purifier.jpg")
-    
+# The catalog the application loads at startup and reloads whenever the file changes
+DEFAULT_CATALOG = "catalog.jsonl"
+
+# Product stores create_products can make
+BACKENDS = ('memory', 'columnar', 'sqlite')
+
+
+def create_products(catalog_db=None, backend=None):
+    """
+    Create an empty product store. Loading the catalog into it is left to load_catalog.
+
+    Args:
+        catalog_db (str, optional): SQLite catalog file. Defaults to None (keep the catalog in memory).
+        backend (str, optional): One of BACKENDS. Defaults to None ('sqlite' when catalog_db is given, else
+            'memory').
+
+    Raises:
+        ValueError: If the backend is unknown, or catalog_db is given for a backend other than 'sqlite'.
+    """
+    backend = backend or ('sqlite' if catalog_db else 'memory')
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}; expected one of {', '.join(BACKENDS)}")
+    if catalog_db and backend != 'sqlite':
+        raise ValueError("A catalog database needs the sqlite backend")
+    if backend == 'sqlite':
+        from sqlite_products import SqliteProducts
+        return SqliteProducts(catalog_db or ":memory:")
+    if backend == 'columnar':
+        from columnar_products import ColumnarProducts
+        return ColumnarProducts()
+    return Products()
+
+
+def load_catalog(products, catalog_file=None):
+    """
+    Load the catalog file into a product store, stocking the catalog file's inventory from its lines.
+
+    Args:
+        products: The product store.
+        catalog_file (CatalogFile, optional): The catalog to load. Defaults to None (DEFAULT_CATALOG, without
+            an inventory).
+
+    Returns:
+        CatalogFile: The loaded catalog, to be watched for changes. A missing file is loaded once it appears.
+
+    Raises:
+        ValueError: If the file holds an invalid product.
+    """
+    catalog_file = catalog_file or CatalogFile(DEFAULT_CATALOG, products)
+    if catalog_file.changed():
+        catalog_file.reload()
+    return catalog_file
+
+
+class StartupTimer:
+    def __init__(self, started):
+        """
+        Initialize the StartupTimer class.
+
+        Args:
+            started (float): time.perf_counter() value at which startup began.
+        """
+        self.started = started
+        self.last = started
+        self.phases = []
+
+    def mark(self, phase):
+        """Record that phase finished now."""
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def report(self):
+        lines = [f"{phase:<20}{duration * 1000:8.1f} ms" for phase, duration in self.phases]
+        lines.append(f"{'total':<20}{(self.last - self.started) * 1000:8.1f} ms")
+        return "\n".join(lines)
+
 
 class WindowController:
     DEFAULT_WIDTH = 450
     DEFAULT_HEIGHT = 450
+    IMAGE_HEIGHT = 150
 
-    def __init__(self, root, products, shopping_cart):
+    def __init__(self, root, products, shopping_cart, journal_dir="journal", inventory=None):
         """
         Initialize the WindowController class. Controls window navigation, opening and closing.
 
         Args:
             root: The root Tkinter window.
             products (Products): An instance of the Products class containing product information.
-            shopping_cart (dict): The shopping cart dictionary to keep track of selected items.
+            shopping_cart (ShoppingCart): The shopping cart keeping track of selected items and totals.
+            journal_dir (str, optional): Directory of the journal paid orders are recorded in. Defaults to "journal".
+            inventory (Inventory, optional): Stock the cart reserves from. Defaults to None (stock is not tracked).
         """
         self.root = root
         self.products = products
         self.current_window = None
         self.shopping_cart = shopping_cart
+        self.dispatcher = Dispatcher(root)
+        self.thumbnails = ThumbnailCache(self.dispatcher, pack=AssetPack.open_if_exists())
+        self.order_processor = OrderProcessor(StubPaymentGateway(), self.dispatcher)
+        self.journal = OrderJournal(journal_dir)
+        self.order_processor.subscribe(self.record_order)
+        # Orders paid from now on are counted as they complete, so the journal rebuild stops at this moment
+        self.recommendations = CoOccurrenceIndex()
+        self.order_processor.subscribe(self.recommendations.record_order)
+        threading.Thread(target=self.recommendations.load_journal, args=(journal_dir, time.time()),
+                         name="recommendations", daemon=True).start()
+        self.inventory = inventory if inventory is not None else Inventory()
+        self.cart_service = CartService(products, self.order_processor, self.inventory, session_ttl=None)
+        self.session_id = self.cart_service.create_session(shopping_cart)
+        self.catalog_watcher = None
+        self.views = {}
+
+    def show_view(self, window_class):
+        """
+        Show the window of window_class and hide the current one.
 
-    def create_window(self, window_class, *args, **kwargs):
-        window = window_class(self.root, self, self.products, self.shopping_cart, *args, **kwargs)
-        window.geometry(f"{self.DEFAULT_WIDTH}x{self.DEFAULT_HEIGHT}+{self.center_x()}+{self.center_y()}")
+        Each window is built the first time it is shown and then kept alive, withdrawn while hidden, so
+        navigating back to it only refreshes what changed since it was last visible.
+
+        Args:
+            window_class: ShoppingWindow, CartWindow or CheckoutWindow.
+        """
+        window = self.views.get(window_class)
+        if window is None:
+            window = window_class(self.root, self, self.products, self.shopping_cart)
+            window.geometry(f"{self.DEFAULT_WIDTH}x{self.DEFAULT_HEIGHT}+{self.center_x()}+{self.center_y()}")
+            window.protocol("WM_DELETE_WINDOW", self.quit)
+            self.views[window_class] = window
+        else:
+            window.refresh()
+            window.deiconify()
+        if self.current_window is not None and self.current_window is not window:
+            self.current_window.withdraw()
         self.current_window = window
 
+    def on_catalog_loaded(self):
+        """Refresh the open window once the catalog has finished loading in the background."""
+        if self.current_window is not None:
+            self.current_window.refresh()
+
+    def watch_catalog(self, catalog_file):
+        """Apply changes to the catalog file while the application runs."""
+        self.catalog_watcher = CatalogWatcher(self.root, self.dispatcher, catalog_file, self.on_catalog_changed)
+
+    def on_catalog_changed(self, changes):
+        """
+        Redraw only what a catalog reload changed: drop the thumbnails no longer used and update the product list.
+
+        Args:
+            changes (CatalogChanges): The products added, updated and removed.
+        """
+        for image_path in changes.stale_images:
+            self.thumbnails.invalidate(image_path)
+        shopping_window = self.views.get(ShoppingWindow)
+        if shopping_window is not None:
+            shopping_window.catalog_changed(changes)
+
     def show_shopping_window(self):
-        self.close_current_window()
-        self.create_window(ShoppingWindow)
+        self.show_view(ShoppingWindow)
 
     def show_cart_window(self):
-        self.close_current_window()
-        self.create_window(CartWindow)
+        self.show_view(CartWindow)
 
     def show_checkout_window(self):
-        self.close_current_window()
-        self.create_window(CheckoutWindow)
-
-    def close_current_window(self):
-        if self.current_window:
-            self.current_window.destroy()
+        self.show_view(CheckoutWindow)
+
+    def record_order(self, order):
+        """Append a paid order to the journal. Runs on an order worker thread and does not wait for the disk."""
+        if order.status == Order.PAID:
+            self.journal.append(order.to_record())
+
+    def quit(self):
+        """Close every window and end the application."""
+        if self.catalog_watcher is not None:
+            self.catalog_watcher.stop()
+        self.thumbnails.shutdown()
+        self.order_processor.shutdown(wait=True)
+        self.journal.close()
+        self.dispatcher.stop()
+        self.root.destroy()
 
     def center_x(self):
         return (self.root.winfo_screenwidth() - self.DEFAULT_WIDTH) // 2
@@ -109,6 +588,52 @@ class WindowController:
         return (self.root.winfo_screenheight() - self.DEFAULT_HEIGHT) // 2
 
 
+class AlsoBoughtStrip(tk.Frame):
+    MAX_ITEMS = 3
+
+    def __init__(self, parent, products, on_choose, side=tk.TOP):
+        """
+        Initialize the AlsoBoughtStrip class, a row of buttons naming products customers also bought.
+
+        Args:
+            parent: The containing widget.
+            products (Products): Looks up the names of suggested products.
+            on_choose (callable): Called with the product id of a button when it is clicked.
+            side (str, optional): Which way the buttons are stacked. Defaults to tk.TOP (one per line).
+        """
+        super().__init__(parent)
+        self.products = products
+        self.on_choose = on_choose
+        self.side = side
+        self.label = tk.Label(self, text="Customers also bought:")
+        self.buttons = []
+
+    def show(self, product_ids):
+        """
+        Show buttons for the first MAX_ITEMS suggestions still in the catalog, or nothing if there are none.
+
+        Args:
+            product_ids (list): Suggested product ids, best first.
+        """
+        for button in self.buttons:
+            button.destroy()
+        self.buttons = []
+        for product_id in product_ids:
+            product_info = self.products.get_product_info(product_id)
+            if product_info is None:
+                continue
+            button = tk.Button(self, text=product_info['name'], command=lambda product_id=product_id: self.on_choose(product_id))
+            self.buttons.append(button)
+            if len(self.buttons) == self.MAX_ITEMS:
+                break
+        if self.buttons:
+            self.label.pack(side=self.side, anchor=tk.W)
+            for button in self.buttons:
+                button.pack(side=self.side, anchor=tk.W, padx=2)
+        else:
+            self.label.pack_forget()
+
+
 class ShoppingWindow(tk.Toplevel):
     def __init__(self, root, controller, products, shopping_cart):
         """
@@ -118,17 +643,25 @@ class ShoppingWindow(tk.Toplevel):
             root: The root Tkinter window.
             controller (WindowController): The window controller for handling window navigation.
             products (Products): An instance of the Products class containing product information.
-            shopping_cart (dict): The shopping cart dictionary to keep track of selected items.
+            shopping_cart (ShoppingCart): The shopping cart keeping track of selected items and totals.
         """
         super().__init__(root)
         self.title("Shopping")
         self.controller = controller
         self.products = products
         self.shopping_cart = shopping_cart
+        self.displayed_image_path = None
+        self.shown_product_id = None
+        self.typed_query = ""
+        self.results_version = None
+        self.sort_by = None
+        self.sort_descending = False
 
         self.search_frame = tk.Frame(self)
         self.entry_search = tk.Entry(self.search_frame)
         self.entry_search.pack(side=tk.LEFT, pady=10)
+        self.entry_search.bind("<KeyRelease>", self.on_search_typed)
+        self.entry_search.bind("<Return>", self.on_search)
         
         self.button_search = tk.Button(self.search_frame, text="Search", command=self.on_search)
         self.button_search.pack(side=tk.LEFT, padx=5) 
@@ -140,14 +673,28 @@ class ShoppingWindow(tk.Toplevel):
         self.category_menu = tk.OptionMenu(self, self.category_var, "All", "Consoles", "Laptops", "Appliances", command=self.on_search)
         self.category_menu.pack(pady=10)
 
+        self.price_frame = tk.Frame(self)
+        tk.Label(self.price_frame, text="Min $").pack(side=tk.LEFT)
+        self.entry_min_price = tk.Entry(self.price_frame, width=8)
+        self.entry_min_price.pack(side=tk.LEFT, padx=5)
+        tk.Label(self.price_frame, text="Max $").pack(side=tk.LEFT)
+        self.entry_max_price = tk.Entry(self.price_frame, width=8)
+        self.entry_max_price.pack(side=tk.LEFT, padx=5)
+        for entry in (self.entry_min_price, self.entry_max_price):
+            entry.bind("<KeyRelease>", self.on_price_typed)
+            entry.bind("<Return>", self.on_search)
+        self.price_frame.pack()
+
         self.listbox_frame = tk.Frame(self)
         self.tree = ttk.Treeview(self.listbox_frame, columns=("Name", "Price"), show="headings")
-        self.tree.heading("Name", text="Name")
-        self.tree.heading("Price", text="Price")
+        self.tree.heading("Name", text="Name", command=lambda: self.sort_results("name"))
+        self.tree.heading("Price", text="Price", command=lambda: self.sort_results("price"))
         self.tree.column("Name", width=120)
         self.tree.column("Price", width=70, anchor=tk.E)
         self.tree.pack(side=tk.LEFT)
         self.tree.bind("<ButtonRelease-1>", self.show_selected_item)
+        self.product_rows = VirtualTreeview(self.tree, self.product_row)
+        self.live_search = LiveSearch(self, controller.dispatcher, self.search_products, self.show_results)
 
         self.item_display_frame = tk.Frame(self.listbox_frame, padx=10)
         self.item_image_label = tk.Label(self.item_display_frame, text="")
@@ -156,11 +703,19 @@ class ShoppingWindow(tk.Toplevel):
         self.item_description_label = tk.Label(self.item_display_frame, text="", width=55, height=3, wraplength=220)
         self.item_description_label.pack()
 
+        self.also_bought = AlsoBoughtStrip(self.item_display_frame, self.products, self.select_product)
+        self.also_bought.pack(pady=5)
+
         self.item_display_frame.pack(side=tk.LEFT, padx=10)
         self.listbox_frame.pack(pady=10)
 
-        self.add_to_cart_button = tk.Button(self, text="Add to Cart", command=self.add_to_cart)
-        self.add_to_cart_button.pack(pady=10)
+        self.add_frame = tk.Frame(self)
+        self.quantity_var = tk.IntVar(value=1)
+        self.quantity_spinbox = tk.Spinbox(self.add_frame, from_=1, to=999, width=4, textvariable=self.quantity_var)
+        self.quantity_spinbox.pack(side=tk.LEFT, padx=5)
+        self.add_to_cart_button = tk.Button(self.add_frame, text="Add to Cart", command=self.add_to_cart)
+        self.add_to_cart_button.pack(side=tk.LEFT)
+        self.add_frame.pack(pady=10)
         self.filter_frame = tk.Frame(self)
         self.filter_btn = tk.Button(self, text="Filter", command=lambda: self.filter_frame.place(x=self.winfo_width()-100, y=0, anchor=tk.NE))
         self.filter_btn.place(x=self.winfo_width()-100, y=0, anchor=tk.NE)
@@ -174,23 +729,110 @@ class ShoppingWindow(tk.Toplevel):
 
         self.on_search()
 
-    def update_list(self, category, search_query=None):
+    def update_list(self, category, search_query=None, debounce=False):
         """
         Update the displayed product list based on the selected category and search query.
 
+        The search runs on a background thread; show_results displays the matches when it finishes. Results
+        are sorted by the chosen column and limited to the price range in the price fields.
+
         Args:
             category (str): The selected category for filtering products.
             search_query (str, optional): The search query for filtering products by name. Defaults to None.
+            debounce (bool, optional): Wait for a pause in typing before searching. Defaults to False.
+        """
+        category = None if category == "All" else category
+        self.results_version = self.products.version
+        args = (search_query, category, self.sort_by, self.sort_descending,
+                self.price_limit(self.entry_min_price), self.price_limit(self.entry_max_price))
+        if debounce:
+            self.live_search.schedule(*args)
+        else:
+            self.live_search.run(*args)
+
+    def price_limit(self, entry):
+        """Return the price typed into a price field, or None if it is empty or not a price."""
+        text = entry.get().strip()
+        try:
+            price = catalog.parse_price(text) if text else None
+        except ValueError:
+            price = None
+        entry.config(fg="red" if text and price is None else "black")
+        return price
+
+    def sort_results(self, sort_by):
         """
-        self.tree.delete(*self.tree.get_children())
-        if category == "All":
-            products = list(self.products.products.values())
+        Sort the results by a column; sorting by the same column again reverses the order.
+
+        Args:
+            sort_by (str): 'name' or 'price'.
+        """
+        if sort_by == self.sort_by:
+            self.sort_descending = not self.sort_descending
+        else:
+            self.sort_by = sort_by
+            self.sort_descending = False
+        for column in ("Name", "Price"):
+            arrow = ""
+            if column.lower() == self.sort_by:
+                arrow = " \u25bc" if self.sort_descending else " \u25b2"
+            self.tree.heading(column, text=column + arrow)
+        self.on_search()
+
+    def search_products(self, *args, cancelled=None):
+        """Run a search on the live search thread, counting the results there so the Tk thread never has to."""
+        results = self.products.search_sorted(*args, cancelled=cancelled)
+        # A SQLite result set counts its rows on the first len(), which is a query of its own; it remembers the
+        # count afterwards
+        len(results)
+        return results
+
+    def show_results(self, product_ids):
+        """
+        Display the product ids found by the most recent search.
+
+        Args:
+            product_ids (sequence): Matching product ids in display order; may be a lazy sorted view.
+        """
+        if self.winfo_exists():
+            self.product_rows.set_rows(product_ids)
+
+    def refresh(self):
+        """Rerun the current search if the catalog changed since it last ran."""
+        if self.products.version != self.results_version:
+            self.on_search()
+
+    def catalog_changed(self, changes):
+        """
+        Update the list and the product on display after a catalog reload, touching only the changed rows.
+
+        Args:
+            changes (CatalogChanges): The products added, updated and removed.
+        """
+        # Rows of removed products stay in the list until the new results arrive; show them as removed
+        self.product_rows.refresh_rows(changes.updated + changes.removed)
+        removed = set(changes.removed)
+        selected = [item for item in self.tree.selection() if self.product_rows.key_for(item) in removed]
+        if selected:
+            self.tree.selection_remove(selected)
+        if self.shown_product_id in removed:
+            self.clear_product()
+        elif self.shown_product_id in changes.updated:
+            self.show_product(self.shown_product_id)
+        unfiltered = (not self.entry_search.get() and self.category_var.get() == "All" and self.sort_by is None
+                      and not self.entry_min_price.get().strip() and not self.entry_max_price.get().strip())
+        if changes.added or changes.removed or not unfiltered:
+            # Membership or order may have changed; the new results are diffed against the rows on screen
+            self.on_search()
         else:
-            products = self.products.get_products_by_category(category)
-        if search_query:
-            products = [product for product in products if search_query.lower() in product['name'].lower()]
-        for product in products:
-            self.tree.insert("", "end", values=(product['name'], "${:.2f}".format(product['price'])))
+            # In catalog order an update can only change a row's values, which refresh_rows has done
+            self.results_version = self.products.version
+
+    def product_row(self, product_id):
+        product = self.products.get_product_info(product_id)
+        if product is None:
+            return ("(removed)", "")
+        return (product['name'], "${:.2f}".format(product['price']))
 
     def on_search(self, *args):
         """
@@ -202,27 +844,51 @@ class ShoppingWindow(tk.Toplevel):
         selected_category = self.category_var.get()
         search_query = self.entry_search.get()
         self.update_list(selected_category, search_query)
+
+    def on_search_typed(self, event):
+        """
+        Search as the user types, once they pause.
+
+        Args:
+            event: The key event (not used).
+        """
+        search_query = self.entry_search.get()
+        if search_query != self.typed_query:
+            self.typed_query = search_query
+            self.update_list(self.category_var.get(), search_query, debounce=True)
+
+    def on_price_typed(self, event):
+        """
+        Filter by price as the user types, once they pause.
+
+        Args:
+            event: The key event (not used).
+        """
+        self.update_list(self.category_var.get(), self.entry_search.get(), debounce=True)
+
+    def destroy(self):
+        self.live_search.shutdown()
+        super().destroy()
     
     def add_to_cart(self):
         """
         Add the selected product to the shopping cart.
 
-        Retrieves the selected product from the list and updates the shopping cart accordingly.
+        Adds the quantity chosen in the spinbox of the product on display to the shopping cart in one operation.
         """
-        selected_item = self.tree.focus()
-        if selected_item:
-            item_values = self.tree.item(selected_item, "values")
-            product_name = item_values[0]
-            product_price = float(item_values[1][1:])
-            if product_name:
-                if product_name not in self.shopping_cart:
-                    self.shopping_cart[product_name] = {
-                        'name': product_name,
-                        'price': product_price,
-                        'quantity': 1
-                    }
-                else:
-                    self.shopping_cart[product_name]['quantity'] += 1
+        product_id = self.shown_product_id
+        if product_id is None:
+            return
+        try:
+            quantity = self.quantity_var.get()
+        except tk.TclError:
+            quantity = 1
+        if quantity > 0:
+            try:
+                self.controller.cart_service.add_item(self.controller.session_id, product_id, quantity)
+            except OutOfStock as error:
+                messagebox.showwarning("Out of Stock", f"Only {error.shortages[product_id]} left in stock.", parent=self)
+            self.show_stock(product_id)
     
     def show_selected_item(self, event):
         """
@@ -232,22 +898,105 @@ class ShoppingWindow(tk.Toplevel):
             event: The event triggering the action (not used).
         """
         selected_item = self.tree.focus()
-        if selected_item:
-            item_values = self.tree.item(selected_item, "values")
-            product_name = item_values[0]
-            product_info = self.products.get_product_by_name(product_name)
-            description = product_info['description']
-            image_path = product_info['image_path']
-            
-            original_image = Image.open(image_path)
-            original_width = original_image.size[0]
-            new_size = (int(original_width), 150)
-            resized_image = original_image.resize(new_size, Image.LANCZOS)
-            photo = ImageTk.PhotoImage(resized_image)
-            self.item_image_label.config(image=photo)
-            self.item_image_label.image = photo
-            self.item_image_label.config(width=new_size[0], height=150, anchor="n")
-            self.item_description_label.config(text=description)
+        product_id = self.product_rows.key_for(selected_item)
+        if product_id is not None:
+            self.show_product(product_id)
+            self.prefetch_neighbours(selected_item)
+
+    def select_product(self, product_id):
+        """
+        Display a product chosen from the suggestions, selecting its row if it is in the list.
+
+        Args:
+            product_id: The product to display.
+        """
+        if self.products.get_product_info(product_id) is None:
+            return
+        if self.tree.exists(str(product_id)):
+            self.tree.selection_set(str(product_id))
+            self.tree.focus(str(product_id))
+            self.tree.see(str(product_id))
+        else:
+            self.tree.selection_set(())
+        self.show_product(product_id)
+
+    def show_product(self, product_id):
+        """
+        Display a product's description, stock, image and what customers bought along with it.
+
+        Args:
+            product_id: The product to display. If it has been removed from the catalog, nothing is shown.
+        """
+        product_info = self.products.get_product_info(product_id)
+        if product_info is None:
+            self.clear_product()
+            return
+        self.shown_product_id = product_id
+        self.show_stock(product_id)
+        self.displayed_image_path = product_info['image_path']
+        self.controller.thumbnails.request(product_info['image_path'], self.controller.IMAGE_HEIGHT,
+                                           lambda photo: self.show_image(product_info['image_path'], photo))
+        self.also_bought.show(self.controller.recommendations.recommend(product_id))
+
+    def clear_product(self):
+        """Empty the product display."""
+        self.shown_product_id = None
+        self.displayed_image_path = None
+        self.item_description_label.config(text="")
+        self.item_image_label.config(image="")
+        self.item_image_label.image = None
+        self.also_bought.show([])
+
+    def show_stock(self, product_id):
+        """Show a product's description along with how many units are left, if its stock is tracked."""
+        product_info = self.products.get_product_info(product_id)
+        if product_info is None:
+            self.clear_product()
+            return
+        text = product_info['description']
+        available = self.controller.inventory.available(product_id)
+        if available is not None:
+            text += f"\n{available} in stock" if available else "\nOut of stock"
+        self.item_description_label.config(text=text)
+
+    def show_image(self, image_path, photo):
+        """
+        Display a thumbnail delivered by the thumbnail cache, unless the selection has moved on.
+
+        Args:
+            image_path (str): The image the thumbnail was loaded from.
+            photo (PhotoImage): The loaded thumbnail, or None if loading failed.
+        """
+        if image_path != self.displayed_image_path or not self.winfo_exists():
+            return
+        if photo is None:
+            self.item_image_label.config(image="")
+            self.item_image_label.image = None
+            return
+        self.item_image_label.config(image=photo)
+        self.item_image_label.image = photo
+        self.item_image_label.config(width=photo.width(), height=self.controller.IMAGE_HEIGHT, anchor="n")
+
+    def prefetch_neighbours(self, item, count=2):
+        """
+        Warm the thumbnail cache for the rows around item so moving through the list is instant.
+
+        Args:
+            item (str): The Treeview item that was selected.
+            count (int, optional): How many rows to prefetch on each side. Defaults to 2.
+        """
+        neighbours = []
+        previous_item = next_item = item
+        for _ in range(count):
+            previous_item = previous_item and self.tree.prev(previous_item)
+            next_item = next_item and self.tree.next(next_item)
+            neighbours.extend(row for row in (previous_item, next_item) if row)
+        image_paths = []
+        for row in neighbours:
+            product_info = self.products.get_product_info(self.product_rows.key_for(row))
+            if product_info:
+                image_paths.append(product_info['image_path'])
+        self.controller.thumbnails.prefetch(image_paths, self.controller.IMAGE_HEIGHT)
 
 
 class CartWindow(tk.Toplevel):
@@ -259,7 +1008,7 @@ class CartWindow(tk.Toplevel):
             root: The root Tkinter window.
             controller (WindowController): The window controller for handling window navigation.
             products (Products): An instance of the Products class containing product information.
-            shopping_cart (dict): The shopping cart dictionary to keep track of selected items.
+            shopping_cart (ShoppingCart): The shopping cart keeping track of selected items and totals.
         """
         super().__init__(root)
         self.title("Shopping Cart")
@@ -270,12 +1019,17 @@ class CartWindow(tk.Toplevel):
         self.cart_label = tk.Label(self, text="Shopping Cart")
         self.cart_label.pack(pady=10)
 
-        self.cart_listbox = tk.Listbox(self, height=10, width=80)
-        self.cart_listbox.pack(pady=10)
+        self.cart_tree = ttk.Treeview(self, columns=("Item",), show="", height=10, selectmode="browse")
+        self.cart_tree.column("Item", width=480)
+        self.cart_tree.pack(pady=10)
+        self.cart_rows = VirtualTreeview(self.cart_tree, self.cart_row)
 
         self.total_label = tk.Label(self, text="Total: $0.00")
         self.total_label.pack(pady=10)
 
+        self.also_bought = AlsoBoughtStrip(self, self.products, self.add_product, side=tk.LEFT)
+        self.also_bought.pack()
+
         button_frame = tk.Frame(self)
         button_frame.pack(pady=10)
 
@@ -288,46 +1042,90 @@ class CartWindow(tk.Toplevel):
         self.back_to_shopping_button = tk.Button(button_frame, text="Continue Shopping", command=self.controller.show_shopping_window)
         self.back_to_shopping_button.pack(side=tk.RIGHT, padx=5)
 
+        self.shopping_cart.subscribe(self.on_cart_changed)
         self.update_listbox()
 
     def add_to_cart(self):
         """
         Increase the quantity of the selected item in the shopping cart.
         """
-        selected_index = self.cart_listbox.curselection()
-        if selected_index:
-            product_id = list(self.shopping_cart.keys())[selected_index[0]]
-            self.shopping_cart[product_id]['quantity'] += 1
-        self.update_listbox()
+        product_id = self.selected_product_id()
+        if product_id is not None:
+            self.add_product(product_id)
+
+    def add_product(self, product_id):
+        """
+        Add one unit of a product to the shopping cart, warning the user if it is out of stock.
+
+        Args:
+            product_id: The product to add.
+        """
+        try:
+            self.controller.cart_service.add_item(self.controller.session_id, product_id)
+        except OutOfStock:
+            messagebox.showwarning("Out of Stock", "There are no more of this item in stock.", parent=self)
 
     def remove_item(self):
         """
         Decrease the quantity of the selected item in the shopping cart.
         Remove the item if the quantity becomes zero.
         """
-        selected_index = self.cart_listbox.curselection()
-        if selected_index:
-            product_id = list(self.shopping_cart.keys())[selected_index[0]]
-            if self.shopping_cart[product_id]['quantity'] > 1:
-                self.shopping_cart[product_id]['quantity'] -= 1
-            else:
-                del self.shopping_cart[product_id]
-        self.update_listbox()
+        product_id = self.selected_product_id()
+        if product_id is not None:
+            self.controller.cart_service.remove_item(self.controller.session_id, product_id)
 
     def update_listbox(self):
         """
         Update the displayed list of items in the shopping cart.
         """
-        self.cart_listbox.delete(0, tk.END)
-        total_price = 0.0
-        for product_id, item in self.shopping_cart.items():
-            product_info = f"{item['name']} - ${item['price']:.2f} x {item['quantity']}"
-            total_price += item['price'] * item['quantity']
-            self.cart_listbox.insert(tk.END, product_info)
-        self.total_label.config(text=f"Total: ${total_price:.2f}")
+        self.cart_rows.set_rows(self.shopping_cart.keys())
+        self.total_label.config(text=f"Total: {format_cents(self.shopping_cart.subtotal_cents)}")
+        self.show_suggestions()
+
+    def show_suggestions(self):
+        """Suggest products that customers bought along with what is in the cart."""
+        self.also_bought.show(self.controller.recommendations.recommend_for(self.shopping_cart.keys()))
+
+    def on_cart_changed(self, event, product_id, position):
+        """
+        Redraw only what a cart change affected.
+
+        Args:
+            event (str): One of the ShoppingCart event names.
+            product_id: The key of the changed cart line (None when the cart was cleared).
+            position (int): The position of the changed cart line (None when the cart was cleared).
+        """
+        if event == ShoppingCart.UPDATED:
+            self.cart_rows.refresh_rows([product_id])
+            self.total_label.config(text=f"Total: {format_cents(self.shopping_cart.subtotal_cents)}")
+        else:
+            self.update_listbox()
+
+    def refresh(self):
+        """
+        Update the suggestions, which change as other orders are paid. The cart list itself follows cart
+        changes even while the window is hidden.
+        """
+        self.show_suggestions()
+
+    def cart_row(self, product_id):
+        item = self.shopping_cart[product_id]
+        return (f"{item['name']} - {format_cents(item['price_cents'])} x {item['quantity']}",)
+
+    def destroy(self):
+        self.shopping_cart.unsubscribe(self.on_cart_changed)
+        super().destroy()
+
+    def selected_product_id(self):
+        """Return the product id of the selected cart row, or None if nothing is selected."""
+        return self.cart_rows.key_for(self.cart_tree.focus())
 
 
 class CheckoutWindow(tk.Toplevel):
+    FIELD_LABELS = {'cardholder_name': "Cardholder Name", 'card_number': "Card Number",
+                    'expiration_date': "Expiration Date", 'cvv': "CVV", 'address': "Street Address", 'city': "City",
+                    'state': "State", 'zip_code': "Zip Code"}
+
     def __init__(self, root, controller, products, shopping_cart):
         """
         Initialize the CheckoutWindow class.
@@ -336,13 +1134,14 @@ class CheckoutWindow(tk.Toplevel):
             root: The root Tkinter window.
             controller (WindowController): The window controller for handling window navigation.
             products (Products): An instance of the Products class containing product information.
-            shopping_cart (dict): The shopping cart dictionary to keep track of selected items.
+            shopping_cart (ShoppingCart): The shopping cart keeping track of selected items and totals.
         """
         super().__init__(root)
         self.title("Checkout")
         self.controller = controller
         self.products = products
         self.shopping_cart = shopping_cart
+        self.pending_order = None
 
         self.configure(padx=30)
 
@@ -389,8 +1188,10 @@ class CheckoutWindow(tk.Toplevel):
         self.final_price_label = tk.Label(self, text="Total: $0.00")
         self.final_price_label.grid(row=9, column=2, pady=5, sticky=tk.E)
 
-        confirm_button = tk.Button(self, text="Place Order", command=self.confirm_checkout)
-        confirm_button.grid(row=11, column=1, pady=10)
+        self.status_label = tk.Label(self, text="", fg="red", wraplength=300)
+        self.status_label.grid(row=10, column=0, columnspan=3, pady=5)
+        self.confirm_button = tk.Button(self, text="Place Order", command=self.confirm_checkout)
+        self.confirm_button.grid(row=11, column=1, pady=10)
         back_to_shopping_button = tk.Button(self, text="Back to Shopping", command=self.controller.show_shopping_window)
         back_to_shopping_button.grid(row=12, column=0, pady=5, sticky=tk.W)
         back_to_cart_button = tk.Button(self, text="Back to Cart", command=self.controller.show_cart_window)
@@ -400,69 +1201,179 @@ class CheckoutWindow(tk.Toplevel):
         self.columnconfigure(1, weight=1)
         self.columnconfigure(2, weight=1)
 
+        self.shopping_cart.subscribe(self.update_totals)
         self.update_totals()
 
-    def update_totals(self):
+    def update_totals(self, *args):
         """
-        Update the displayed subtotal, tax, and total amounts based on the items in the shopping cart.
+        Update the displayed subtotal, tax, and total amounts from the running totals of the shopping cart.
+
+        Args:
+            *args: Cart change details when called as a ShoppingCart listener (not used).
         """
-        base_price = sum(item['price'] * item['quantity'] for item in self.controller.shopping_cart.values())
-        tax_rate = 0.07
-        taxes = base_price * tax_rate
-        final_price = base_price + taxes
-        self.base_price_label.config(text=f"Subtotal: ${base_price:.2f}")
-        self.taxes_label.config(text=f"Tax: ${taxes:.2f}")
-        self.final_price_label.config(text=f"Total: ${final_price:.2f}")
+        self.base_price_label.config(text=f"Subtotal: {format_cents(self.shopping_cart.subtotal_cents)}")
+        self.taxes_label.config(text=f"Tax: {format_cents(self.shopping_cart.tax_cents)}")
+        self.final_price_label.config(text=f"Total: {format_cents(self.shopping_cart.total_cents)}")
+
+    def refresh(self):
+        """Nothing to redraw: the totals follow cart changes even while the window is hidden."""
+
+    def form_entries(self):
+        """Return the form's Entry widgets keyed by Order field name."""
+        return dict(zip(Order.FIELDS, [self.cardholder_name_entry, self.card_number_entry,
+                                       self.expiration_date_entry, self.cvv_entry, self.address_entry,
+                                       self.city_entry, self.state_entry, self.zip_code_entry]))
+
+    def clear_form(self):
+        """Empty the payment and shipping fields so they do not persist after an order is placed."""
+        for entry in self.form_entries().values():
+            entry.delete(0, tk.END)
+
+    def destroy(self):
+        self.shopping_cart.unsubscribe(self.update_totals)
+        super().destroy()
 
     def confirm_checkout(self):
         """
-        Update the displayed subtotal, tax, and total amounts based on the items in the shopping cart.
-        """
-        cardholder_name = self.cardholder_name_entry.get()
-        card_number = self.card_number_entry.get()
-        expiration_date = self.expiration_date_entry.get()
-        cvv = self.cvv_entry.get()
-        address = self.address_entry.get()
-        city = self.city_entry.get()
-        state = self.state_entry.get()
-        zip_code = self.zip_code_entry.get()
-        if any(not field for field in [cardholder_name, card_number, expiration_date, cvv, address, city, state, zip_code]):
-            for entry in [self.cardholder_name_entry, self.card_number_entry, self.expiration_date_entry,
-                        self.cvv_entry, self.address_entry, self.city_entry, self.state_entry, self.zip_code_entry]:
-                if not entry.get():
-                    entry.insert(0, "Field cannot be empty")
+        Validate the form and submit the order for payment.
+
+        Returns as soon as the order is queued; order_finished shows the receipt or the payment error once the
+        order processor is done with it.
+        """
+        if self.pending_order is not None:
             return
-        
-        receipt_text = f"Payment Information:\n\nCardholder Name: {cardholder_name}\n\nCard Number: {card_number}\n\nExpiration Date: {expiration_date}\n\n\nShipping Information:\n\nStreet Address: {address}\n\nCity: {city}\n\nState: {state}\n\nZip Code: {zip_code}"
-        receipt_text += f"\n\nOrder Summary:\n\n{self.base_price_label.cget('text')}\n{self.taxes_label.cget('text')}\n{self.final_price_label.cget('text')}"
-        self.controller.shopping_cart.clear()
-        ReceiptWindow(self, self.controller, receipt_text)
+        entries = self.form_entries()
+        try:
+            self.pending_order = self.controller.cart_service.checkout(
+                self.controller.session_id, {field: entry.get() for field, entry in entries.items()},
+                self.order_finished)
+        except OrderValidationError as error:
+            self.status_label.config(text="\n".join(f"{self.FIELD_LABELS.get(field, 'Cart')}: {message}"
+                                                    for field, message in error.errors.items()))
+            return
+        except OutOfStock as error:
+            self.status_label.config(text="\n".join(
+                f"Only {available} left of {self.shopping_cart[product_id]['name']}"
+                for product_id, available in error.shortages.items()))
+            return
+        except QueueFull:
+            self.status_label.config(text="Too many orders in progress, please try again")
+            return
+        self.confirm_button.config(state=tk.DISABLED)
+        self.status_label.config(text="Processing payment...")
+
+    def order_finished(self, order):
+        """
+        Show the outcome of a submitted order. Runs on the Tk thread.
+
+        Args:
+            order (Order): The order, now paid or failed.
+        """
+        self.pending_order = None
+        if not self.winfo_exists():
+            return
+        self.confirm_button.config(state=tk.NORMAL)
+        if order.status != Order.PAID:
+            self.status_label.config(text=order.error)
+            return
+        self.status_label.config(text="")
+        self.clear_form()
+        ReceiptWindow(self, self.controller, order)
 
 
 class ReceiptWindow(tk.Toplevel):
-    def __init__(self, root, controller, receipt_text):
+    def __init__(self, root, controller, order):
         """
         Initialize the ReceiptWindow class.
 
         Args:
             root: The root Tkinter window.
             controller (WindowController): The window controller for handling window navigation.
-            receipt_text (str): The text to be displayed in the receipt.
+            order (Order): The paid order to show the receipt of.
         """
         super().__init__(root)
         self.title("Receipt")
         self.controller = controller 
         self.geometry(f"{controller.DEFAULT_WIDTH}x{controller.DEFAULT_HEIGHT}+{controller.center_x()}+{controller.center_y()}")
-        tk.Label(self, text=receipt_text, justify=tk.LEFT).pack(padx=20, pady=20)
-        ok_button = tk.Button(self, text="OK", command=self.controller.show_shopping_window)
+        receipt_text = receipts.render_text(receipts.receipt_record(order))
+        tk.Label(self, text=receipt_text, justify=tk.LEFT, font="TkFixedFont").pack(padx=20, pady=20)
+        ok_button = tk.Button(self, text="OK", command=self.close)
         ok_button.pack(pady=10)
+        self.protocol("WM_DELETE_WINDOW", self.close)
+
+    def close(self):
+        """Close the receipt and return to shopping; the checkout window is kept, so the receipt must go explicitly."""
+        self.destroy()
+        self.controller.show_shopping_window()
+
+
+
+def main(argv=None):
+    """
+    Start the shopping application.
+
+    The first window is shown with an empty product list, and the catalog is loaded on a background
+    thread once that window has been drawn.
+
+    Args:
+        argv (list, optional): Command line arguments. Defaults to None (use sys.argv).
+    """
+    parser = argparse.ArgumentParser(description="Consumer Retail Electronics Shopping Platform")
+    parser.add_argument("--db", default=os.environ.get("CATALOG_DB"),
+                        help="keep the catalog in this SQLite database (default: $CATALOG_DB, else in memory)")
+    parser.add_argument("--backend", choices=BACKENDS, default=os.environ.get("CATALOG_BACKEND"),
+                        help="product store (default: $CATALOG_BACKEND, else sqlite with --db, else memory)")
+    parser.add_argument("--catalog", default=os.environ.get("CATALOG_FILE", DEFAULT_CATALOG),
+                        help="JSON Lines catalog, reloaded whenever it changes "
+                             f"(default: $CATALOG_FILE, else {DEFAULT_CATALOG})")
+    parser.add_argument("--timings", action="store_true", default=bool(os.environ.get("STARTUP_TIMINGS")),
+                        help="print a breakdown of startup time")
+    parser.add_argument("--journal", default=os.environ.get("ORDER_JOURNAL", "journal"),
+                        help="directory of the order journal (default: $ORDER_JOURNAL, else ./journal)")
+    parser.add_argument("--profile", metavar="REPORT", default=os.environ.get("UI_PROFILE"),
+                        help="time every UI callback and write the statistics to this JSON file at exit "
+                             "(default: $UI_PROFILE); press F12 to view them while running")
+    parser.add_argument("--slow-ms", type=float, default=50,
+                        help="log UI callbacks slower than this with stack samples (default: 50)")
+    args = parser.parse_args(argv)
+    if args.db and args.backend not in (None, 'sqlite'):
+        parser.error("--db needs --backend sqlite")
+
+    timer = StartupTimer(IMPORT_STARTED)
+    timer.mark("import")
+    root = tk.Tk()
+    root.withdraw()
+    if args.profile:
+        import instrumentation
+        instrumentation.install(root, args.profile, slow_ms=args.slow_ms)
+    products = create_products(args.db, args.backend)
+    inventory = Inventory()
+    catalog_file = CatalogFile(args.catalog, products, inventory)
+    controller = WindowController(root, products, ShoppingCart(products), args.journal, inventory)
+    controller.show_shopping_window()
+    timer.mark("build first window")
+
+    def catalog_loaded():
+        timer.mark("catalog load")
+        controller.on_catalog_loaded()
+        controller.watch_catalog(catalog_file)
+        if args.timings:
+            print(timer.report(), file=sys.stderr)
+
+    def load_in_background():
+        try:
+            load_catalog(products, catalog_file)
+        except (OSError, ValueError) as error:
+            print(f"Catalog not loaded: {error}", file=sys.stderr)
+        controller.dispatcher.post(catalog_loaded)
+
+    def first_paint():
+        timer.mark("first paint")
+        threading.Thread(target=load_in_background, name="catalog-loader", daemon=True).start()
+
+    root.after_idle(first_paint)
+    root.mainloop()
 
 
-root = tk.Tk()
-root.withdraw()
-shopping_cart = {}
-controller = WindowController(root, products, shopping_cart)
-controller.show_shopping_window()
-
 if __name__ == "__main__":
-    root.mainloop()
\ No newline at end of file
+    main()
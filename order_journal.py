@@ -0,0 +1,402 @@
+'''
+    Order journal.
+
+    Description: A durable, append-only log of completed orders. Orders are written as compact JSON lines by a
+                 single writer thread, which takes everything queued since its last write and commits it with
+                 one fsync (group commit), so appending never waits on the disk. The log is split into
+                 numbered segment files that rotate at a size limit; sealed segments can be compacted into one,
+                 dropping duplicate order ids. The writing process holds an exclusive lock on the directory, so
+                 a second writer or an offline compaction cannot run while the app is appending. If the disk
+                 fails, the error is kept and raised by every later append and flush. Readers memory-map the
+                 segments and can replay every order or aggregate daily revenue and best-selling products, one
+                 worker process per segment.
+
+    Usage: python order_journal.py journal --daily --top 10
+'''
+
+
+import argparse
+import json
+import mmap
+import os
+import queue
+import re
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+SEGMENT_PATTERN = re.compile(r"^journal-(\d{6})\.jsonl$")
+LOCK_NAME = "journal.lock"
+
+
+class JournalLocked(Exception):
+    """Another process holds the journal directory."""
+
+
+def segment_name(number):
+    return f"journal-{number:06d}.jsonl"
+
+
+def segment_paths(directory):
+    """Return the segment files in directory, oldest first."""
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(name for name in os.listdir(directory) if SEGMENT_PATTERN.match(name))
+    return [os.path.join(directory, name) for name in names]
+
+
+def sync_directory(directory):
+    # Make a created, renamed or removed file survive a crash; not supported on Windows.
+    try:
+        descriptor = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(descriptor)
+
+
+def iter_lines(path):
+    """Yield the complete lines of a segment file through a memory map; a torn last line is skipped."""
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for line in iter(data.readline, b""):
+                if line.endswith(b"\n"):
+                    yield line
+
+
+def truncate_torn_tail(path):
+    """Cut off a partly written last record left by a crash, so the next record starts on a fresh line."""
+    with open(path, "r+b") as file:
+        size = os.fstat(file.fileno()).st_size
+        if not size:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            end = data.rfind(b"\n") + 1
+        if end != size:
+            file.truncate(end)
+
+
+def lock_directory(directory):
+    """
+    Take the exclusive lock of a journal directory, without waiting.
+
+    The lock lasts until the returned file is closed. Where fcntl is not available (Windows) nothing is locked.
+
+    Returns:
+        file: The open lock file.
+
+    Raises:
+        JournalLocked: If another journal holds the directory.
+    """
+    file = open(os.path.join(directory, LOCK_NAME), "a")
+    if fcntl is not None:
+        try:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            file.close()
+            raise JournalLocked(f"The order journal in {directory} is in use by another process") from None
+    return file
+
+
+def compact_segments(directory, sealed):
+    """
+    Merge the given segments into one, dropping repeated order ids.
+
+    The merged file replaces the oldest segment before the others are removed, so a crash part way through
+    can only leave duplicates behind, which the next compaction drops.
+
+    Args:
+        directory (str): The journal directory.
+        sealed (list): Paths of segments that are no longer written to, oldest first.
+
+    Returns:
+        int: The number of records kept.
+    """
+    if not sealed:
+        return 0
+    seen = set()
+    temporary_path = sealed[0] + ".compact"
+    with open(temporary_path, "wb") as output:
+        for path in sealed:
+            for line in iter_lines(path):
+                order_id = json.loads(line).get('id')
+                if order_id in seen:
+                    continue
+                seen.add(order_id)
+                output.write(line)
+        output.flush()
+        os.fsync(output.fileno())
+    os.replace(temporary_path, sealed[0])
+    for path in sealed[1:]:
+        os.remove(path)
+    sync_directory(directory)
+    return len(seen)
+
+
+def compact(directory):
+    """
+    Compact a journal that no process is writing to. Every segment but the newest, which a writer would
+    append to next, is merged.
+
+    Returns:
+        int: The number of records kept.
+
+    Raises:
+        JournalLocked: If a running app holds the journal.
+    """
+    if not os.path.isdir(directory):
+        return 0
+    lock_file = lock_directory(directory)
+    try:
+        return compact_segments(directory, segment_paths(directory)[:-1])
+    finally:
+        lock_file.close()
+
+
+class OrderJournal:
+    SEGMENT_BYTES = 64 * 1024 * 1024
+    MAX_BATCH = 4096
+
+    def __init__(self, directory, segment_bytes=SEGMENT_BYTES, sync=True):
+        """
+        Initialize the OrderJournal class and start its writer thread.
+
+        Args:
+            directory (str): Directory holding the segment files; created if needed.
+            segment_bytes (int, optional): Size at which a new segment is started. Defaults to 64 MB.
+            sync (bool, optional): fsync every batch. Defaults to True.
+
+        Raises:
+            JournalLocked: If another journal is open on the directory.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.lock_file = lock_directory(directory)
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.sync = sync
+        self.pending = queue.SimpleQueue()
+        self.lock = threading.Lock()
+        self.closed = False
+        self.error = None
+        existing = segment_paths(directory)
+        self.segment_number = 1
+        if existing:
+            self.segment_number = int(SEGMENT_PATTERN.match(os.path.basename(existing[-1])).group(1))
+            truncate_torn_tail(existing[-1])
+        self.open_segment()
+        self.writer = threading.Thread(target=self.write_loop, name="order-journal", daemon=True)
+        self.writer.start()
+
+    def append(self, record):
+        """
+        Queue a record for writing and return at once. Safe to call from any thread.
+
+        Args:
+            record (dict): A JSON-serializable record, normally Order.to_record().
+
+        Raises:
+            OSError: If an earlier write failed; nothing is written after that.
+        """
+        if self.closed:
+            raise ValueError("The order journal is closed")
+        self.check()
+        self.pending.put(json.dumps(record, separators=(",", ":")).encode() + b"\n")
+
+    def flush(self, timeout=None):
+        """
+        Wait until every record appended so far is on disk.
+
+        Returns:
+            bool: False if the timeout expired first.
+
+        Raises:
+            OSError: If a write failed, so some of the records are not on disk.
+        """
+        self.check()
+        written = threading.Event()
+        self.pending.put(written)
+        finished = written.wait(timeout)
+        self.check()
+        return finished
+
+    def check(self):
+        if self.error is not None:
+            raise OSError(f"The order journal stopped writing: {self.error}") from self.error
+
+    def close(self):
+        """Write out everything queued, then stop the writer thread and release the directory."""
+        if not self.closed:
+            self.closed = True
+            self.pending.put(None)
+            self.writer.join()
+            self.lock_file.close()
+
+    def open_segment(self):
+        self.path = os.path.join(self.directory, segment_name(self.segment_number))
+        self.file = open(self.path, "ab")
+        self.size = self.file.tell()
+        sync_directory(self.directory)
+
+    def write_loop(self):
+        while True:
+            batch = []
+            waiters = []
+            stopping = False
+            item = self.pending.get()
+            # Everything that queued up while the previous batch was being synced goes out in one write
+            while True:
+                if item is None:
+                    stopping = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if len(batch) >= self.MAX_BATCH:
+                    break
+                try:
+                    item = self.pending.get_nowait()
+                except queue.Empty:
+                    break
+            # After a failed write the file may end in a torn record, so later batches are dropped; append and
+            # flush report the error instead
+            if batch and self.error is None:
+                try:
+                    self.write_batch(b"".join(batch))
+                except OSError as error:
+                    self.error = error
+            for waiter in waiters:
+                waiter.set()
+            if stopping:
+                try:
+                    self.file.close()
+                except OSError:
+                    pass
+                return
+
+    def write_batch(self, data):
+        with self.lock:
+            if self.size and self.size + len(data) > self.segment_bytes:
+                self.file.close()
+                self.segment_number += 1
+                self.open_segment()
+            self.file.write(data)
+            self.file.flush()
+            if self.sync:
+                os.fsync(self.file.fileno())
+            self.size += len(data)
+
+    def compact(self):
+        """
+        Merge every sealed segment (all but the one being written) into one, dropping repeated order ids.
+
+        Returns:
+            int: The number of records kept.
+        """
+        with self.lock:
+            sealed = [path for path in segment_paths(self.directory) if path != self.path]
+        return compact_segments(self.directory, sealed)
+
+
+def replay(directory):
+    """Yield every record in the journal, oldest first."""
+    for path in segment_paths(directory):
+        for line in iter_lines(path):
+            yield json.loads(line)
+
+
+def aggregate_segment(path):
+    """
+    Total one segment.
+
+    Returns:
+        tuple: (orders, {day: revenue in cents}, Counter of units sold per product id)
+    """
+    revenue = {}
+    units = Counter()
+    orders = 0
+    loads = json.loads
+    for line in iter_lines(path):
+        record = loads(line)
+        orders += 1
+        revenue[record['day']] = revenue.get(record['day'], 0) + record['subtotal']
+        for product_id, quantity, price_cents in record['lines']:
+            units[product_id] += quantity
+    return orders, revenue, units
+
+
+def aggregate(directory, workers=None):
+    """
+    Total the whole journal, one worker process per segment when there is more than one.
+
+    Args:
+        directory (str): The journal directory.
+        workers (int, optional): Worker processes. Defaults to None (one per CPU); 1 runs in this process.
+
+    Returns:
+        tuple: (orders, {day: revenue in cents}, Counter of units sold per product id)
+    """
+    paths = segment_paths(directory)
+    workers = workers or os.cpu_count() or 1
+    if len(paths) > 1 and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parts = list(executor.map(aggregate_segment, paths))
+    else:
+        parts = [aggregate_segment(path) for path in paths]
+    orders = 0
+    revenue = {}
+    units = Counter()
+    for part_orders, part_revenue, part_units in parts:
+        orders += part_orders
+        for day, cents in part_revenue.items():
+            revenue[day] = revenue.get(day, 0) + cents
+        units.update(part_units)
+    return orders, revenue, units
+
+
+def daily_revenue(directory, workers=None):
+    """Return {day: revenue in cents, before tax} for every day in the journal, in date order."""
+    return dict(sorted(aggregate(directory, workers)[1].items()))
+
+
+def top_skus(directory, count=10, workers=None):
+    """Return the count best-selling product ids as (product_id, units) pairs."""
+    return aggregate(directory, workers)[2].most_common(count)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize or compact the order journal.")
+    parser.add_argument("directory", help="journal directory")
+    parser.add_argument("--daily", action="store_true", help="print revenue per day")
+    parser.add_argument("--top", type=int, default=0, metavar="N", help="print the N best-selling products")
+    parser.add_argument("--compact", action="store_true", help="merge the sealed segments first")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    if args.compact:
+        try:
+            print(f"Kept {compact(args.directory)} orders")
+        except JournalLocked as error:
+            parser.exit(1, f"{error}; close the app before compacting\n")
+    orders, revenue, units = aggregate(args.directory, args.workers)
+    print(f"{orders} orders, {sum(revenue.values()) / 100:.2f} revenue")
+    if args.daily:
+        for day, cents in sorted(revenue.items()):
+            print(f"{day}  {cents / 100:12.2f}")
+    for product_id, quantity in units.most_common(args.top):
+        print(f"{product_id!s:<12}{quantity:>10}")
+
+
+if __name__ == "__main__":
+    main()
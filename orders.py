@@ -0,0 +1,352 @@
+'''
+    Order processing.
+
+    Description: Turns a checkout into an Order, validates the payment and shipping details, and charges it
+                 through a pluggable payment gateway on a pool of worker threads. Submitting an order returns
+                 straight away with the order pending; the result is delivered to a callback, on the Tk thread
+                 when a Dispatcher is given. The number of orders waiting for a worker is bounded so a flood of
+                 submissions blocks (or fails fast) instead of piling up, transient gateway errors are retried
+                 with backoff, and an idempotency key makes sure resubmitting the same checkout never charges
+                 twice.
+'''
+
+
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+
+ZIP_PATTERN = re.compile(r"^\d{5}(-\d{4})?$")
+EXPIRY_PATTERN = re.compile(r"^(\d{2})\s*/\s*(\d{2})$")
+CVV_PATTERN = re.compile(r"^\d{3,4}$")
+
+logger = logging.getLogger(__name__)
+
+
+class OrderValidationError(ValueError):
+    def __init__(self, errors):
+        """
+        Initialize the OrderValidationError class.
+
+        Args:
+            errors (dict): Field names mapped to a description of what is wrong with them.
+        """
+        super().__init__("; ".join(errors.values()))
+        self.errors = errors
+
+
+class PaymentDeclined(Exception):
+    """The gateway refused the charge; retrying will not help."""
+
+
+class TransientPaymentError(Exception):
+    """The gateway could not be reached or timed out; the charge may be retried."""
+
+
+class QueueFull(Exception):
+    """Too many orders are waiting for a worker."""
+
+
+def card_digits(card_number):
+    return re.sub(r"[\s-]", "", card_number)
+
+
+def luhn_valid(card_number):
+    """Return True if card_number (spaces and dashes allowed) is 12-19 digits and passes the Luhn check."""
+    digits = card_digits(card_number)
+    if not digits.isdigit() or not 12 <= len(digits) <= 19:
+        return False
+    total = 0
+    for position, digit in enumerate(reversed(digits)):
+        value = int(digit)
+        if position % 2:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return total % 10 == 0
+
+
+def expiry_valid(expiration_date, today=None):
+    """Return True if expiration_date is a MM/YY date whose month has not ended yet."""
+    match = EXPIRY_PATTERN.match(expiration_date.strip())
+    if not match:
+        return False
+    month, year = int(match.group(1)), 2000 + int(match.group(2))
+    if not 1 <= month <= 12:
+        return False
+    today = today or date.today()
+    return (year, month) >= (today.year, today.month)
+
+
+class Order:
+    PENDING = "pending"
+    PAID = "paid"
+    FAILED = "failed"
+
+    FIELDS = ('cardholder_name', 'card_number', 'expiration_date', 'cvv', 'address', 'city', 'state', 'zip_code')
+
+    def __init__(self, lines, subtotal_cents, tax_cents, details, idempotency_key=None):
+        """
+        Initialize the Order class.
+
+        Args:
+            lines (list): One (product_id, name, price_cents, quantity) tuple per cart line.
+            subtotal_cents (int): Sum of the line totals.
+            tax_cents (int): Tax on the subtotal.
+            details (dict): Payment and shipping fields, keyed by the names in FIELDS.
+            idempotency_key (str, optional): Identifies this checkout attempt. Defaults to a new random key.
+        """
+        self.order_id = uuid.uuid4().hex
+        self.idempotency_key = idempotency_key or uuid.uuid4().hex
+        self.lines = lines
+        self.subtotal_cents = subtotal_cents
+        self.tax_cents = tax_cents
+        self.total_cents = subtotal_cents + tax_cents
+        self.details = {field: details.get(field, "").strip() for field in self.FIELDS}
+        self.status = self.PENDING
+        self.transaction_id = None
+        self.error = None
+        self.attempts = 0
+        self.created_at = time.time()
+        self.submitted = None
+        self.completed = None
+
+    @classmethod
+    def from_cart(cls, shopping_cart, details, idempotency_key=None):
+        """Snapshot the lines and totals of a ShoppingCart into a new Order."""
+        lines = [(product_id, item['name'], item['price_cents'], item['quantity'])
+                 for product_id, item in zip(shopping_cart.keys(), shopping_cart.values())]
+        return cls(lines, shopping_cart.subtotal_cents, shopping_cart.tax_cents, details, idempotency_key)
+
+    def to_record(self):
+        """Return the order as a journal record: totals and lines only, never the payment details."""
+        return {
+            'id': self.order_id,
+            'key': self.idempotency_key,
+            'txn': self.transaction_id,
+            'ts': round(self.created_at, 3),
+            'day': time.strftime("%Y-%m-%d", time.localtime(self.created_at)),
+            'subtotal': self.subtotal_cents,
+            'tax': self.tax_cents,
+            'total': self.total_cents,
+            'lines': [[product_id, quantity, price_cents] for product_id, name, price_cents, quantity in self.lines],
+        }
+
+    @property
+    def masked_card_number(self):
+        digits = card_digits(self.details['card_number'])
+        return "**** **** **** " + digits[-4:]
+
+    def validate(self, today=None):
+        """
+        Check the payment and shipping details.
+
+        Raises:
+            OrderValidationError: Listing every field that is missing or malformed.
+        """
+        details = self.details
+        errors = {field: "Field cannot be empty" for field in self.FIELDS if not details[field]}
+        if details['card_number'] and not luhn_valid(details['card_number']):
+            errors['card_number'] = "Invalid card number"
+        if details['expiration_date'] and not expiry_valid(details['expiration_date'], today):
+            errors['expiration_date'] = "Invalid or expired date"
+        if details['cvv'] and not CVV_PATTERN.match(details['cvv']):
+            errors['cvv'] = "CVV must be 3 or 4 digits"
+        if details['zip_code'] and not ZIP_PATTERN.match(details['zip_code']):
+            errors['zip_code'] = "ZIP must be 12345 or 12345-6789"
+        if not self.lines:
+            errors['lines'] = "The cart is empty"
+        if errors:
+            raise OrderValidationError(errors)
+
+
+class PaymentGateway:
+    def charge(self, order, idempotency_key):
+        """
+        Charge order.total_cents to the order's card.
+
+        Implementations must treat a repeated idempotency_key as the same charge and return its original
+        transaction id instead of charging again.
+
+        Returns:
+            str: The transaction id.
+
+        Raises:
+            PaymentDeclined: If the card was refused.
+            TransientPaymentError: If the charge may succeed when retried.
+        """
+        raise NotImplementedError
+
+
+class StubPaymentGateway(PaymentGateway):
+    DECLINED_CARDS = ("4000000000000002",)
+
+    def __init__(self, latency=0.0, failure_rate=0.0, seed=None):
+        """
+        Initialize the StubPaymentGateway class, a local gateway for development and load tests.
+
+        Args:
+            latency (float, optional): Seconds each charge takes. Defaults to 0.0.
+            failure_rate (float, optional): Fraction of charges that fail with TransientPaymentError.
+                Defaults to 0.0.
+            seed (int, optional): Seed for the failure simulation. Defaults to None.
+        """
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.charges = {}
+        self.lock = threading.Lock()
+
+    def charge(self, order, idempotency_key):
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            if idempotency_key in self.charges:
+                return self.charges[idempotency_key]
+            if self.failure_rate and self.random.random() < self.failure_rate:
+                raise TransientPaymentError("Simulated gateway timeout")
+            if card_digits(order.details['card_number']) in self.DECLINED_CARDS:
+                raise PaymentDeclined("Card declined")
+            transaction_id = f"stub-{len(self.charges) + 1}"
+            self.charges[idempotency_key] = transaction_id
+            return transaction_id
+
+
+class OrderProcessor:
+    MAX_REMEMBERED_KEYS = 100000
+
+    def __init__(self, gateway, dispatcher=None, workers=4, max_pending=1000, max_attempts=3, backoff=0.05):
+        """
+        Initialize the OrderProcessor class.
+
+        Args:
+            gateway (PaymentGateway): Charges the orders.
+            dispatcher (Dispatcher, optional): Runs completion callbacks on the Tk thread. Defaults to None
+                (callbacks run on the worker thread).
+            workers (int, optional): Orders charged concurrently. Defaults to 4.
+            max_pending (int, optional): Orders allowed to be queued or in progress at once. Defaults to 1000.
+            max_attempts (int, optional): Charge attempts per order on transient errors. Defaults to 3.
+            backoff (float, optional): Seconds before the first retry, doubled on each further one.
+                Defaults to 0.05.
+        """
+        self.gateway = gateway
+        self.dispatcher = dispatcher
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="orders")
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.orders = OrderedDict()
+        # Callbacks of the orders still in progress, by order id
+        self.callbacks = {}
+        self.listeners = []
+        self.lock = threading.Lock()
+
+    def submit(self, order, callback=None, block=True, timeout=None):
+        """
+        Queue an order for payment and return at once.
+
+        An order whose idempotency key was seen before is not charged again; the earlier order is returned
+        instead, and callback receives it when it completes (straight away if it already has). Only a failed
+        order may be submitted again under its key; the gateway then returns the original charge if the failed
+        attempt did go through.
+
+        Args:
+            order (Order): A validated order.
+            callback (callable, optional): Called as callback(order) once the order is paid or has failed.
+            block (bool, optional): Wait for a free slot when max_pending orders are outstanding.
+                Defaults to True.
+            timeout (float, optional): Longest wait for a slot when blocking. Defaults to None (no limit).
+
+        Returns:
+            Order: The order being processed, with status PENDING until it completes.
+
+        Raises:
+            QueueFull: If no slot became free.
+        """
+        with self.lock:
+            existing = self.orders.get(order.idempotency_key)
+            if existing is not None and existing.status != Order.FAILED:
+                waiting = self.callbacks.get(existing.order_id)
+                if waiting is not None and callback is not None:
+                    waiting.append(callback)
+            else:
+                existing = None
+                self.orders[order.idempotency_key] = order
+                self.callbacks[order.order_id] = [] if callback is None else [callback]
+                if len(self.orders) > self.MAX_REMEMBERED_KEYS:
+                    self.orders.popitem(last=False)
+        if existing is not None:
+            if waiting is None and callback is not None:
+                self.deliver(callback, existing)
+            return existing
+        if not self.slots.acquire(block, timeout):
+            with self.lock:
+                self.orders.pop(order.idempotency_key, None)
+                del self.callbacks[order.order_id]
+            raise QueueFull(f"{self.max_pending} orders are already pending")
+        order.submitted = time.perf_counter()
+        self.executor.submit(self.process, order)
+        return order
+
+    def subscribe(self, listener):
+        """Register a function called as listener(order) on the worker thread whenever an order completes."""
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def process(self, order):
+        try:
+            self.charge(order)
+        finally:
+            order.completed = time.perf_counter()
+            self.slots.release()
+        for listener in list(self.listeners):
+            try:
+                listener(order)
+            except Exception:
+                logger.exception("Order listener %r failed on order %s", listener, order.order_id)
+        with self.lock:
+            callbacks = self.callbacks.pop(order.order_id)
+        for callback in callbacks:
+            self.deliver(callback, order)
+
+    def deliver(self, callback, order):
+        if self.dispatcher is not None:
+            self.dispatcher.post(callback, order)
+            return
+        try:
+            callback(order)
+        except Exception:
+            logger.exception("Order callback %r failed on order %s", callback, order.order_id)
+
+    def charge(self, order):
+        while True:
+            order.attempts += 1
+            try:
+                order.transaction_id = self.gateway.charge(order, order.idempotency_key)
+                order.status = Order.PAID
+                return
+            except TransientPaymentError as error:
+                if order.attempts >= self.max_attempts:
+                    order.status, order.error = Order.FAILED, f"Payment unavailable: {error}"
+                    return
+                time.sleep(self.backoff * 2 ** (order.attempts - 1))
+            except PaymentDeclined as error:
+                order.status, order.error = Order.FAILED, str(error)
+                return
+            except Exception as error:
+                order.status, order.error = Order.FAILED, f"Payment error: {error}"
+                return
+
+    def shutdown(self, wait=False):
+        self.executor.shutdown(wait=wait)
@@ -0,0 +1,401 @@
+'''
+    Receipts and sales reports.
+
+    Description: Renders orders as receipts in text, CSV or JSON Lines, and totals them into a sales report,
+                 without Tkinter, so the same receipt the checkout window shows can be produced in bulk from the
+                 order journal. Receipts are written to the output as each order is rendered and the report
+                 only keeps one total per day and per product, so memory stays bounded however many orders
+                 go through. Large batches are rendered by a pool of worker processes, a chunk of orders at a
+                 time, with only a few chunks in flight and the output kept in order. Card numbers are always
+                 masked down to their last four digits.
+
+    Usage: python receipts.py journal --format csv --output receipts.csv --report -
+'''
+
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import catalog
+from cart import format_cents
+from order_journal import iter_lines, segment_paths
+from orders import Order
+
+
+FORMATS = ("text", "csv", "json")
+RECEIPT_COLUMNS = ("order", "transaction", "date", "product_id", "product", "quantity", "unit_price", "amount",
+                   "subtotal", "tax", "total")
+REPORT_COLUMNS = ("section", "key", "orders", "units", "subtotal", "tax", "total")
+NAME_WIDTH = 28
+
+
+def receipt_record(order):
+    """
+    Turn a paid Order into a receipt record: its journal record plus product names, the masked card and the
+    shipping address.
+
+    Args:
+        order (Order): The order.
+
+    Returns:
+        dict: The record, ready for any renderer.
+    """
+    record = order.to_record()
+    details = order.details
+    record['names'] = [name for product_id, name, price_cents, quantity in order.lines]
+    record['payment'] = {'cardholder_name': details['cardholder_name'], 'card_number': order.masked_card_number}
+    record['shipping'] = {field: details[field] for field in ('address', 'city', 'state', 'zip_code')}
+    return record
+
+
+def line_names(record, names=None):
+    """Return the product name of each line of a record, from the record itself, names or the product id."""
+    if 'names' in record:
+        return record['names']
+    names = names or {}
+    return [names.get(product_id) or f"Product {product_id}" for product_id, quantity, price_cents in record['lines']]
+
+
+def dollars(cents):
+    """Format integer cents as a plain decimal amount for CSV, e.g. 46999 -> "469.99"."""
+    return format_cents(cents).replace("$", "")
+
+
+def order_time(record):
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(record['ts']))
+
+
+def render_text(record, names=None):
+    """
+    Render a receipt as text, the way the checkout window shows it.
+
+    Args:
+        record (dict): A receipt record or journal record.
+        names (dict, optional): Product ids mapped to names, for records without them. Defaults to None.
+
+    Returns:
+        str: The receipt, ending with a blank line.
+    """
+    parts = [f"Order {record['id']}\nDate: {order_time(record)}\n"]
+    if record.get('txn'):
+        parts.append(f"Transaction: {record['txn']}\n")
+    payment = record.get('payment')
+    if payment:
+        parts.append(f"\nPayment Information:\nCardholder Name: {payment['cardholder_name']}\n"
+                     f"Card Number: {payment['card_number']}\n")
+    shipping = record.get('shipping')
+    if shipping:
+        parts.append(f"\nShipping Information:\nStreet Address: {shipping['address']}\nCity: {shipping['city']}\n"
+                     f"State: {shipping['state']}\nZip Code: {shipping['zip_code']}\n")
+    parts.append("\nItems:\n")
+    for name, (product_id, quantity, price_cents) in zip(line_names(record, names), record['lines']):
+        parts.append(f"{name[:NAME_WIDTH]:<{NAME_WIDTH}} {quantity:>3} x {format_cents(price_cents):>10}"
+                     f" {format_cents(quantity * price_cents):>11}\n")
+    parts.append(f"\nSubtotal: {format_cents(record['subtotal'])}\nTax: {format_cents(record['tax'])}\n"
+                 f"Total: {format_cents(record['total'])}\n\n")
+    return "".join(parts)
+
+
+def render_csv(record, names=None):
+    """Render a receipt as CSV rows, one per line item, in RECEIPT_COLUMNS order; see render_text for the arguments."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    date = order_time(record)
+    totals = (dollars(record['subtotal']), dollars(record['tax']), dollars(record['total']))
+    for name, (product_id, quantity, price_cents) in zip(line_names(record, names), record['lines']):
+        writer.writerow((record['id'], record.get('txn') or "", date, product_id, name, quantity,
+                         dollars(price_cents), dollars(quantity * price_cents)) + totals)
+    return buffer.getvalue()
+
+
+def render_json(record, names=None):
+    """Render a receipt as one JSON line with amounts in cents; see render_text for the arguments."""
+    if 'names' not in record and names:
+        record = dict(record, names=line_names(record, names))
+    return json.dumps(record, separators=(",", ":")) + "\n"
+
+
+RENDERERS = {'text': render_text, 'csv': render_csv, 'json': render_json}
+
+
+class SalesReport:
+    def __init__(self):
+        """Initialize the SalesReport class with no orders. Holds one total per day and per product."""
+        self.orders = 0
+        self.days = {}
+        self.products = {}
+
+    def add(self, record):
+        """Add one order, as a receipt or journal record, to the totals."""
+        self.orders += 1
+        day = self.days.get(record['day'])
+        if day is None:
+            day = self.days[record['day']] = [0, 0, 0, 0, 0]
+        day[0] += 1
+        day[2] += record['subtotal']
+        day[3] += record['tax']
+        day[4] += record['total']
+        for product_id, quantity, price_cents in record['lines']:
+            product = self.products.get(product_id)
+            if product is None:
+                product = self.products[product_id] = [0, 0, 0]
+            product[0] += 1
+            product[1] += quantity
+            product[2] += quantity * price_cents
+            day[1] += quantity
+
+    def merge(self, other):
+        """Add the totals of another SalesReport, such as one counted by a worker process."""
+        self.orders += other.orders
+        for key, totals in other.days.items():
+            mine = self.days.setdefault(key, [0] * len(totals))
+            for position, value in enumerate(totals):
+                mine[position] += value
+        for key, totals in other.products.items():
+            mine = self.products.setdefault(key, [0] * len(totals))
+            for position, value in enumerate(totals):
+                mine[position] += value
+
+    def best_sellers(self, count=None):
+        """Return up to count (product id, orders, units, revenue in cents) tuples, highest revenue first."""
+        ranked = sorted(self.products.items(), key=lambda item: (-item[1][2], item[0]))[:count]
+        return [(product_id, orders, units, cents) for product_id, (orders, units, cents) in ranked]
+
+    def render(self, format="text", names=None, top=None):
+        """
+        Render the report.
+
+        Args:
+            format (str, optional): One of FORMATS. Defaults to "text".
+            names (dict, optional): Product ids mapped to names. Defaults to None.
+            top (int, optional): Most products to list. Defaults to None (all of them).
+
+        Returns:
+            str: The report.
+
+        Raises:
+            ValueError: If the format is unknown.
+        """
+        names = names or {}
+        days = sorted(self.days.items())
+        products = self.best_sellers(top)
+        totals = [sum(day[position] for key, day in days) for position in range(5)]
+        if format == "text":
+            lines = [f"Sales report: {self.orders} orders, {totals[1]} units, {format_cents(totals[4])} total", "",
+                     f"{'Day':<12}{'Orders':>8}{'Units':>8}{'Subtotal':>14}{'Tax':>12}{'Total':>14}"]
+            for key, (orders, units, subtotal, tax, total) in days:
+                lines.append(f"{key:<12}{orders:>8}{units:>8}{format_cents(subtotal):>14}{format_cents(tax):>12}"
+                             f"{format_cents(total):>14}")
+            lines += ["", f"{'Product':<{NAME_WIDTH + 2}}{'Orders':>8}{'Units':>8}{'Revenue':>14}"]
+            for product_id, orders, units, cents in products:
+                name = names.get(product_id) or f"Product {product_id}"
+                lines.append(f"{name[:NAME_WIDTH]:<{NAME_WIDTH + 2}}{orders:>8}{units:>8}{format_cents(cents):>14}")
+            return "\n".join(lines) + "\n"
+        if format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer, lineterminator="\n")
+            writer.writerow(REPORT_COLUMNS)
+            for key, (orders, units, subtotal, tax, total) in days:
+                writer.writerow(("day", key, orders, units, dollars(subtotal), dollars(tax), dollars(total)))
+            writer.writerow(("all", "", totals[0], totals[1], dollars(totals[2]), dollars(totals[3]),
+                             dollars(totals[4])))
+            for product_id, orders, units, cents in products:
+                writer.writerow(("product", product_id, orders, units, dollars(cents), "", ""))
+            return buffer.getvalue()
+        if format == "json":
+            report = {
+                'orders': self.orders,
+                'units': totals[1],
+                'subtotal': totals[2],
+                'tax': totals[3],
+                'total': totals[4],
+                'days': [{'day': key, 'orders': orders, 'units': units, 'subtotal': subtotal, 'tax': tax,
+                          'total': total} for key, (orders, units, subtotal, tax, total) in days],
+                'products': [{'id': product_id, 'name': names.get(product_id), 'orders': orders, 'units': units,
+                              'revenue': cents} for product_id, orders, units, cents in products],
+            }
+            return json.dumps(report, indent=2) + "\n"
+        raise ValueError(f"Unknown report format {format!r}; expected one of {', '.join(FORMATS)}")
+
+
+# Product names for render_batch, set once per worker process so they are not sent with every batch
+worker_names = None
+
+
+def set_worker_names(names):
+    global worker_names
+    worker_names = names
+
+
+def render_batch(records, format=None):
+    """
+    Render a batch of orders and total them. Runs in a worker process.
+
+    Args:
+        records (list): Receipt or journal records, or raw journal lines.
+        format (str, optional): One of FORMATS. Defaults to None (only total them).
+
+    Returns:
+        tuple: (the rendered receipts, SalesReport of the batch)
+    """
+    render = RENDERERS[format] if format else None
+    report = SalesReport()
+    parts = []
+    loads = json.loads
+    for record in records:
+        if isinstance(record, (bytes, str)):
+            record = loads(record)
+        report.add(record)
+        if render is not None:
+            parts.append(render(record, worker_names))
+    return "".join(parts), report
+
+
+class ReceiptWriter:
+    BATCH_SIZE = 2000
+
+    def __init__(self, file=None, format="text", names=None):
+        """
+        Initialize the ReceiptWriter class.
+
+        Args:
+            file (file, optional): Text file the receipts are written to. Defaults to None (only total them).
+            format (str, optional): One of FORMATS. Defaults to "text".
+            names (dict, optional): Product ids mapped to names, for records that do not carry them.
+                Defaults to None.
+
+        Raises:
+            ValueError: If the format is unknown.
+        """
+        if format not in RENDERERS:
+            raise ValueError(f"Unknown receipt format {format!r}; expected one of {', '.join(FORMATS)}")
+        self.file = file
+        self.format = format
+        self.names = names or {}
+        self.report = SalesReport()
+        if file is not None and format == "csv":
+            csv.writer(file, lineterminator="\n").writerow(RECEIPT_COLUMNS)
+
+    def write(self, order):
+        """
+        Write one receipt and count it in the report.
+
+        Args:
+            order: An Order, a receipt or journal record, or a raw journal line.
+        """
+        if isinstance(order, Order):
+            order = receipt_record(order)
+        elif isinstance(order, (bytes, str)):
+            order = json.loads(order)
+        self.report.add(order)
+        if self.file is not None:
+            self.file.write(RENDERERS[self.format](order, self.names))
+
+    def write_all(self, orders, workers=None, batch_size=BATCH_SIZE):
+        """
+        Write a stream of receipts in order, rendering batches in worker processes when there is more than one CPU.
+
+        At most two batches per worker are in flight, so the stream is never read far ahead of the output.
+
+        Args:
+            orders (iterable): Orders, receipt or journal records, or raw journal lines.
+            workers (int, optional): Worker processes. Defaults to None (one per CPU); 1 renders in this process.
+            batch_size (int, optional): Orders per batch. Defaults to BATCH_SIZE.
+
+        Returns:
+            int: The number of orders written.
+        """
+        workers = workers or os.cpu_count() or 1
+        before = self.report.orders
+        if workers <= 1:
+            for order in orders:
+                self.write(order)
+            return self.report.orders - before
+        format = self.format if self.file is not None else None
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=workers, initializer=set_worker_names, initargs=(self.names,)) as executor:
+            for batch in self.batches(orders, batch_size):
+                if len(pending) >= workers * 2:
+                    self.finish_batch(pending.popleft().result())
+                pending.append(executor.submit(render_batch, batch, format))
+            while pending:
+                self.finish_batch(pending.popleft().result())
+        return self.report.orders - before
+
+    @staticmethod
+    def batches(orders, batch_size):
+        batch = []
+        for order in orders:
+            batch.append(receipt_record(order) if isinstance(order, Order) else order)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def finish_batch(self, result):
+        text, report = result
+        if self.file is not None:
+            self.file.write(text)
+        self.report.merge(report)
+
+
+def journal_lines(directory):
+    """Yield the raw record lines of every journal segment, oldest first."""
+    for path in segment_paths(directory):
+        yield from iter_lines(path)
+
+
+def load_names(path):
+    """Return {product id: name} from a JSON Lines catalog file."""
+    names = {}
+    with open(path, "rb") as file:
+        for line in file:
+            if line.strip():
+                record = catalog.record_from_dict(json.loads(line))
+                names[record[0]] = record[2]
+    return names
+
+
+def open_output(path):
+    if path == "-":
+        return sys.stdout
+    return open(path, "w", encoding="utf-8", newline="")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render receipts and a sales report from the order journal.")
+    parser.add_argument("directory", help="journal directory")
+    parser.add_argument("--format", choices=FORMATS, default="text", help="output format (default: text)")
+    parser.add_argument("--output", metavar="FILE", help="write every receipt to FILE ('-' for stdout)")
+    parser.add_argument("--report", metavar="FILE", help="write the sales report to FILE (default: stdout)")
+    parser.add_argument("--top", type=int, metavar="N", help="list only the N best-selling products in the report")
+    parser.add_argument("--catalog", metavar="FILE", help="JSON Lines catalog to take product names from")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    names = load_names(args.catalog) if args.catalog else {}
+    output = open_output(args.output) if args.output else None
+    try:
+        writer = ReceiptWriter(output, args.format, names)
+        writer.write_all(journal_lines(args.directory), args.workers)
+    finally:
+        if output not in (None, sys.stdout):
+            output.close()
+    report = open_output(args.report or "-")
+    try:
+        report.write(writer.report.render(args.format, names, args.top))
+    finally:
+        if report is not sys.stdout:
+            report.close()
+
+
+if __name__ == "__main__":
+    main()
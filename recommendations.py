@@ -0,0 +1,207 @@
+'''
+    Recommendations.
+
+    Description: "Customers also bought" suggestions from a product co-occurrence index, which counts for every
+                 pair of products how many paid orders contained both. The index is a sparse matrix kept as one
+                 dictionary row per product. It is updated as each order is paid, and each row's best
+                 suggestions are cached until the row changes again, so a lookup is one dictionary access. The
+                 index can be rebuilt in bulk from the order journal, with one worker process counting the pairs
+                 of each segment.
+
+    Usage: python recommendations.py journal --product 7
+'''
+
+
+import argparse
+import heapq
+import json
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+from order_journal import iter_lines, segment_paths
+from orders import Order
+
+
+# Pairs grow with the square of the basket, so only this many distinct products of one order are counted
+MAX_BASKET = 50
+
+
+def basket(product_ids):
+    """Return the distinct product ids of an order in ascending order, so every pair has one canonical form."""
+    return sorted(set(product_ids))[:MAX_BASKET]
+
+
+def count_pairs(path, before=None):
+    """
+    Count the products bought together in one journal segment. Runs in a worker process.
+
+    Args:
+        path (str): The segment file.
+        before (float, optional): Only count orders placed before this time.time() value. Defaults to None.
+
+    Returns:
+        tuple: (orders counted, Counter of (product id, product id) pairs, smaller id first)
+    """
+    pairs = Counter()
+    orders = 0
+    loads = json.loads
+    for line in iter_lines(path):
+        record = loads(line)
+        if before is not None and record['ts'] >= before:
+            continue
+        orders += 1
+        pairs.update(combinations(basket(product_id for product_id, quantity, price_cents in record['lines']), 2))
+    return orders, pairs
+
+
+class CoOccurrenceIndex:
+    TOP_K = 10
+
+    def __init__(self, top_k=TOP_K):
+        """
+        Initialize the CoOccurrenceIndex class with no orders.
+
+        Args:
+            top_k (int, optional): Suggestions cached per product. Defaults to 10.
+        """
+        self.top_k = top_k
+        self.rows = {}
+        self.top = {}
+        self.orders = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add_order(self, product_ids):
+        """
+        Count the products of one order as bought together.
+
+        Args:
+            product_ids (iterable): The products in the order; repeats are ignored.
+        """
+        products = basket(product_ids)
+        with self.lock:
+            rows = self.rows
+            for first, second in combinations(products, 2):
+                row = rows.setdefault(first, {})
+                row[second] = row.get(second, 0) + 1
+                row = rows.setdefault(second, {})
+                row[first] = row.get(first, 0) + 1
+            for product_id in products:
+                self.top.pop(product_id, None)
+            self.orders += 1
+
+    def record_order(self, order):
+        """OrderProcessor listener counting each paid order. Runs on an order worker thread."""
+        if order.status == Order.PAID:
+            self.add_order(product_id for product_id, name, price_cents, quantity in order.lines)
+
+    def add_pairs(self, pairs, orders=0):
+        """
+        Add pair counts to the index in bulk.
+
+        Args:
+            pairs (dict): (product id, product id) pairs mapped to the number of orders containing both.
+            orders (int, optional): The number of orders the pairs were counted from. Defaults to 0.
+        """
+        with self.lock:
+            rows = self.rows
+            for (first, second), count in pairs.items():
+                row = rows.setdefault(first, {})
+                row[second] = row.get(second, 0) + count
+                row = rows.setdefault(second, {})
+                row[first] = row.get(first, 0) + count
+            self.top.clear()
+            self.orders += orders
+
+    def load_journal(self, directory, before=None, workers=None):
+        """
+        Add every order in the journal to the index, one worker process per segment when there is more than one.
+
+        Args:
+            directory (str): The journal directory.
+            before (float, optional): Only count orders placed before this time.time() value, e.g. because
+                later ones are counted as they are paid. Defaults to None (every order).
+            workers (int, optional): Worker processes. Defaults to None (one per CPU); 1 runs in this process.
+
+        Returns:
+            int: The number of orders added.
+        """
+        paths = segment_paths(directory)
+        workers = workers or os.cpu_count() or 1
+        added = 0
+        if len(paths) > 1 and workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for orders, pairs in executor.map(count_pairs, paths, [before] * len(paths)):
+                    self.add_pairs(pairs, orders)
+                    added += orders
+        else:
+            for path in paths:
+                orders, pairs = count_pairs(path, before)
+                self.add_pairs(pairs, orders)
+                added += orders
+        return added
+
+    def recommend(self, product_id, count=None):
+        """
+        Return the products most often bought together with product_id, most frequent first.
+
+        Args:
+            product_id: The product to find companions for.
+            count (int, optional): Most suggestions to return, up to top_k. Defaults to None (top_k).
+        """
+        top = self.top.get(product_id)
+        if top is None:
+            top = self.top_pairs(product_id)
+        return [companion for companion, times in top[:count]]
+
+    def recommend_for(self, product_ids, count=None):
+        """
+        Return suggestions for a group of products, such as a cart, leaving out the products themselves.
+
+        Each product's cached suggestions are combined, adding up how often each was bought with any of them.
+
+        Args:
+            product_ids (iterable): The products to find companions for.
+            count (int, optional): Most suggestions to return. Defaults to None (top_k).
+        """
+        product_ids = set(product_ids)
+        scores = {}
+        for product_id in product_ids:
+            top = self.top.get(product_id)
+            if top is None:
+                top = self.top_pairs(product_id)
+            for companion, times in top:
+                if companion not in product_ids:
+                    scores[companion] = scores.get(companion, 0) + times
+        best = heapq.nsmallest(count or self.top_k, scores.items(), key=lambda item: (-item[1], item[0]))
+        return [companion for companion, score in best]
+
+    def top_pairs(self, product_id):
+        with self.lock:
+            row = self.rows.get(product_id, {})
+            top = heapq.nsmallest(self.top_k, row.items(), key=lambda item: (-item[1], item[0]))
+            self.top[product_id] = top
+            return top
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show what customers bought together, from the order journal.")
+    parser.add_argument("directory", help="journal directory")
+    parser.add_argument("--product", type=int, action="append", default=[], help="product id to find companions for")
+    parser.add_argument("--count", type=int, default=5, help="suggestions per product (default: 5)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    index = CoOccurrenceIndex()
+    print(f"{index.load_journal(args.directory, workers=args.workers)} orders, {len(index)} products")
+    for product_id in args.product:
+        print(f"{product_id}: {' '.join(str(companion) for companion in index.recommend(product_id, args.count))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+'''
+    Remote image fetching.
+
+    Description: Downloads product images over one shared requests session with a bounded connection pool, for
+                 the worker threads of the thumbnail cache. Responses are cached on disk together with their
+                 ETag, Last-Modified and max-age headers, so repeat visits revalidate with a conditional request
+                 or skip the network entirely. Each cache file is written to a temporary file and renamed into
+                 place, the body before its metadata, so a crash never leaves metadata pointing at a partial
+                 body.
+'''
+
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+MAX_AGE_PATTERN = re.compile(r"max-age=(\d+)")
+
+
+class RemoteImageFetcher:
+    DEFAULT_CACHE_DIR = os.path.join("images", ".remote")
+    DEFAULT_TIMEOUT = (3.05, 10)
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_connections=4, timeout=DEFAULT_TIMEOUT, session=None):
+        """
+        Initialize the RemoteImageFetcher class. Safe to use from several threads at once.
+
+        Args:
+            cache_dir (str, optional): Directory for cached responses. Defaults to DEFAULT_CACHE_DIR.
+            max_connections (int, optional): Connections kept open per host; match the number of threads
+                fetching. Defaults to 4.
+            timeout (tuple, optional): Connect and read timeouts in seconds. Defaults to DEFAULT_TIMEOUT.
+            session (requests.Session, optional): Session to reuse. Defaults to None (a pooled session is created).
+        """
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=max_connections, pool_maxsize=max_connections)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+
+    def fetch(self, url):
+        """
+        Return the body of url, using the disk cache and conditional requests where possible.
+
+        Args:
+            url (str): The URL to download.
+
+        Raises:
+            requests.RequestException: If the download fails and nothing is cached.
+        """
+        body_path, meta_path = self.cache_paths(url)
+        meta = self.read_meta(meta_path)
+        if meta is not None and time.time() < meta.get('expires', 0):
+            body = self.read_body(body_path)
+            if body is not None:
+                return body
+            meta = None
+
+        headers = {}
+        if meta is not None:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code != 304:
+                response.raise_for_status()
+        except requests.RequestException:
+            body = None if meta is None else self.read_body(body_path)
+            if body is None:
+                raise
+            return body
+
+        body = None
+        if response.status_code == 304:
+            body = self.read_body(body_path)
+            if body is None:
+                # The cached body is gone, so the validators are worthless; ask for the whole image again
+                meta = None
+                response = self.session.get(url, timeout=self.timeout)
+                response.raise_for_status()
+        if body is None:
+            body = response.content
+            self.write_atomic(body_path, body)
+        meta = {
+            'etag': response.headers.get('ETag', meta and meta.get('etag')),
+            'last_modified': response.headers.get('Last-Modified', meta and meta.get('last_modified')),
+            'expires': time.time() + self.max_age(response.headers.get('Cache-Control', "")),
+        }
+        self.write_atomic(meta_path, json.dumps(meta).encode())
+        return body
+
+    def cache_paths(self, url):
+        digest = hashlib.sha1(url.encode()).hexdigest()
+        return os.path.join(self.cache_dir, digest), os.path.join(self.cache_dir, digest + ".json")
+
+    def read_meta(self, meta_path):
+        try:
+            with open(meta_path) as meta_file:
+                return json.load(meta_file)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def read_body(body_path):
+        try:
+            with open(body_path, "rb") as cached:
+                return cached.read()
+        except OSError:
+            return None
+
+    def write_atomic(self, path, data):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # A unique name per writer, so threads or processes fetching the same URL never share a temporary file
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as output:
+                output.write(data)
+            os.replace(temporary_path, path)
+        except BaseException:
+            try:
+                os.remove(temporary_path)
+            except OSError:
+                pass
+            raise
+
+    @staticmethod
+    def max_age(cache_control):
+        if "no-cache" in cache_control or "no-store" in cache_control:
+            return 0
+        match = MAX_AGE_PATTERN.search(cache_control)
+        return int(match.group(1)) if match else 0
+
+    def shutdown(self):
+        self.session.close()
@@ -0,0 +1,297 @@
+'''
+    Search index for the product catalog.
+
+    Description: Keeps an inverted index over product names (and optionally descriptions) so that searches do
+                 not have to rescan and re-lowercase every product. Every indexed field is broken into
+                 character trigrams and whole-word tokens. Substring queries of three or more characters
+                 intersect the trigram posting lists and verify the few remaining candidates; shorter queries
+                 take the union of the posting lists of every trigram that contains them, plus the few texts
+                 too short to have a trigram. Word-prefix searches walk a sorted token list with bisect.
+                 Categories are kept as precomputed posting lists (facets).
+'''
+
+
+import re
+from bisect import bisect_left, insort
+
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class SearchCancelled(Exception):
+    """Raised when a search notices that its caller no longer wants the results."""
+
+
+class SearchIndex:
+    GRAM_SIZE = 3
+    DEFAULT_FIELDS = ("name",)
+
+    def __init__(self, fields=DEFAULT_FIELDS):
+        """
+        Initialize the SearchIndex class with empty posting lists.
+
+        Posting lists map a trigram or token to the set of product ids containing it. The lowercased text of
+        every indexed field is cached so candidate verification never has to lowercase again.
+
+        Args:
+            fields (tuple, optional): Product fields that can be searched. Indexing descriptions too
+                multiplies the size of the index, so only names are indexed by default.
+        """
+        self.fields = tuple(fields)
+        self.grams = {field: {} for field in self.fields}
+        self.tokens = {field: {} for field in self.fields}
+        # Ids whose text in a field is shorter than a trigram, so no posting list holds them
+        self.short_texts = {field: set() for field in self.fields}
+        self.sorted_tokens = []
+        self.token_counts = {}
+        self.facets = {}
+        self.texts = {}
+        self.categories = {}
+        self.order = {}
+        self.next_order = 0
+
+    def __len__(self):
+        return len(self.order)
+
+    @staticmethod
+    def ngrams(text, size=GRAM_SIZE):
+        """
+        Return the set of all substrings of text that are size characters long.
+
+        Args:
+            text (str): Lowercased text to split.
+            size (int, optional): Length of the n-grams. Defaults to GRAM_SIZE.
+        """
+        return {text[start:start + size] for start in range(len(text) - size + 1)}
+
+    def add(self, product_id, product_info):
+        """
+        Index a product, replacing any previous entry with the same id.
+
+        Args:
+            product_id: The unique identifier of the product.
+            product_info (dict): The product fields; 'category' and the indexed fields are used.
+        """
+        if product_id in self.order:
+            self.update(product_id, product_info)
+            return
+        self.order[product_id] = self.next_order
+        self.next_order += 1
+        self.texts[product_id] = {}
+        for field in self.fields:
+            self._index_field(product_id, field, product_info.get(field) or "")
+        self._add_facet(product_id, product_info['category'])
+
+    def update(self, product_id, product_info):
+        """
+        Re-index only the fields of a product that changed, keeping its position in result ordering.
+
+        Args:
+            product_id: The unique identifier of an indexed product.
+            product_info (dict): The new product fields.
+        """
+        for field in self.fields:
+            text = (product_info.get(field) or "").lower()
+            if text != self.texts[product_id][field]:
+                self._unindex_field(product_id, field)
+                self._index_field(product_id, field, text)
+        if product_info['category'] != self.categories[product_id]:
+            self._remove_facet(product_id)
+            self._add_facet(product_id, product_info['category'])
+
+    def remove(self, product_id):
+        """
+        Drop a product from every posting list.
+
+        Args:
+            product_id: The unique identifier of the product to remove.
+        """
+        if product_id not in self.order:
+            return
+        for field in self.fields:
+            self._unindex_field(product_id, field)
+        self._remove_facet(product_id)
+        del self.texts[product_id]
+        del self.order[product_id]
+
+    def search(self, query, category=None, fields=("name",), cancelled=None):
+        """
+        Find the products whose fields contain query as a case-insensitive substring.
+
+        Args:
+            query (str): The text to look for. An empty query matches every product.
+            category (str, optional): Restrict results to this category. Defaults to None (all categories).
+            fields (tuple, optional): Which indexed fields to match against. Defaults to names only.
+            cancelled (callable, optional): Checked between search phases; when it returns True the search
+                stops with SearchCancelled. Defaults to None (never cancelled).
+
+        Returns:
+            list: Matching product ids in the order they were added.
+
+        Raises:
+            SearchCancelled: If cancelled() returned True.
+            ValueError: If one of fields is not indexed.
+        """
+        matches = self.match(query, category, fields, cancelled)
+        if not query:
+            return list(matches)
+        return self._ordered(matches)
+
+    def match(self, query, category=None, fields=("name",), cancelled=None):
+        """
+        Like search, but skip putting the matches in order.
+
+        Returns:
+            collection: A set of product ids, or a live view of the ids of the whole catalog or of a category
+                when query is empty. Either supports len() and membership tests.
+        """
+        query = (query or "").lower()
+        if category is not None and category not in self.facets:
+            return set()
+        if not query:
+            if category is None:
+                return self.order.keys()
+            return self.facets[category].keys()
+        matches = set()
+        for field in fields:
+            if field not in self.grams:
+                raise ValueError(f"Field {field!r} is not indexed; indexed fields: {', '.join(self.fields)}")
+            matches |= self._field_matches(field, query, cancelled)
+        if category is not None:
+            matches.intersection_update(self.facets[category])
+        self._check(cancelled)
+        return matches
+
+    def search_prefix(self, prefix, category=None, fields=("name",)):
+        """
+        Find the products containing a word that starts with prefix.
+
+        Args:
+            prefix (str): The word prefix to look for.
+            category (str, optional): Restrict results to this category. Defaults to None (all categories).
+            fields (tuple, optional): Which fields to match against. Defaults to names only.
+
+        Returns:
+            list: Matching product ids in the order they were added.
+        """
+        matches = self._prefix_matches(prefix.lower(), fields)
+        if category is not None:
+            matches.intersection_update(self.facets.get(category, ()))
+        return self._ordered(matches)
+
+    def category_ids(self, category):
+        """Return the posting list of a category as ids in the order they were added."""
+        return list(self.facets.get(category, ()))
+
+    def facet_counts(self, product_ids=None):
+        """
+        Count products per category.
+
+        Args:
+            product_ids (iterable, optional): Only count these products. Defaults to None (every product).
+
+        Returns:
+            dict: Category name mapped to the number of matching products.
+        """
+        if product_ids is None:
+            return {category: len(ids) for category, ids in self.facets.items()}
+        counts = {}
+        for product_id in product_ids:
+            category = self.categories[product_id]
+            counts[category] = counts.get(category, 0) + 1
+        return counts
+
+    def _prefix_matches(self, prefix, fields):
+        matches = set()
+        sorted_tokens = self.sorted_tokens
+        position = bisect_left(sorted_tokens, prefix)
+        while position < len(sorted_tokens) and sorted_tokens[position].startswith(prefix):
+            for field in fields:
+                matches |= self.tokens[field].get(sorted_tokens[position], set())
+            position += 1
+        return matches
+
+    def _field_matches(self, field, query, cancelled=None):
+        postings = self.grams[field]
+        if len(query) < self.GRAM_SIZE:
+            # Every occurrence in a text of at least GRAM_SIZE characters lies inside one of its trigrams,
+            # and there are far fewer distinct trigrams than products
+            matches = set()
+            for gram, posting in postings.items():
+                if query in gram:
+                    matches |= posting
+            matches.update(product_id for product_id in self.short_texts[field]
+                           if query in self.texts[product_id][field])
+            return matches
+        if len(query) == self.GRAM_SIZE:
+            return set(postings.get(query, ()))
+        lists = []
+        for start in range(len(query) - self.GRAM_SIZE + 1):
+            posting = postings.get(query[start:start + self.GRAM_SIZE])
+            if not posting:
+                return set()
+            lists.append(posting)
+        lists.sort(key=len)
+        candidates = set(lists[0])
+        for posting in lists[1:]:
+            candidates &= posting
+            if not candidates:
+                return candidates
+        self._check(cancelled)
+        return {product_id for product_id in candidates if query in self.texts[product_id][field]}
+
+    @staticmethod
+    def _check(cancelled):
+        if cancelled is not None and cancelled():
+            raise SearchCancelled()
+
+    def _ordered(self, product_ids):
+        return sorted(product_ids, key=self.order.__getitem__)
+
+    def _index_field(self, product_id, field, text):
+        text = text.lower()
+        self.texts[product_id][field] = text
+        if len(text) < self.GRAM_SIZE:
+            self.short_texts[field].add(product_id)
+        postings = self.grams[field]
+        for gram in self.ngrams(text):
+            postings.setdefault(gram, set()).add(product_id)
+        tokens = self.tokens[field]
+        for token in set(TOKEN_PATTERN.findall(text)):
+            tokens.setdefault(token, set()).add(product_id)
+            count = self.token_counts.get(token, 0)
+            if count == 0:
+                insort(self.sorted_tokens, token)
+            self.token_counts[token] = count + 1
+
+    def _unindex_field(self, product_id, field):
+        text = self.texts[product_id][field]
+        self.short_texts[field].discard(product_id)
+        postings = self.grams[field]
+        for gram in self.ngrams(text):
+            posting = postings[gram]
+            posting.discard(product_id)
+            if not posting:
+                del postings[gram]
+        tokens = self.tokens[field]
+        for token in set(TOKEN_PATTERN.findall(text)):
+            posting = tokens[token]
+            posting.discard(product_id)
+            if not posting:
+                del tokens[token]
+            self.token_counts[token] -= 1
+            if self.token_counts[token] == 0:
+                del self.token_counts[token]
+                del self.sorted_tokens[bisect_left(self.sorted_tokens, token)]
+
+    def _add_facet(self, product_id, category):
+        # Dicts keep insertion order, so a facet doubles as an ordered set of ids.
+        self.facets.setdefault(category, {})[product_id] = None
+        self.categories[product_id] = category
+
+    def _remove_facet(self, product_id):
+        category = self.categories.pop(product_id)
+        facet = self.facets[category]
+        del facet[product_id]
+        if not facet:
+            del self.facets[category]
@@ -0,0 +1,89 @@
+'''
+    Sorted views.
+
+    Description: A lazy, read-only sequence of product ids taken from a range of a presorted index, such as the
+                 (price, product id) list kept by Products. Without a filter, slicing maps straight onto the
+                 index, so showing any page of a sorted million-row result costs only the rows on that page.
+                 With a filter (the ids a search or category matched), the range is walked once when the view
+                 is built, on the thread that runs the search, and only members are kept; the UI thread then
+                 only slices the result.
+'''
+
+
+class SortedView:
+    def __init__(self, entries, start, end, descending=False, among=None):
+        """
+        Initialize the SortedView class.
+
+        The index must not be edited in place while the view is in use; Products replaces its indexes on every
+        change, so a view keeps showing the catalog as it was when the view was taken. For the same reason among
+        should be a snapshot, such as a frozenset, rather than a live view of another collection.
+
+        Args:
+            entries (list): Sorted (key, product id) pairs.
+            start (int): First position of the range in entries.
+            end (int): Position just past the range.
+            descending (bool, optional): Walk the range from the end. Defaults to False.
+            among (collection, optional): Only include these product ids. Defaults to None (every id in range).
+        """
+        self.entries = entries
+        self.start = start
+        self.end = max(start, end)
+        self.descending = descending
+        self.among = among
+        self.matched = []
+        self.scanned = 0
+        if among is None:
+            self.length = self.end - self.start
+        elif self.start == 0 and self.end == len(entries):
+            self.length = len(among)
+        else:
+            # Walking the range here keeps len(), which the UI calls, from doing it on the UI thread
+            self.scan(None)
+            self.length = len(self.matched)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            if index.step not in (None, 1) or (index.start or 0) < 0 or (index.stop or 0) < 0:
+                return list(self)[index]
+            first = index.start or 0
+            stop = index.stop
+            if self.among is not None:
+                self.scan(stop)
+                return self.matched[first:stop]
+            stop = self.end - self.start if stop is None else min(stop, self.end - self.start)
+            if first >= stop:
+                return []
+            if self.descending:
+                entries = self.entries[self.end - stop:self.end - first]
+                entries.reverse()
+            else:
+                entries = self.entries[self.start + first:self.start + stop]
+            return [product_id for key, product_id in entries]
+        if index < 0:
+            index += len(self)
+        rows = self[index:index + 1] if index >= 0 else []
+        if not rows:
+            raise IndexError("SortedView index out of range")
+        return rows[0]
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def scan(self, count):
+        """Walk the range until count members have been found, or to its end if count is None."""
+        among = self.among
+        matched = self.matched
+        total = self.end - self.start
+        while self.scanned < total and (count is None or len(matched) < count):
+            chunk = min(total - self.scanned, max(256, (count or total) - len(matched)))
+            if self.descending:
+                entries = self.entries[self.end - self.scanned - chunk:self.end - self.scanned]
+                entries.reverse()
+            else:
+                entries = self.entries[self.start + self.scanned:self.start + self.scanned + chunk]
+            matched.extend(product_id for key, product_id in entries if product_id in among)
+            self.scanned += chunk
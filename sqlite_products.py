@@ -0,0 +1,500 @@
+'''
+    SQLite product catalog.
+
+    Description: A persistent storage backend with the same methods as the Products class in main.py. Products
+                 live in an indexed SQLite table and names and descriptions are searched through an FTS5 trigram
+                 index, so substring search, category and price filters all run inside SQLite. Search results
+                 are returned as lazy sequences that fetch rows a page at a time. Large catalogs are imported
+                 from CSV or JSONL files in a single transaction. A database file is opened in WAL mode and every
+                 thread reads through a connection of its own, so reads, such as the pages the Tk thread shows,
+                 never wait for a write in progress.
+
+    Usage: python sqlite_products.py catalog.db products.csv [more files...]
+'''
+
+
+import argparse
+import csv
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from itertools import islice
+
+import catalog
+from search_index import SearchCancelled
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    category TEXT NOT NULL,
+    name TEXT NOT NULL,
+    price REAL NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    image_path TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS products_category ON products (category, id);
+CREATE INDEX IF NOT EXISTS products_price ON products (price, id);
+CREATE INDEX IF NOT EXISTS products_name ON products (name);
+CREATE INDEX IF NOT EXISTS products_name_order ON products (name COLLATE NOCASE, id);
+"""
+
+FTS_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5 (
+    name, description, content='products', content_rowid='id', tokenize='trigram'
+)
+"""
+
+FTS_TRIGGERS = {
+    'products_fts_insert': """
+        CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+            INSERT INTO products_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+        END
+    """,
+    'products_fts_delete': """
+        CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+            INSERT INTO products_fts (products_fts, rowid, name, description)
+            VALUES ('delete', old.id, old.name, old.description);
+        END
+    """,
+    'products_fts_update': """
+        CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF name, description ON products BEGIN
+            INSERT INTO products_fts (products_fts, rowid, name, description)
+            VALUES ('delete', old.id, old.name, old.description);
+            INSERT INTO products_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+        END
+    """,
+}
+
+COLUMNS = "category, name, price, description, image_path"
+INSERT_PRODUCT = f"INSERT INTO products (id, {COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)"
+UPSERT_PRODUCT = INSERT_PRODUCT + (" ON CONFLICT (id) DO UPDATE SET category = excluded.category, name = excluded.name,"
+                                   " price = excluded.price, description = excluded.description,"
+                                   " image_path = excluded.image_path")
+SELECT_BY_ID = f"SELECT {COLUMNS} FROM products WHERE id = ?"
+SELECT_BY_NAME = f"SELECT {COLUMNS} FROM products WHERE name = ? ORDER BY id LIMIT 1"
+SELECT_BY_CATEGORY = f"SELECT {COLUMNS} FROM products WHERE category = ? ORDER BY id"
+FIELDS = ('category', 'name', 'price', 'description', 'image_path')
+
+
+class LazyResults:
+    def __init__(self, catalog, where, params, order="id", length=None):
+        """
+        Initialize the LazyResults class, a read-only sequence of product ids backed by one query.
+
+        Rows are fetched with LIMIT/OFFSET when they are indexed or sliced, so only the pages that are
+        actually displayed are ever read.
+
+        Args:
+            catalog (SqliteProducts): The catalog to query.
+            where (str): SQL condition selecting the products (may be "1").
+            params (tuple): Parameters for the condition.
+            order (str, optional): SQL ORDER BY expression. Defaults to "id".
+            length (int, optional): The number of results if already known. Defaults to None.
+        """
+        self.catalog = catalog
+        self.where = where
+        self.params = tuple(params)
+        self.order = order
+        self.length = length
+
+    def __len__(self):
+        if self.length is None:
+            self.length = self.catalog.fetch_value(f"SELECT COUNT(*) FROM products WHERE {self.where}", self.params)
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if start >= stop:
+                return []
+            return self.fetch(start, stop - start)[::step]
+        if index < 0:
+            index += len(self)
+        ids = self.fetch(index, 1)
+        if not ids:
+            raise IndexError("LazyResults index out of range")
+        return ids[0]
+
+    def __iter__(self):
+        offset = 0
+        while True:
+            ids = self.fetch(offset, self.catalog.PAGE_SIZE)
+            yield from ids
+            if len(ids) < self.catalog.PAGE_SIZE:
+                return
+            offset += len(ids)
+
+    def fetch(self, offset, limit):
+        query = f"SELECT id FROM products WHERE {self.where} ORDER BY {self.order} LIMIT ? OFFSET ?"
+        return [row[0] for row in self.catalog.fetch_all(query, self.params + (limit, offset))]
+
+
+class SqliteProducts:
+    PAGE_SIZE = 500
+    IMPORT_BATCH = 10000
+    SORT_ORDERS = {
+        None: "id",
+        'name': "name COLLATE NOCASE {direction}, id {direction}",
+        'price': "price {direction}, id {direction}",
+    }
+
+    def __init__(self, path=":memory:"):
+        """
+        Initialize the SqliteProducts class, creating the schema if needed.
+
+        Args:
+            path (str, optional): Database file. Defaults to ":memory:".
+        """
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False, cached_statements=256)
+        self.lock = threading.RLock()
+        self.writes = 0
+        self.readers = threading.local()
+        self.reader_connections = []
+        self.readers_lock = threading.Lock()
+        # A second connection only for reading data_version, so polling the version never waits for a write
+        self.watcher = None if path == ":memory:" else sqlite3.connect(path, check_same_thread=False)
+        self.watcher_lock = threading.Lock()
+        with self.lock, self.connection:
+            if path != ":memory:":
+                self.connection.execute("PRAGMA journal_mode = WAL")
+            self.connection.execute("PRAGMA synchronous = NORMAL")
+            self.connection.executescript(SCHEMA)
+            try:
+                self.connection.execute(FTS_TABLE)
+                for trigger in FTS_TRIGGERS.values():
+                    self.connection.execute(trigger)
+                self.full_text = True
+            except sqlite3.OperationalError:
+                # SQLite was built without FTS5 or the trigram tokenizer; fall back to LIKE scans.
+                self.full_text = False
+
+    def __len__(self):
+        return self.fetch_value("SELECT COUNT(*) FROM products")
+
+    @property
+    def version(self):
+        """
+        A value that changes whenever the catalog is written, by this connection or any other.
+
+        Does not take the store lock, so the Tk thread can poll it while a long write such as a catalog load runs.
+        """
+        if self.watcher is None:
+            return (self.writes, 0)
+        with self.watcher_lock:
+            return (self.writes, self.watcher.execute("PRAGMA data_version").fetchone()[0])
+
+    def add_product(self, product_id, category, name, price, description, image_path):
+        with self.lock, self.connection:
+            self.connection.execute(UPSERT_PRODUCT, (product_id, category, name, price, description, image_path))
+            self.writes += 1
+
+    def add_products(self, records):
+        """
+        Bulk-load products in one transaction.
+
+        Args:
+            records (iterable): Tuples of (product_id, category, name, price, description, image_path).
+
+        Returns:
+            int: The number of products written.
+        """
+        with self.lock, self.connection:
+            return self._write_batches(records)
+
+    def bulk_import(self, records):
+        """
+        Load a large number of products in one transaction.
+
+        The full-text triggers are dropped for the duration of the import and the full-text index is rebuilt
+        once at the end, which is several times faster than updating it row by row.
+
+        Args:
+            records (iterable): Tuples of (product_id, category, name, price, description, image_path).
+
+        Returns:
+            int: The number of products written.
+        """
+        with self.lock, self.connection:
+            if not self.full_text:
+                return self._write_batches(records)
+            for trigger in FTS_TRIGGERS:
+                self.connection.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            count = self._write_batches(records)
+            self.connection.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+            for trigger in FTS_TRIGGERS.values():
+                self.connection.execute(trigger)
+            return count
+
+    def _write_batches(self, records):
+        records = iter(records)
+        count = 0
+        self.writes += 1
+        while True:
+            batch = list(islice(records, self.IMPORT_BATCH))
+            if not batch:
+                return count
+            self.connection.executemany(UPSERT_PRODUCT, batch)
+            count += len(batch)
+
+    def update_product(self, product_id, **fields):
+        """
+        Change some fields of an existing product.
+
+        Args:
+            product_id: The unique identifier of the product to update.
+            **fields: New values for any of the product fields.
+
+        Raises:
+            KeyError: If the product does not exist or an unknown field is given.
+        """
+        unknown = set(fields) - set(FIELDS)
+        if unknown:
+            raise KeyError(f"Unknown product fields: {', '.join(sorted(unknown))}")
+        if not fields:
+            return
+        assignments = ", ".join(f"{field} = ?" for field in sorted(fields))
+        with self.lock, self.connection:
+            cursor = self.connection.execute(f"UPDATE products SET {assignments} WHERE id = ?",
+                                             [fields[field] for field in sorted(fields)] + [product_id])
+            if cursor.rowcount == 0:
+                raise KeyError(product_id)
+            self.writes += 1
+
+    def apply_changes(self, records, removed=()):
+        """
+        Add or replace many products and remove others in one transaction.
+
+        Args:
+            records (iterable): Tuples of (product_id, category, name, price, description, image_path).
+            removed (iterable, optional): Ids of products to remove. Defaults to ().
+        """
+        with self.lock, self.connection:
+            self._write_batches(records)
+            self.connection.executemany("DELETE FROM products WHERE id = ?", [(product_id,) for product_id in removed])
+            self.writes += 1
+
+    def remove_product(self, product_id):
+        """
+        Remove a product.
+
+        Returns:
+            dict: The removed product information, or None if the product did not exist.
+        """
+        with self.lock, self.connection:
+            rows = self.connection.execute(SELECT_BY_ID, (product_id,)).fetchall()
+            product_info = self.to_dict(rows[0]) if rows else None
+            if product_info is not None:
+                self.connection.execute("DELETE FROM products WHERE id = ?", (product_id,))
+                self.writes += 1
+            return product_info
+
+    def get_product_info(self, product_id):
+        rows = self.fetch_all(SELECT_BY_ID, (product_id,))
+        return self.to_dict(rows[0]) if rows else None
+
+    def get_products_by_category(self, category):
+        return [self.to_dict(row) for row in self.fetch_all(SELECT_BY_CATEGORY, (category,))]
+
+    def get_product_by_name(self, name):
+        rows = self.fetch_all(SELECT_BY_NAME, (name,))
+        return self.to_dict(rows[0]) if rows else None
+
+    def get_products_by_price(self, min_price=None, max_price=None, descending=False):
+        """
+        Return products within a price range, ordered by price.
+
+        Args:
+            min_price (float, optional): Lowest price to include. Defaults to None (no lower bound).
+            max_price (float, optional): Highest price to include. Defaults to None (no upper bound).
+            descending (bool, optional): Most expensive first. Defaults to False.
+        """
+        direction = "DESC" if descending else "ASC"
+        query = (f"SELECT {COLUMNS} FROM products WHERE price >= ? AND price <= ?"
+                 f" ORDER BY price {direction}, id {direction}")
+        low = float('-inf') if min_price is None else min_price
+        high = float('inf') if max_price is None else max_price
+        return [self.to_dict(row) for row in self.fetch_all(query, (low, high))]
+
+    def search(self, query, category=None, fields=("name",)):
+        """
+        Search the catalog inside SQLite.
+
+        Args:
+            query (str): Case-insensitive substring to look for. An empty query matches every product.
+            category (str, optional): Restrict results to this category. Defaults to None (all categories).
+            fields (tuple, optional): Product fields to match against. Defaults to names only.
+
+        Returns:
+            list: The matching product dictionaries in catalog order.
+        """
+        return [self.get_product_info(product_id) for product_id in self.search_ids(query, category, fields)]
+
+    def search_ids(self, query, category=None, fields=("name",), cancelled=None):
+        """
+        Like search, but return a lazy sequence of matching product ids.
+
+        Args:
+            cancelled (callable, optional): Abort with SearchCancelled once this returns True. Defaults to None.
+        """
+        return self.search_sorted(query, category, fields=fields, cancelled=cancelled)
+
+    def search_sorted(self, query, category=None, sort_by=None, descending=False, min_price=None, max_price=None,
+                      fields=("name",), cancelled=None):
+        """
+        Like search_ids, but ordered by name or price through their indexes and limited to a price range.
+
+        Args:
+            sort_by (str, optional): 'name' or 'price'. Defaults to None (catalog order).
+            descending (bool, optional): Reverse the order. Defaults to False.
+            min_price (float, optional): Lowest price to include. Defaults to None (no lower bound).
+            max_price (float, optional): Highest price to include. Defaults to None (no upper bound).
+
+        Raises:
+            ValueError: If sort_by is not a sortable field.
+        """
+        if sort_by not in self.SORT_ORDERS:
+            raise ValueError(f"Cannot sort products by {sort_by!r}")
+        direction = "DESC" if descending else "ASC"
+        order = self.SORT_ORDERS[sort_by].format(direction=direction)
+        where, params = self.search_condition(query, category, fields, min_price, max_price)
+        results = LazyResults(self, where, params, order)
+        with self.reading() as connection:
+            if cancelled is not None:
+                if cancelled():
+                    raise SearchCancelled()
+                connection.set_progress_handler(lambda: 1 if cancelled() else 0, 1000)
+            try:
+                results.length = connection.execute(f"SELECT COUNT(*) FROM products WHERE {where}",
+                                                    params).fetchone()[0]
+            except sqlite3.OperationalError:
+                if cancelled is not None and cancelled():
+                    raise SearchCancelled()
+                raise
+            finally:
+                if cancelled is not None:
+                    connection.set_progress_handler(None, 0)
+        return results
+
+    def search_condition(self, query, category=None, fields=("name",), min_price=None, max_price=None):
+        """Return the SQL condition and parameters selecting the products that match a search."""
+        conditions = []
+        params = []
+        if query and self.full_text and len(query) >= 3:
+            columns = " ".join(fields)
+            conditions.append("id IN (SELECT rowid FROM products_fts WHERE products_fts MATCH ?)")
+            params.append("{%s} : \"%s\"" % (columns, query.replace('"', '""')))
+        elif query:
+            pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            conditions.append("(" + " OR ".join(f"{field} LIKE ? ESCAPE '\\'" for field in fields) + ")")
+            params.extend([pattern] * len(fields))
+        if category is not None:
+            conditions.append("category = ?")
+            params.append(category)
+        if min_price is not None:
+            conditions.append("price >= ?")
+            params.append(min_price)
+        if max_price is not None:
+            conditions.append("price <= ?")
+            params.append(max_price)
+        return " AND ".join(conditions) or "1", params
+
+    def page(self, offset, limit=PAGE_SIZE, category=None):
+        """
+        Return one page of products in catalog order.
+
+        Args:
+            offset (int): Number of products to skip.
+            limit (int, optional): Page size. Defaults to PAGE_SIZE.
+            category (str, optional): Restrict the page to this category. Defaults to None.
+        """
+        where, params = self.search_condition("", category)
+        query = f"SELECT {COLUMNS} FROM products WHERE {where} ORDER BY id LIMIT ? OFFSET ?"
+        return [self.to_dict(row) for row in self.fetch_all(query, tuple(params) + (limit, offset))]
+
+    def import_csv(self, path):
+        """
+        Import a CSV file with a header of id, category, name, price, description and image_path.
+
+        Returns:
+            int: The number of products imported.
+        """
+        with open(path, newline="", encoding="utf-8") as csv_file:
+            return self.bulk_import(self.record_from_dict(row) for row in csv.DictReader(csv_file))
+
+    def import_jsonl(self, path):
+        """
+        Import a JSON Lines file with one product object per line.
+
+        Returns:
+            int: The number of products imported.
+        """
+        with open(path, encoding="utf-8") as jsonl_file:
+            return self.bulk_import(self.record_from_dict(json.loads(line)) for line in jsonl_file if line.strip())
+
+    def import_file(self, path):
+        if path.endswith(".csv"):
+            return self.import_csv(path)
+        return self.import_jsonl(path)
+
+    @staticmethod
+    def record_from_dict(row):
+        return catalog.record_from_dict(row)
+
+    @staticmethod
+    def to_dict(row):
+        return dict(zip(FIELDS, row))
+
+    @contextmanager
+    def reading(self):
+        """
+        Lend out the calling thread's read connection, opening it on first use.
+
+        An in-memory database exists only in the main connection, so reading it takes the store lock instead.
+        """
+        if self.path == ":memory:":
+            with self.lock:
+                yield self.connection
+            return
+        connection = getattr(self.readers, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False, cached_statements=256)
+            connection.execute("PRAGMA query_only = ON")
+            self.readers.connection = connection
+            with self.readers_lock:
+                self.reader_connections.append(connection)
+        yield connection
+
+    def fetch_all(self, query, params=()):
+        with self.reading() as connection:
+            return connection.execute(query, params).fetchall()
+
+    def fetch_value(self, query, params=()):
+        return self.fetch_all(query, params)[0][0]
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+        with self.readers_lock:
+            for connection in self.reader_connections:
+                connection.close()
+        if self.watcher is not None:
+            with self.watcher_lock:
+                self.watcher.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import product files into a SQLite catalog.")
+    parser.add_argument("database", help="SQLite catalog to create or update")
+    parser.add_argument("files", nargs="+", help="CSV or JSONL product files")
+    args = parser.parse_args()
+    catalog = SqliteProducts(args.database)
+    for path in args.files:
+        print(f"{path}: {catalog.import_file(path)} products")
+    catalog.close()
+
+
+if __name__ == "__main__":
+    main()
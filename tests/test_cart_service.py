@@ -0,0 +1,106 @@
+'''
+    Stress tests for the cart service: many threads sharing carts must never lose an update or oversell stock.
+
+    Usage: python -m pytest tests
+'''
+
+
+import random
+import sys
+import threading
+import unittest
+from collections import Counter
+
+from cart_service import CartService
+from inventory import Inventory, OutOfStock
+from main import Products
+from orders import Order, OrderProcessor, StubPaymentGateway
+
+
+THREADS = 8
+DETAILS = {'cardholder_name': "Stress Test", 'card_number': "4242 4242 4242 4242", 'expiration_date': "12/99",
+           'cvv': "123", 'address': "1 Main St", 'city': "Springfield", 'state': "IL", 'zip_code': "62701"}
+
+
+def run_threads(count, target):
+    """Run target(thread_number) on count threads with a tiny switch interval, so races show up quickly."""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=target, args=(number,)) for number in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+
+class CartServiceStressTest(unittest.TestCase):
+    def setUp(self):
+        self.products = Products()
+        self.products.add_products((product_id, "Consoles", f"Product {product_id}", 1.99 + product_id, "", "")
+                                   for product_id in range(1, 21))
+        self.processor = OrderProcessor(StubPaymentGateway(), workers=4, max_pending=10000)
+        self.inventory = Inventory()
+        self.service = CartService(self.products, self.processor, self.inventory)
+
+    def tearDown(self):
+        self.processor.shutdown(wait=True)
+
+    def test_shared_carts_lose_no_updates(self):
+        session_ids = [self.service.create_session() for _ in range(THREADS)]
+        tallies = [Counter() for _ in range(THREADS)]
+
+        def shop(number):
+            rng = random.Random(number)
+            tally = tallies[number]
+            for _ in range(500):
+                session_id = rng.choice(session_ids)
+                product_id = rng.randint(1, 20)
+                if tally[session_id, product_id] and rng.random() < 0.3:
+                    quantity = rng.randint(1, tally[session_id, product_id])
+                    self.service.remove_item(session_id, product_id, quantity)
+                    tally[session_id, product_id] -= quantity
+                else:
+                    quantity = rng.randint(1, 3)
+                    self.service.add_item(session_id, product_id, quantity)
+                    tally[session_id, product_id] += quantity
+
+        run_threads(THREADS, shop)
+        expected = sum(tallies, Counter())
+        for session_id in session_ids:
+            cart = self.service.cart(session_id)
+            quantities = {product_id: cart[product_id]['quantity'] for product_id in cart.keys()}
+            self.assertEqual(quantities, {product_id: expected[session_id, product_id] for product_id in range(1, 21)
+                                          if expected[session_id, product_id]})
+            self.assertEqual(cart.item_count, sum(quantities.values()))
+            self.assertEqual(cart.subtotal_cents, sum(map(cart.line_total_cents, cart.keys())))
+
+    def test_racing_checkouts_never_oversell(self):
+        buyers = [self.service.create_session() for _ in range(THREADS * 60)]
+        units = len(buyers) // 2
+        self.inventory.restock({1: units})
+        orders = []
+        sold_out = []
+
+        def check_out(number):
+            for session_id in buyers[number::THREADS]:
+                try:
+                    self.service.add_item(session_id, 1)
+                except OutOfStock:
+                    sold_out.append(session_id)
+                    continue
+                orders.append(self.service.checkout(session_id, DETAILS))
+
+        run_threads(THREADS, check_out)
+        self.processor.shutdown(wait=True)
+        self.assertEqual(len(orders), units)
+        self.assertEqual(len(sold_out), len(buyers) - units)
+        self.assertTrue(all(order.status == Order.PAID for order in orders))
+        self.assertEqual(self.inventory.available(1), 0)
+        self.assertEqual(sum(len(self.service.cart(session_id)) for session_id in buyers), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+'''
+    Tests for normalizing catalog records.
+
+    Usage: python -m pytest tests
+'''
+
+
+import unittest
+from decimal import Decimal
+
+import catalog
+
+
+class ParsePriceTest(unittest.TestCase):
+    def test_accepts_numbers_and_written_prices(self):
+        for value, price in [(499.99, 499.99), (12, 12.0), (Decimal("0.50"), 0.5), ("499.99", 499.99),
+                             (" $1,399.99 ", 1399.99), ("$0", 0.0)]:
+            with self.subTest(value=value):
+                self.assertEqual(catalog.parse_price(value), price)
+
+    def test_rejects_values_that_are_not_prices(self):
+        for value in ["", "free", "$", True, None]:
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    catalog.parse_price(value)
+
+    def test_rejects_values_that_are_not_finite(self):
+        for value in ["nan", "NaN", "inf", "-Infinity", "$inf", "sNaN", float('nan'), float('inf'),
+                      Decimal("Infinity")]:
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    catalog.parse_price(value)
+
+    def test_catalog_row_with_a_price_that_is_not_finite_is_rejected(self):
+        with self.assertRaises(ValueError):
+            catalog.record_from_dict({'id': 1, 'category': "Consoles", 'name': "Widget", 'price': "nan"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+'''
+    Tests for reloading the catalog file into a product store.
+
+    Usage: python -m pytest tests
+'''
+
+
+import json
+import os
+import tempfile
+import unittest
+
+from catalog_watch import CatalogFile
+from inventory import Inventory
+from main import Products
+
+
+def line(product_id, name="Widget", price=9.99, **extra):
+    row = dict(id=product_id, category="Consoles", name=name, price=price, description="", image_path="")
+    row.update(extra)
+    return row
+
+
+class CatalogFileTest(unittest.TestCase):
+    def setUp(self):
+        self.temporary = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temporary.name, "catalog.jsonl")
+        self.products = Products()
+        self.inventory = Inventory()
+        self.catalog_file = CatalogFile(self.path, self.products, self.inventory, default_stock=3)
+
+    def tearDown(self):
+        self.temporary.cleanup()
+
+    def write(self, rows):
+        with open(self.path, "w") as file:
+            file.writelines(json.dumps(row) + "\n" for row in rows)
+
+    def test_stock_comes_from_the_catalog(self):
+        self.write([line(1, stock=5), line(2)])
+        self.catalog_file.reload()
+        self.assertEqual(self.inventory.available(1), 5)
+        self.assertEqual(self.inventory.available(2), 3)
+
+    def test_added_products_are_stocked_once(self):
+        self.write([line(1, stock=5)])
+        self.catalog_file.reload()
+        self.inventory.reserve("shopper", 1, 2)
+        self.write([line(1, price=8.99, stock=5), line(2, stock=7)])
+        changes = self.catalog_file.reload()
+        self.assertEqual((changes.added, changes.updated), ([2], [1]))
+        self.assertEqual(self.inventory.available(1), 3)
+        self.assertEqual(self.inventory.available(2), 7)
+
+    def test_changed_line_updates_the_product(self):
+        self.write([line(1), line(2)])
+        self.catalog_file.reload()
+        self.write([line(1), line(2, name="Gadget", image_path="new.png")])
+        changes = self.catalog_file.reload()
+        self.assertEqual((changes.added, changes.updated, changes.removed), ([], [2], []))
+        self.assertEqual(self.products.get_product_info(2)['name'], "Gadget")
+        self.assertFalse(self.catalog_file.reload())
+
+    def test_deleted_line_removes_the_product(self):
+        self.write([line(1), line(2, image_path="two.png")])
+        self.catalog_file.reload()
+        self.write([line(1)])
+        changes = self.catalog_file.reload()
+        self.assertEqual((changes.added, changes.updated, changes.removed), ([], [], [2]))
+        self.assertEqual(changes.stale_images, {"two.png"})
+        self.assertIsNone(self.products.get_product_info(2))
+        self.assertEqual(self.catalog_file.line_counts, {1: 1})
+
+    def test_added_line_adds_the_product(self):
+        self.write([line(1)])
+        self.catalog_file.reload()
+        self.write([line(1), line(2, name="Gadget")])
+        changes = self.catalog_file.reload()
+        self.assertEqual((changes.added, changes.updated, changes.removed), ([2], [], []))
+        self.assertEqual(self.products.get_product_info(2)['name'], "Gadget")
+
+    def test_product_listed_twice_stays_until_its_last_line_goes(self):
+        self.write([line(1, name="First"), line(2), line(1, name="Second")])
+        self.catalog_file.reload()
+        self.assertEqual(self.products.get_product_info(1)['name'], "Second")
+        self.write([line(1, name="First"), line(2)])
+        changes = self.catalog_file.reload()
+        self.assertEqual((changes.updated, changes.removed), ([1], []))
+        self.assertEqual(self.products.get_product_info(1)['name'], "First")
+        self.write([line(2)])
+        changes = self.catalog_file.reload()
+        self.assertEqual(changes.removed, [1])
+        self.assertIsNone(self.products.get_product_info(1))
+
+    def test_invalid_line_applies_nothing(self):
+        self.write([line(1), line(2)])
+        self.catalog_file.reload()
+        hashes = dict(self.catalog_file.hashes)
+        self.write([line(1, price=1.99), {'id': 3, 'name': "No category"}])
+        with self.assertRaises(ValueError):
+            self.catalog_file.reload()
+        self.assertEqual(self.products.get_product_info(1)['price'], 9.99)
+        self.assertIsNotNone(self.products.get_product_info(2))
+        self.assertEqual(self.catalog_file.hashes, hashes)
+        self.write([line(1, price=1.99)])
+        changes = self.catalog_file.reload()
+        self.assertEqual((changes.updated, changes.removed), ([1], [2]))
+
+    def test_invalid_stock_is_rejected(self):
+        self.write([line(1, stock=-1)])
+        with self.assertRaises(ValueError):
+            self.catalog_file.reload()
+        self.assertEqual(len(self.products), 0)
+        self.assertEqual(len(self.inventory), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
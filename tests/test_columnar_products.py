@@ -0,0 +1,70 @@
+'''
+    Tests for the columnar product store, checked against the in-memory Products store.
+
+    Usage: python -m pytest tests
+'''
+
+
+import random
+import unittest
+from unittest import mock
+
+import columnar_products
+from columnar_products import ColumnarProducts
+from main import Products
+
+
+CATEGORIES = ("Consoles", "Laptops", "Appliances")
+
+
+def random_records(rng, count, first_id=1):
+    return [(product_id, rng.choice(CATEGORIES), f"{rng.choice(['Zeta', 'alpha', 'Beta', 'gamma'])} {product_id % 7}",
+             float(rng.randint(1, 50)), "", "") for product_id in range(first_id, first_id + count)]
+
+
+class ColumnarProductsTest(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(3)
+        records = random_records(rng, 300)
+        self.products = Products()
+        self.products.add_products(records)
+        self.columns = ColumnarProducts()
+        self.columns.add_products(records)
+
+    def assert_same_searches(self):
+        rng = random.Random(5)
+        for _ in range(100):
+            args = (rng.choice(["", "a", "eta 3", "zz"]), rng.choice((None,) + CATEGORIES), rng.choice(("name", "price")),
+                    rng.random() < 0.5, rng.choice([None, 10.0]), rng.choice([None, 40.0]))
+            with self.subTest(args=args):
+                self.assertEqual(self.columns.search_sorted(*args), list(self.products.search_sorted(*args)))
+
+    def test_sorted_searches_match_products(self):
+        self.assert_same_searches()
+
+    def test_sorted_searches_without_numpy(self):
+        with mock.patch.object(columnar_products, "np", None):
+            self.assert_same_searches()
+
+    def test_sorting_follows_changes(self):
+        self.columns.search_sorted("", sort_by="name")
+        changes = [(5, "Laptops", "aardvark", 1.0, "", ""), (400, "Laptops", "AAA", 99.0, "", "")]
+        for store in (self.columns, self.products):
+            store.apply_changes(changes, removed=[7])
+        self.assertEqual(self.columns.search_sorted("", sort_by="name")[:2], [400, 5])
+        self.assert_same_searches()
+
+    def test_repeated_ids_replace_the_product(self):
+        records = [(1, "Laptops", "first", 5.0, "", ""), (2, "Laptops", "second", 6.0, "", ""),
+                   (1, "Consoles", "again", 7.0, "", "")]
+        for store in (self.columns, self.products):
+            store.add_products(records)
+            store.add_product(2, "Laptops", "replaced", 8.0, "", "")
+        self.assertEqual(len(self.columns), 300)
+        self.assertEqual(self.columns.get_product_info(1), self.products.get_product_info(1))
+        self.assertEqual(self.columns.get_product_info(2)['name'], "replaced")
+        self.assert_same_searches()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+'''
+    Tests for stock counts and the reservations held against them.
+
+    Usage: python -m pytest tests
+'''
+
+
+import sys
+import threading
+import time
+import unittest
+
+from inventory import Inventory, OutOfStock, ShardedCounter
+
+
+class InventoryTest(unittest.TestCase):
+    def setUp(self):
+        self.inventory = Inventory({1: 10, 2: 4}, shards=4, hold_seconds=60)
+
+    def test_reserve_is_all_or_nothing(self):
+        self.inventory.reserve_many("a", {1: 3, 2: 2})
+        with self.assertRaises(OutOfStock) as caught:
+            self.inventory.reserve_many("b", {1: 1, 2: 3})
+        self.assertEqual(caught.exception.shortages, {2: 2})
+        self.assertEqual((self.inventory.available(1), self.inventory.available(2)), (7, 2))
+        self.assertEqual(self.inventory.held("b"), {})
+
+    def test_release_puts_units_back(self):
+        self.inventory.reserve_many("a", {1: 3, 2: 2})
+        self.inventory.release("a", {1: 5})
+        self.assertEqual(self.inventory.held("a"), {2: 2})
+        self.assertEqual(self.inventory.available(1), 10)
+        self.inventory.release("a")
+        self.assertEqual(self.inventory.available(2), 4)
+        self.assertEqual(self.inventory.held("a"), {})
+
+    def test_commit_sells_held_units(self):
+        self.inventory.reserve_many("a", {1: 3})
+        self.inventory.commit("a", {1: 2})
+        self.assertEqual(self.inventory.held("a"), {1: 1})
+        self.inventory.release("a")
+        self.assertEqual(self.inventory.available(1), 8)
+
+    def test_expired_holds_are_released(self):
+        inventory = Inventory({1: 5}, hold_seconds=0.05)
+        inventory.reserve("idle", 1, 2)
+        inventory.reserve("active", 1, 3)
+        time.sleep(0.03)
+        inventory.ensure("active", {1: 3})
+        time.sleep(0.03)
+        self.assertEqual(inventory.expire(), 1)
+        self.assertEqual(inventory.held("idle"), {})
+        self.assertEqual(inventory.held("active"), {1: 3})
+        self.assertEqual(inventory.available(1), 2)
+
+    def test_ensure_reserves_again_after_expiry(self):
+        inventory = Inventory({1: 5}, hold_seconds=0.01)
+        inventory.reserve("a", 1, 2)
+        time.sleep(0.02)
+        inventory.expire()
+        inventory.ensure("a", {1: 2})
+        self.assertEqual(inventory.held("a"), {1: 2})
+        self.assertEqual(inventory.available(1), 3)
+
+    def test_untracked_products_never_run_out(self):
+        self.inventory.reserve("a", 99, 1000)
+        self.assertIsNone(self.inventory.available(99))
+
+
+class ShardedCounterTest(unittest.TestCase):
+    def test_takes_across_shards(self):
+        counter = ShardedCounter(4)
+        counter.add(10)
+        self.assertTrue(counter.take(7, 1))
+        self.assertEqual(counter.total(), 3)
+        self.assertFalse(counter.take(4, 0))
+        self.assertEqual(counter.total(), 3)
+
+    def test_concurrent_takes_fail_only_when_stock_is_short(self):
+        # Three takers of 5 from 16 units: whatever the others hold, 6 are always left
+        counter = ShardedCounter(8)
+        counter.add(16)
+        failures = []
+
+        def take_and_return(home):
+            for _ in range(20000):
+                if counter.take(5, home):
+                    # Spread the units out again, so most takes need more than one shard
+                    counter.add(5)
+                else:
+                    failures.append(home)
+
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=take_and_return, args=(home,)) for home in (0, 3, 6)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(interval)
+        self.assertEqual(failures, [])
+        self.assertEqual(counter.total(), 16)
+
+
+if __name__ == "__main__":
+    unittest.main()
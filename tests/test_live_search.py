@@ -0,0 +1,65 @@
+'''
+    Tests for search-as-you-type, with stand-ins for the Tk widget and the dispatcher.
+
+    Usage: python -m pytest tests
+'''
+
+
+import threading
+import unittest
+
+from live_search import LiveSearch
+from search_index import SearchCancelled
+
+
+class ImmediateDispatcher:
+    """Runs posted callbacks on the posting thread and signals each delivery."""
+
+    def __init__(self):
+        self.delivered = threading.Event()
+
+    def post(self, callback, *args):
+        callback(*args)
+        self.delivered.set()
+
+
+class LiveSearchTest(unittest.TestCase):
+    def setUp(self):
+        self.dispatcher = ImmediateDispatcher()
+        self.results = []
+
+    def live_search(self, search):
+        live_search = LiveSearch(None, self.dispatcher, search, self.results.append)
+        self.addCleanup(live_search.executor.shutdown)
+        return live_search
+
+    def test_delivers_results(self):
+        live_search = self.live_search(lambda query, cancelled=None: [query])
+        live_search.run("lens")
+        self.assertTrue(self.dispatcher.delivered.wait(5))
+        self.assertEqual(self.results, [["lens"]])
+
+    def test_failed_search_is_logged_and_shows_no_results(self):
+        def search(query, cancelled=None):
+            raise RuntimeError("database is locked")
+
+        live_search = self.live_search(search)
+        with self.assertLogs("live_search", "ERROR") as logs:
+            live_search.run("lens")
+            self.assertTrue(self.dispatcher.delivered.wait(5))
+        self.assertEqual(self.results, [[]])
+        self.assertIn("database is locked", logs.output[0])
+
+    def test_cancelled_search_delivers_nothing(self):
+        def search(query, cancelled=None):
+            raise SearchCancelled()
+
+        live_search = self.live_search(search)
+        live_search.run("lens")
+        live_search.executor.shutdown(wait=True)
+        self.assertFalse(self.dispatcher.delivered.is_set())
+        self.assertEqual(self.results, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
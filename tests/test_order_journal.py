@@ -0,0 +1,117 @@
+'''
+    Tests for the order journal: rotation, recovery after a crash, compaction, locking and write errors.
+
+    Usage: python -m pytest tests
+'''
+
+
+import os
+import tempfile
+import unittest
+
+import order_journal
+from order_journal import JournalLocked, OrderJournal, compact, replay, segment_paths
+
+
+def record(number):
+    return {'id': f"order-{number}", 'day': "2024-01-01", 'subtotal': 100, 'lines': [[1, 1, 100]]}
+
+
+class FailingFile:
+    def write(self, data):
+        raise OSError(28, "No space left on device")
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class OrderJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.temporary = tempfile.TemporaryDirectory()
+        self.directory = self.temporary.name
+        self.journals = []
+
+    def tearDown(self):
+        for journal in self.journals:
+            journal.close()
+        self.temporary.cleanup()
+
+    def open(self, **options):
+        journal = OrderJournal(self.directory, sync=False, **options)
+        self.journals.append(journal)
+        return journal
+
+    def write(self, journal, numbers):
+        for number in numbers:
+            journal.append(record(number))
+            journal.flush()
+
+    def test_segments_rotate_at_the_size_limit(self):
+        journal = self.open(segment_bytes=200)
+        self.write(journal, range(10))
+        self.assertGreater(len(segment_paths(self.directory)), 3)
+        for path in segment_paths(self.directory):
+            self.assertLessEqual(os.path.getsize(path), 200)
+        self.assertEqual([entry['id'] for entry in replay(self.directory)], [f"order-{number}" for number in range(10)])
+
+    def test_torn_tail_is_cut_off_on_reopen(self):
+        journal = self.open()
+        self.write(journal, range(3))
+        journal.close()
+        with open(segment_paths(self.directory)[-1], "ab") as file:
+            file.write(b'{"id":"order-torn","da')
+        journal = self.open()
+        self.write(journal, [3])
+        self.assertEqual([entry['id'] for entry in replay(self.directory)], [f"order-{number}" for number in range(4)])
+
+    def test_compaction_drops_duplicates_and_keeps_the_active_segment(self):
+        journal = self.open(segment_bytes=200)
+        self.write(journal, [0, 1, 2, 1, 3, 2, 4])
+        active = journal.path
+        with open(active, "rb") as file:
+            active_data = file.read()
+        journal.compact()
+        paths = segment_paths(self.directory)
+        self.assertEqual(len(paths), 2)
+        self.assertEqual(paths[-1], active)
+        with open(active, "rb") as file:
+            self.assertEqual(file.read(), active_data)
+        ids = [entry['id'] for entry in replay(self.directory)]
+        sealed_ids = ids[:-len(active_data.splitlines())]
+        self.assertEqual(len(sealed_ids), len(set(sealed_ids)))
+        self.write(journal, [5])
+        self.assertEqual(list(replay(self.directory))[-1]['id'], "order-5")
+
+    @unittest.skipIf(order_journal.fcntl is None, "directory locks need fcntl")
+    def test_offline_compaction_waits_for_the_writer_to_close(self):
+        journal = self.open(segment_bytes=200)
+        self.write(journal, [0, 1, 0, 1, 2, 3])
+        with self.assertRaises(JournalLocked):
+            compact(self.directory)
+        with self.assertRaises(JournalLocked):
+            OrderJournal(self.directory)
+        journal.close()
+        self.assertEqual(compact(self.directory), 2)
+        self.assertEqual(len(segment_paths(self.directory)), 2)
+        self.open().close()
+
+    def test_write_error_is_raised_by_append_and_flush(self):
+        journal = self.open()
+        self.write(journal, [0])
+        journal.file.close()
+        journal.file = FailingFile()
+        journal.append(record(1))
+        with self.assertRaises(OSError):
+            journal.flush(timeout=5)
+        with self.assertRaises(OSError):
+            journal.append(record(2))
+        with self.assertRaises(OSError):
+            journal.flush(timeout=5)
+        self.assertTrue(journal.writer.is_alive())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+'''
+    Tests for the order processor and the checkout of the cart service.
+
+    Usage: python -m pytest tests
+'''
+
+
+import threading
+import time
+import unittest
+
+from cart_service import CartService
+from main import Products
+from orders import Order, OrderProcessor, QueueFull, StubPaymentGateway, TransientPaymentError
+
+
+DETAILS = {'cardholder_name': "Test Buyer", 'card_number': "4242 4242 4242 4242", 'expiration_date': "12/99",
+           'cvv': "123", 'address': "1 Main St", 'city': "Springfield", 'state': "IL", 'zip_code': "62701"}
+
+
+def new_order(key="key"):
+    return Order([(1, "Widget", 1999, 1)], 1999, 140, DETAILS, key)
+
+
+class GatedGateway(StubPaymentGateway):
+    """Holds every charge until release() is called, and can be told to time out instead of charging."""
+
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+        self.failures = 0
+        self.attempts = 0
+
+    def release(self):
+        self.gate.set()
+
+    def charge(self, order, idempotency_key):
+        self.gate.wait(5)
+        with self.lock:
+            self.attempts += 1
+            if self.failures:
+                self.failures -= 1
+                raise TransientPaymentError("Simulated timeout")
+        return super().charge(order, idempotency_key)
+
+
+class Completions:
+    def __init__(self):
+        self.orders = []
+        self.done = threading.Semaphore(0)
+
+    def __call__(self, order):
+        self.orders.append(order)
+        self.done.release()
+
+    def wait(self, count=1):
+        for _ in range(count):
+            if not self.done.acquire(timeout=5):
+                raise AssertionError("callback was not called")
+
+
+class OrderProcessorTest(unittest.TestCase):
+    def setUp(self):
+        self.gateway = GatedGateway()
+        self.processor = OrderProcessor(self.gateway, workers=2, max_pending=2, max_attempts=1)
+
+    def tearDown(self):
+        self.gateway.release()
+        self.processor.shutdown(wait=True)
+
+    def test_duplicate_of_a_pending_order_gets_its_callback(self):
+        completions = Completions()
+        first = self.processor.submit(new_order(), completions)
+        second = self.processor.submit(new_order(), completions)
+        self.assertIs(second, first)
+        self.gateway.release()
+        completions.wait(2)
+        self.assertEqual(completions.orders, [first, first])
+        self.assertEqual(first.status, Order.PAID)
+        self.assertEqual(len(self.gateway.charges), 1)
+
+    def test_duplicate_of_a_paid_order_is_answered_at_once(self):
+        self.gateway.release()
+        completions = Completions()
+        first = self.processor.submit(new_order(), completions)
+        completions.wait()
+        again = Completions()
+        self.assertIs(self.processor.submit(new_order(), again), first)
+        again.wait()
+        self.assertEqual(again.orders, [first])
+        self.assertEqual(self.gateway.attempts, 1)
+
+    def test_failed_order_may_be_retried(self):
+        self.gateway.release()
+        self.gateway.failures = 1
+        completions = Completions()
+        first = self.processor.submit(new_order(), completions)
+        completions.wait()
+        self.assertEqual(first.status, Order.FAILED)
+        retry = self.processor.submit(new_order(), completions)
+        self.assertIsNot(retry, first)
+        completions.wait()
+        self.assertEqual(retry.status, Order.PAID)
+        self.assertEqual(len(self.gateway.charges), 1)
+
+    def test_queue_full_forgets_the_order(self):
+        self.processor.submit(new_order("a"))
+        self.processor.submit(new_order("b"))
+        with self.assertRaises(QueueFull):
+            self.processor.submit(new_order("c"), block=False)
+        self.gateway.release()
+        completions = Completions()
+        order = self.processor.submit(new_order("c"), completions)
+        completions.wait()
+        self.assertEqual(order.status, Order.PAID)
+
+    def test_failing_listener_does_not_stop_the_others(self):
+        self.gateway.release()
+        seen = []
+
+        def broken(order):
+            raise OSError("disk full")
+
+        self.processor.subscribe(broken)
+        self.processor.subscribe(seen.append)
+        completions = Completions()
+        with self.assertLogs("orders", "ERROR"):
+            order = self.processor.submit(new_order(), completions)
+            completions.wait()
+        self.assertEqual(seen, [order])
+
+
+class CheckoutTest(unittest.TestCase):
+    def test_repeated_checkout_does_not_leak_pending_orders(self):
+        gateway = GatedGateway()
+        processor = OrderProcessor(gateway, workers=1)
+        products = Products()
+        products.add_product(1, "Cameras", "Widget", 19.99, "", "")
+        service = CartService(products, processor, session_ttl=60)
+        session_id = service.create_session()
+        service.add_item(session_id, 1)
+        completions = Completions()
+        first = service.checkout(session_id, DETAILS, completions)
+        self.assertIs(service.checkout(session_id, DETAILS, completions), first)
+        gateway.release()
+        completions.wait(2)
+        processor.shutdown(wait=True)
+        session = service.session(session_id)
+        self.assertEqual(session.pending_orders, 0)
+        self.assertEqual(len(session.cart), 0)
+        self.assertTrue(session.expired(time.monotonic() + 61))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+'''
+    Tests for the in-memory product store.
+
+    Usage: python -m pytest tests
+'''
+
+
+import unittest
+
+from main import Products
+
+
+def record(product_id, name, price, category="Cameras"):
+    return (product_id, category, name, price, "", "")
+
+
+class AddProductsTest(unittest.TestCase):
+    def assert_indexes_consistent(self, products):
+        self.assertEqual(products.prices, sorted((info['price'], product_id)
+                                                 for product_id, info in products.products.items()))
+        self.assertEqual(products.sorted_names, sorted((info['name'].lower(), product_id)
+                                                       for product_id, info in products.products.items()))
+        for product_id, info in products.products.items():
+            self.assertIn(product_id, products.names[info['name']])
+
+    def test_repeated_id_in_one_batch_keeps_the_last_record(self):
+        products = Products()
+        products.add_products([record(1, "a", 5.0), record(2, "b", 1.0), record(2, "b", 2.0)])
+        self.assertEqual(products.prices, [(2.0, 2), (5.0, 1)])
+        self.assertEqual(products.get_product_info(2)['price'], 2.0)
+        self.assert_indexes_consistent(products)
+
+    def test_repeated_id_with_a_new_name(self):
+        products = Products()
+        products.add_products([record(1, "a", 5.0), record(2, "b", 1.0), record(2, "c", 3.0), record(3, "d", 4.0)])
+        self.assertEqual(products.sorted_names, [("a", 1), ("c", 2), ("d", 3)])
+        self.assertNotIn("b", products.names)
+        self.assertEqual(list(products.search_ids("c")), [2])
+        self.assert_indexes_consistent(products)
+
+    def test_batch_updating_existing_products(self):
+        products = Products()
+        products.add_products([record(1, "a", 5.0), record(2, "b", 1.0)])
+        products.add_products([record(3, "c", 0.5), record(1, "z", 0.1), record(3, "c", 9.0), record(4, "d", 4.0)])
+        self.assertEqual(products.prices, [(0.1, 1), (1.0, 2), (4.0, 4), (9.0, 3)])
+        self.assertEqual(len(products), 4)
+        self.assert_indexes_consistent(products)
+
+
+class SortedViewTest(unittest.TestCase):
+    def test_view_keeps_its_rows_when_the_catalog_changes(self):
+        products = Products()
+        products.add_products([record(product_id, f"n{product_id}", float(product_id)) for product_id in range(1, 501)])
+        view = products.sorted_ids("price")
+        self.assertEqual(view[:5], [1, 2, 3, 4, 5])
+        products.apply_changes([record(500, "n500", 0.5)], removed=[2])
+        products.update_product(3, price=0.25)
+        products.add_product(600, "Cameras", "new", 0.1, "", "")
+        self.assertEqual(view[:5], [1, 2, 3, 4, 5])
+        self.assertEqual(products.sorted_ids("price")[:4], [600, 3, 500, 1])
+
+    def test_filtered_view_is_counted_when_built_and_ignores_later_changes(self):
+        products = Products()
+        products.add_products([record(product_id, f"n{product_id}", float(product_id),
+                                      "Lenses" if product_id % 10 else "Cameras")
+                               for product_id in range(1, 1001)])
+        view = products.search_sorted("", "Cameras", sort_by="price", min_price=300.0)
+        self.assertEqual(view.scanned, view.end - view.start)
+        self.assertIsInstance(view.among, frozenset)
+        products.add_products([record(product_id, f"n{product_id}", 500.5, "Cameras")
+                               for product_id in range(2001, 2011)])
+        products.apply_changes([], removed=[400])
+        self.assertEqual(len(view), 71)
+        self.assertEqual(view[:3], [300, 310, 320])
+        self.assertEqual(len(products.search_sorted("", "Cameras", sort_by="price", min_price=300.0)), 80)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+'''
+    Tests for the remote image fetcher, against a local HTTP stand-in server.
+
+    Usage: python -m pytest tests
+'''
+
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+try:
+    import requests
+    from PIL import Image
+    from remote_images import RemoteImageFetcher
+except ImportError:
+    RemoteImageFetcher = None
+
+
+def png_bytes(color, size=(8, 8)):
+    buffer = BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class ImageHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, self.headers.get('If-None-Match')))
+            server.in_flight += 1
+            server.most_in_flight = max(server.most_in_flight, server.in_flight)
+        try:
+            time.sleep(server.delay)
+            body = server.images.get(self.path)
+            etag = f'"{self.path.strip("/")}-{server.revision}"'
+            if body is None:
+                self.send_response(404)
+                self.end_headers()
+            elif self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+            else:
+                self.send_response(200)
+                self.send_header('Content-Type', "image/png")
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('ETag', etag)
+                self.send_header('Cache-Control', server.cache_control)
+                self.end_headers()
+                self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+@unittest.skipIf(RemoteImageFetcher is None, "requests and Pillow are needed")
+class RemoteImageFetcherTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), ImageHandler)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.in_flight = 0
+        self.server.most_in_flight = 0
+        self.server.delay = 0
+        self.server.revision = 1
+        self.server.cache_control = "no-cache"
+        self.server.images = {f"/{number}.png": png_bytes((number * 40, 0, 0)) for number in range(4)}
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.fetchers = []
+
+    def tearDown(self):
+        for fetcher in self.fetchers:
+            fetcher.shutdown()
+        self.server.shutdown()
+        self.server.server_close()
+        self.cache_dir.cleanup()
+
+    def fetcher(self, **options):
+        fetcher = RemoteImageFetcher(cache_dir=self.cache_dir.name, **options)
+        self.fetchers.append(fetcher)
+        return fetcher
+
+    def url(self, number):
+        return f"{self.base}/{number}.png"
+
+    def test_fetches_from_several_threads(self):
+        self.server.delay = 0.3
+        urls = [self.url(number % 4) for number in range(8)]
+        fetcher = self.fetcher()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            bodies = list(executor.map(fetcher.fetch, urls))
+        elapsed = time.perf_counter() - started
+        self.assertEqual(bodies, [self.server.images[f"/{number % 4}.png"] for number in range(8)])
+        self.assertGreater(self.server.most_in_flight, 1)
+        self.assertLess(elapsed, 8 * self.server.delay)
+        self.assertFalse([name for name in os.listdir(self.cache_dir.name) if name.endswith(".tmp")])
+
+    def test_revalidates_with_etag(self):
+        first = self.fetcher().fetch(self.url(1))
+        # A new fetcher shares only the disk cache, which it must revalidate
+        second = self.fetcher().fetch(self.url(1))
+        self.assertEqual(first, second)
+        self.assertEqual(self.server.requests, [("/1.png", None), ("/1.png", '"1.png-1"')])
+
+        self.server.revision = 2
+        self.server.images["/1.png"] = png_bytes((0, 255, 0))
+        third = self.fetcher().fetch(self.url(1))
+        self.assertEqual(third, self.server.images["/1.png"])
+        self.assertEqual(self.server.requests[-1], ("/1.png", '"1.png-1"'))
+
+    def test_missing_body_is_fetched_again(self):
+        fetcher = self.fetcher()
+        fetcher.fetch(self.url(3))
+        os.remove(fetcher.cache_paths(self.url(3))[0])
+        self.assertEqual(fetcher.fetch(self.url(3)), self.server.images["/3.png"])
+        self.assertEqual(self.server.requests, [("/3.png", None), ("/3.png", '"3.png-1"'), ("/3.png", None)])
+        self.assertEqual(fetcher.fetch(self.url(3)), self.server.images["/3.png"])
+
+    def test_fresh_response_skips_the_network(self):
+        self.server.cache_control = "max-age=3600"
+        self.fetcher().fetch(self.url(2))
+        self.fetcher().fetch(self.url(2))
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_missing_image_raises(self):
+        with self.assertRaises(requests.HTTPError):
+            self.fetcher().fetch(self.url(9))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+'''
+    Tests for the search index, and for searches agreeing across the catalog backends.
+
+    Usage: python -m pytest tests
+'''
+
+
+import unittest
+
+from columnar_products import ColumnarProducts
+from main import Products
+from search_index import SearchIndex
+from sqlite_products import SqliteProducts
+
+
+NAMES = ["Xbox Series X", "PlayStation 5", "Nintendo Switch", "TV", "4K TV stand", "Mouse pad", "Gaming mouse",
+         "USB-C hub", "Box fan", "ox", "Q", "Keyboard & mouse combo", "50% off voucher", "snake_case mug"]
+QUERIES = ["ox", "s", "x", "tv", "v", "-c", " ", "5", "q", "%", "_", "&", "mouse", "box", "station", "us",
+           "series x", "zz", "o"]
+
+
+def records():
+    return [(number, "Games" if number % 2 else "Home", name, float(number), f"About the {name}", "")
+            for number, name in enumerate(NAMES, start=1)]
+
+
+def substring_ids(query, category=None):
+    return sorted(number for number, category_name, name, price, description, image_path in records()
+                  if query.lower() in name.lower() and category in (None, category_name))
+
+
+class SearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = SearchIndex()
+        for number, category, name, price, description, image_path in records():
+            self.index.add(number, {'category': category, 'name': name})
+
+    def test_short_queries_match_substrings(self):
+        for query in QUERIES:
+            with self.subTest(query=query):
+                self.assertEqual(sorted(self.index.search(query)), substring_ids(query))
+
+    def test_short_texts_follow_updates(self):
+        self.index.update(10, {'category': "Home", 'name': "Oxford shirt"})
+        self.index.update(4, {'category': "Games", 'name': "tv"})
+        self.index.remove(11)
+        self.assertEqual(self.index.search("ox"), [1, 9, 10])
+        self.assertEqual(self.index.search("q"), [])
+        self.assertIn(4, self.index.search("t"))
+
+    def test_unindexed_field_raises(self):
+        with self.assertRaises(ValueError):
+            self.index.search("ox", fields=("description",))
+
+
+class BackendParityTest(unittest.TestCase):
+    def setUp(self):
+        self.stores = {'memory': Products(), 'sqlite': SqliteProducts(), 'columnar': ColumnarProducts()}
+        for store in self.stores.values():
+            store.add_products(records())
+
+    def tearDown(self):
+        self.stores['sqlite'].close()
+
+    def test_backends_return_the_same_matches(self):
+        for query in QUERIES:
+            for category in (None, "Games"):
+                expected = substring_ids(query, category)
+                for backend, store in self.stores.items():
+                    with self.subTest(query=query, category=category, backend=backend):
+                        self.assertEqual(sorted(store.search_ids(query, category)), expected)
+
+    def test_backends_sort_the_same_way(self):
+        for query in ("o", "mouse", ""):
+            for sort_by in ("name", "price"):
+                results = {backend: list(store.search_sorted(query, sort_by=sort_by, min_price=2, max_price=12))
+                           for backend, store in self.stores.items()}
+                with self.subTest(query=query, sort_by=sort_by):
+                    self.assertEqual(results['sqlite'], results['memory'])
+                    self.assertEqual(results['columnar'], results['memory'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+'''
+    Tests for the SQLite product store.
+
+    Usage: python -m pytest tests
+'''
+
+
+import os
+import tempfile
+import threading
+import unittest
+
+from sqlite_products import UPSERT_PRODUCT, SqliteProducts
+
+
+def record(product_id, name="Widget", price=9.99):
+    return (product_id, "Consoles", name, price, "", "")
+
+
+class SqliteProductsTest(unittest.TestCase):
+    def setUp(self):
+        self.temporary = tempfile.TemporaryDirectory()
+        self.store = SqliteProducts(os.path.join(self.temporary.name, "catalog.db"))
+        self.store.add_products(record(product_id, f"Widget {product_id}") for product_id in range(1, 101))
+
+    def tearDown(self):
+        self.store.close()
+        self.temporary.cleanup()
+
+    def read_in_thread(self, read):
+        results = []
+        thread = threading.Thread(target=lambda: results.append(read()), daemon=True)
+        thread.start()
+        thread.join(timeout=5)
+        self.assertFalse(thread.is_alive(), "the read waited for the write")
+        return results[0]
+
+    def test_reads_do_not_wait_for_a_write_in_progress(self):
+        results = self.store.search_sorted("widget", sort_by="price")
+        with self.store.lock, self.store.connection:
+            self.store.connection.execute(UPSERT_PRODUCT, record(5, "Renamed"))
+            self.store.connection.execute("DELETE FROM products WHERE id = 6")
+            # The uncommitted write is invisible to the readers, which carry on with the committed catalog
+            self.assertEqual(self.read_in_thread(lambda: self.store.get_product_info(5))['name'], "Widget 5")
+            self.assertEqual(self.read_in_thread(lambda: results[:3]), [1, 2, 3])
+            self.assertEqual(self.read_in_thread(lambda: len(self.store.search_sorted("widget"))), 100)
+        self.assertEqual(self.store.get_product_info(5)['name'], "Renamed")
+        self.assertIsNone(self.store.get_product_info(6))
+        self.assertEqual(len(self.store), 99)
+
+    def test_remove_returns_the_removed_product(self):
+        self.assertEqual(self.store.remove_product(7)['name'], "Widget 7")
+        self.assertIsNone(self.store.remove_product(7))
+        self.assertNotEqual(self.store.version, (0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+'''
+    Tests for the virtualized Treeview, against a stand-in for the ttk widget.
+
+    Usage: python -m pytest tests
+'''
+
+
+import random
+import unittest
+
+from virtual_tree import VirtualTreeview, stable_keys
+
+
+class StubTree:
+    """Keeps the children of the root item the way ttk.Treeview does, and counts the widget calls."""
+
+    def __init__(self, height=10):
+        self.height = height
+        self.children = []
+        self.detached = set()
+        self.values = {}
+        self.calls = 0
+        self.top = 0
+        self.idle = []
+
+    def configure(self, **options):
+        pass
+
+    def cget(self, option):
+        return self.height
+
+    def after_idle(self, callback):
+        self.idle.append(callback)
+
+    def run_idle(self):
+        while self.idle:
+            self.idle.pop(0)()
+
+    def insert(self, parent, index, iid, values):
+        self.calls += 1
+        self.values[iid] = values
+        self.attach(iid, index)
+
+    def move(self, iid, parent, index):
+        self.calls += 1
+        if iid in self.detached:
+            self.detached.discard(iid)
+        else:
+            self.children.remove(iid)
+        self.attach(iid, index)
+
+    def attach(self, iid, index):
+        if index == "end":
+            self.children.append(iid)
+        else:
+            self.children.insert(index, iid)
+
+    def detach(self, iid):
+        self.calls += 1
+        self.children.remove(iid)
+        self.detached.add(iid)
+
+    def delete(self, iid):
+        self.calls += 1
+        self.children.remove(iid)
+        del self.values[iid]
+
+    def item(self, iid, values):
+        self.calls += 1
+        self.values[iid] = values
+
+    def yview_scroll(self, count, what):
+        self.top += count
+
+
+def row_values(key):
+    return (f"row {key}",)
+
+
+class VirtualTreeviewTest(unittest.TestCase):
+    def test_stable_keys_is_a_longest_increasing_run(self):
+        positions = {key: position for position, key in enumerate("abcdef")}
+        self.assertEqual(stable_keys(list("bcdefa"), positions), set("bcdef"))
+        self.assertEqual(len(stable_keys(list("fedcba"), positions)), 1)
+        self.assertEqual(stable_keys([], {}), set())
+
+    def test_diff_matches_target(self):
+        rng = random.Random(4)
+        tree = StubTree(height=40)
+        rows = VirtualTreeview(tree, row_values, buffer_rows=10)
+        for _ in range(50):
+            keys = rng.sample(range(120), rng.randint(0, 120))
+            rows.set_rows(keys)
+            self.assertEqual(tree.children, [str(key) for key in keys[:len(rows.materialized)]])
+            self.assertEqual(set(tree.values), set(tree.children))
+
+    def test_moving_one_row_touches_one_row(self):
+        tree = StubTree(height=100)
+        rows = VirtualTreeview(tree, row_values, buffer_rows=0)
+        keys = list(range(100))
+        rows.set_rows(keys)
+        tree.calls = 0
+        rows.set_rows(keys[1:] + keys[:1])
+        self.assertEqual(tree.calls, 2)
+        self.assertEqual(tree.children, [str(key) for key in keys[1:] + keys[:1]])
+
+    def test_scrolling_keeps_a_bounded_window(self):
+        tree = StubTree(height=10)
+        rows = VirtualTreeview(tree, row_values, buffer_rows=10)
+        keys = list(range(10000))
+        rows.set_rows(keys)
+        for _ in range(100):
+            rows.on_scroll("0.5", "1.0")
+            tree.run_idle()
+        self.assertLessEqual(len(tree.children), rows.max_rows())
+        self.assertEqual(tree.children, [str(key) for key in keys[rows.offset:rows.offset + len(tree.children)]])
+        self.assertGreater(rows.offset, 0)
+        for _ in range(200):
+            rows.on_scroll("0.0", "0.5")
+            tree.run_idle()
+        self.assertEqual(rows.offset, 0)
+        self.assertEqual(tree.children, [str(key) for key in keys[:len(tree.children)]])
+        self.assertLessEqual(len(tree.values), rows.max_rows())
+
+
+if __name__ == "__main__":
+    unittest.main()
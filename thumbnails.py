@@ -0,0 +1,175 @@
+'''
+    Thumbnail pipeline for product images.
+
+    Description: Decoding and resizing product images happens on a thread pool instead of the Tk thread.
+                 Resized images are written to an on-disk cache keyed by source path, modification time and
+                 size, and ready PhotoImages are kept in an in-memory LRU bounded by a byte budget. Finished
+                 work is delivered back to the Tk thread through a Dispatcher. Pillow is only imported once the
+                 first image is needed, so it does not slow down startup. When a packed asset file is available,
+                 images it holds are turned straight into PhotoImages without decoding anything. Images given
+                 as http(s) URLs are downloaded through a RemoteImageFetcher, which keeps its own disk cache.
+                 Thumbnails keep the aspect ratio of their original.
+'''
+
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from catalog import is_remote
+
+
+class ThumbnailCache:
+    DEFAULT_BUDGET = 32 * 1024 * 1024
+    DEFAULT_CACHE_DIR = os.path.join("images", ".thumbnails")
+
+    def __init__(self, dispatcher, max_bytes=DEFAULT_BUDGET, cache_dir=DEFAULT_CACHE_DIR, workers=2, pack=None,
+                 remote_fetcher=None):
+        """
+        Initialize the ThumbnailCache class.
+
+        Args:
+            dispatcher (Dispatcher): Runs finished work on the Tk thread.
+            max_bytes (int, optional): Memory budget for cached PhotoImages. Defaults to DEFAULT_BUDGET.
+            cache_dir (str, optional): Directory for resized images on disk. Defaults to DEFAULT_CACHE_DIR.
+            workers (int, optional): Number of decoding threads. Defaults to 2.
+            pack (AssetPack, optional): Prebuilt images to use before decoding originals. Defaults to None.
+            remote_fetcher (RemoteImageFetcher, optional): Downloads images given as URLs. Defaults to None
+                (one is created when the first URL is requested).
+        """
+        self.dispatcher = dispatcher
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.pack = pack
+        self.remote_fetcher = remote_fetcher
+        self.lock = threading.Lock()
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnails")
+        self.photos = OrderedDict()
+        self.cached_bytes = 0
+        self.waiting = {}
+
+    def request(self, image_path, height, callback=None):
+        """
+        Deliver a PhotoImage of image_path scaled to height, loading it in the background if needed.
+
+        The callback runs on the Tk thread with the PhotoImage, or with None if the image could not be
+        loaded. It runs immediately when the image is already cached.
+
+        Args:
+            image_path (str): Path or URL of the original image.
+            height (int): Height of the thumbnail.
+            callback (callable, optional): Receives the PhotoImage. Defaults to None (only warm the cache).
+        """
+        key = (image_path, height)
+        photo = self.photos.get(key)
+        if photo is not None:
+            self.photos.move_to_end(key)
+            if callback is not None:
+                callback(photo[0])
+            return
+        if self.pack is not None:
+            data = self.pack.get(image_path, height)
+            if data is not None:
+                import tkinter
+
+                photo = tkinter.PhotoImage(data=data, format="PPM")
+                self._store(key, photo, photo.width() * photo.height() * 4)
+                if callback is not None:
+                    callback(photo)
+                return
+        callbacks = self.waiting.get(key)
+        if callbacks is not None:
+            if callback is not None:
+                callbacks.append(callback)
+            return
+        self.waiting[key] = [callback] if callback is not None else []
+        future = self.executor.submit(self.load, image_path, height)
+        future.add_done_callback(lambda done: self.dispatcher.post(self._finish, key, done))
+
+    def prefetch(self, image_paths, height):
+        """Start loading thumbnails that are likely to be requested soon."""
+        for image_path in image_paths:
+            self.request(image_path, height)
+
+    def invalidate(self, image_path):
+        """Drop every cached thumbnail of image_path from memory and stop using its packed asset."""
+        for key in [key for key in self.photos if key[0] == image_path]:
+            self.cached_bytes -= self.photos.pop(key)[1]
+        if self.pack is not None:
+            self.pack.invalidate(image_path)
+
+    def load(self, image_path, height):
+        """
+        Return a resized PIL image, reading it from the disk cache when possible. Runs on a worker thread.
+
+        Args:
+            image_path (str): Path or URL of the original image.
+            height (int): Height of the thumbnail.
+        """
+        from PIL import Image
+
+        if is_remote(image_path):
+            with Image.open(BytesIO(self.remote().fetch(image_path))) as original:
+                return self.resize(original, height)
+        cache_path = self.cache_path(image_path, height)
+        if os.path.exists(cache_path):
+            with Image.open(cache_path) as cached:
+                cached.load()
+                return cached.copy()
+        with Image.open(image_path) as original:
+            resized = self.resize(original, height)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temporary_path = f"{cache_path}.{os.getpid()}.tmp"
+        resized.save(temporary_path, format="PNG")
+        os.replace(temporary_path, cache_path)
+        return resized
+
+    @staticmethod
+    def resize(image, height):
+        from PIL import Image
+
+        if image.mode not in ("RGB", "RGBA", "L"):
+            image = image.convert("RGB")
+        width = max(1, round(image.size[0] * height / image.size[1]))
+        return image.resize((width, height), Image.LANCZOS)
+
+    def remote(self):
+        with self.lock:
+            if self.remote_fetcher is None:
+                from remote_images import RemoteImageFetcher
+
+                self.remote_fetcher = RemoteImageFetcher(max_connections=self.workers)
+            return self.remote_fetcher
+
+    def cache_path(self, image_path, height):
+        modified = os.stat(image_path).st_mtime_ns
+        key = f"{os.path.abspath(image_path)}|{modified}|{height}".encode()
+        return os.path.join(self.cache_dir, hashlib.sha1(key).hexdigest() + ".png")
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.remote_fetcher is not None:
+            self.remote_fetcher.shutdown()
+
+    def _finish(self, key, future):
+        callbacks = self.waiting.pop(key, [])
+        if future.cancelled() or future.exception() is not None:
+            photo = None
+        else:
+            from PIL import ImageTk
+
+            image = future.result()
+            photo = ImageTk.PhotoImage(image)
+            self._store(key, photo, image.size[0] * image.size[1] * 4)
+        for callback in callbacks:
+            callback(photo)
+
+    def _store(self, key, photo, size):
+        self.photos[key] = (photo, size)
+        self.cached_bytes += size
+        while self.cached_bytes > self.max_bytes and len(self.photos) > 1:
+            self.cached_bytes -= self.photos.popitem(last=False)[1][1]
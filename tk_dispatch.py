@@ -0,0 +1,50 @@
+'''
+    Main-thread dispatcher for Tkinter.
+
+    Description: Tk widgets may only be touched from the thread running the mainloop. Worker threads hand
+                 their results to a Dispatcher, which queues them and runs the callbacks on the Tk thread from
+                 a short after() polling loop.
+'''
+
+
+import queue
+
+
+class Dispatcher:
+    POLL_INTERVAL_MS = 15
+
+    def __init__(self, widget):
+        """
+        Initialize the Dispatcher class and start polling.
+
+        Args:
+            widget: A long-lived Tkinter widget (normally the root window) used to schedule after() calls.
+        """
+        self.widget = widget
+        self.pending = queue.SimpleQueue()
+        self.after_id = self.widget.after(self.POLL_INTERVAL_MS, self.poll)
+
+    def post(self, callback, *args):
+        """
+        Schedule callback(*args) to run on the Tk thread. Safe to call from any thread.
+
+        Args:
+            callback (callable): The function to run.
+            *args: Arguments passed to the callback.
+        """
+        self.pending.put((callback, args))
+
+    def poll(self):
+        """Schedule the next poll, then run every queued callback."""
+        self.after_id = self.widget.after(self.POLL_INTERVAL_MS, self.poll)
+        while True:
+            try:
+                callback, args = self.pending.get_nowait()
+            except queue.Empty:
+                break
+            callback(*args)
+
+    def stop(self):
+        if self.after_id is not None:
+            self.widget.after_cancel(self.after_id)
+            self.after_id = None
@@ -0,0 +1,208 @@
+'''
+    Virtualized Treeview.
+
+    Description: Wraps a ttk.Treeview so that only a window of the rows around the visible area is ever
+                 inserted into the widget. More rows are materialized as the user scrolls towards either end of
+                 the window, and rows that fall too far behind are removed again, so the widget never holds
+                 more than a few screens of rows however far the user scrolls. When the result set changes,
+                 the rows already in the widget are diffed against the new results: rows that keep their
+                 relative order (the longest increasing run of their old positions) stay where they are, and
+                 only the removed, inserted, moved or changed rows are touched.
+'''
+
+
+from bisect import bisect_left
+
+
+def stable_keys(keys, positions):
+    """
+    Return the largest set of keys that already appear in their target order.
+
+    Args:
+        keys (list): Keys in target order, all present in positions.
+        positions (dict): Keys mapped to their current position.
+
+    Returns:
+        set: The keys on a longest increasing subsequence of current positions, which need not move.
+    """
+    tails = []
+    tail_indexes = []
+    previous = [-1] * len(keys)
+    for index, key in enumerate(keys):
+        position = positions[key]
+        slot = bisect_left(tails, position)
+        if slot:
+            previous[index] = tail_indexes[slot - 1]
+        if slot == len(tails):
+            tails.append(position)
+            tail_indexes.append(index)
+        else:
+            tails[slot] = position
+            tail_indexes[slot] = index
+    stable = set()
+    index = tail_indexes[-1] if tail_indexes else -1
+    while index >= 0:
+        stable.add(keys[index])
+        index = previous[index]
+    return stable
+
+
+class VirtualTreeview:
+    DEFAULT_BUFFER = 50
+    LOAD_MORE_AT = 0.9
+    # Rows kept in the widget, as a multiple of one screen plus buffer
+    WINDOW_SCREENS = 3
+
+    def __init__(self, tree, row_values, buffer_rows=DEFAULT_BUFFER, scrollbar=None):
+        """
+        Initialize the VirtualTreeview class.
+
+        Args:
+            tree (ttk.Treeview): The widget to manage. Rows are inserted with iid=str(key).
+            row_values (callable): Returns the tuple of column values for a row key.
+            buffer_rows (int, optional): Rows materialized beyond the visible area. Defaults to DEFAULT_BUFFER.
+            scrollbar (tk.Scrollbar, optional): Scrollbar to keep in sync with the tree. Defaults to None.
+        """
+        self.tree = tree
+        self.row_values = row_values
+        self.buffer_rows = buffer_rows
+        self.scrollbar = scrollbar
+        self.keys = []
+        self.offset = 0
+        self.materialized = []
+        self.values = {}
+        self.iids = {}
+        self.loading = False
+        self.tree.configure(yscrollcommand=self.on_scroll)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def set_rows(self, keys):
+        """
+        Show a new result set, reusing the rows already in the widget wherever possible.
+
+        The window stays at the same position in the results, so a refresh does not jump back to the top.
+
+        Args:
+            keys (sequence): Row keys in display order. Only len() and slicing are used, so a lazy
+                sequence keeps the cost proportional to the materialized rows, provided its len() is already
+                known; count the rows on the thread that built the sequence.
+        """
+        self.keys = keys
+        count = min(max(len(self.materialized), self.initial_rows()), self.max_rows())
+        self.offset = max(0, min(self.offset, len(keys) - count))
+        self.apply(list(keys[self.offset:self.offset + count]))
+
+    def refresh_rows(self, keys=None):
+        """
+        Re-read the values of materialized rows and update the ones that changed.
+
+        Args:
+            keys (iterable, optional): Only refresh these keys. Defaults to None (every materialized row).
+        """
+        for key in self.materialized if keys is None else keys:
+            if key in self.values:
+                values = tuple(self.row_values(key))
+                if values != self.values[key]:
+                    self.values[key] = values
+                    self.tree.item(str(key), values=values)
+
+    def load_more(self):
+        """Materialize the next batch of rows at the end of the widget, dropping rows far above the view."""
+        self.loading = False
+        start = self.offset + len(self.materialized)
+        for key in self.keys[start:start + self.initial_rows()]:
+            self.insert(key, "end")
+            self.materialized.append(key)
+        excess = len(self.materialized) - self.max_rows()
+        if excess > 0:
+            for key in self.materialized[:excess]:
+                self.delete(key)
+            del self.materialized[:excess]
+            self.offset += excess
+            # The rows on screen moved up by the deleted rows; scroll back so they stay put
+            self.tree.yview_scroll(-excess, "units")
+
+    def load_previous(self):
+        """Materialize the batch of rows before the window at the top of the widget, dropping rows far below."""
+        self.loading = False
+        count = min(self.offset, self.initial_rows())
+        if not count:
+            return
+        keys = list(self.keys[self.offset - count:self.offset])
+        for index, key in enumerate(keys):
+            self.insert(key, index)
+        self.materialized[:0] = keys
+        self.offset -= count
+        self.tree.yview_scroll(count, "units")
+        excess = len(self.materialized) - self.max_rows()
+        if excess > 0:
+            for key in self.materialized[-excess:]:
+                self.delete(key)
+            del self.materialized[-excess:]
+
+    def on_scroll(self, first, last):
+        if self.scrollbar is not None:
+            self.scrollbar.set(first, last)
+        if self.loading:
+            return
+        if float(last) >= self.LOAD_MORE_AT and self.offset + len(self.materialized) < len(self.keys):
+            self.loading = True
+            self.tree.after_idle(self.load_more)
+        elif float(first) <= 1 - self.LOAD_MORE_AT and self.offset > 0:
+            self.loading = True
+            self.tree.after_idle(self.load_previous)
+
+    def initial_rows(self):
+        return int(self.tree.cget("height")) + self.buffer_rows
+
+    def max_rows(self):
+        return self.initial_rows() * self.WINDOW_SCREENS
+
+    def apply(self, target):
+        """
+        Turn the materialized rows into target with as few widget operations as possible.
+
+        Rows that are already in target order stay put; the others present are detached and put back at their
+        new position, so the diff costs O(n log n) in Python plus one widget call per changed row.
+
+        Args:
+            target (list): The keys that should be materialized, in order.
+        """
+        wanted = set(target)
+        positions = {}
+        for key in self.materialized:
+            if key in wanted:
+                positions[key] = len(positions)
+            else:
+                self.delete(key)
+        stable = stable_keys([key for key in target if key in positions], positions)
+        for key in positions:
+            if key not in stable:
+                self.tree.detach(str(key))
+        # The widget now holds only the stable rows, in target order; fill in the rest from the top
+        for index, key in enumerate(target):
+            if key in stable:
+                continue
+            if key in positions:
+                self.tree.move(str(key), "", index)
+            else:
+                self.insert(key, index)
+        self.materialized = target
+        self.refresh_rows()
+
+    def key_for(self, iid):
+        """Return the row key of a Treeview item id, or None if the item is not one of the rows."""
+        return self.iids.get(iid)
+
+    def insert(self, key, index):
+        values = tuple(self.row_values(key))
+        self.values[key] = values
+        self.iids[str(key)] = key
+        self.tree.insert("", index, iid=str(key), values=values)
+
+    def delete(self, key):
+        self.tree.delete(str(key))
+        del self.values[key]
+        del self.iids[str(key)]